@@ -55,7 +55,8 @@
 Should we preflight the entire network, including all server-to-server
 connections?
 
-Yes! We don't yet do this with remote server-to-server connections yet.
+Yes! MininetCluster.precheck() checks every server in parallel,
+including reachability between each pair of servers.
 
 Should we multiplex the link ssh connections?
 
@@ -66,7 +67,7 @@
 
 Things to do:
 
-- asynchronous/pipelined/parallel startup
+- asynchronous/pipelined startup
 - ssh debugging/profiling
 - make connections into real objects
 - support for other tunneling schemes
@@ -84,15 +85,18 @@
 from mininet.examples.clustercli import CLI
 from mininet.log import setLogLevel, debug, info, error
 from mininet.clean import addCleanupCallback
+from mininet.perf import timer
 
-from signal import signal, SIGINT, SIG_IGN
+from signal import signal, SIGINT, SIG_IGN, SIGKILL
 from subprocess import Popen, PIPE, STDOUT
 import os
 from random import randrange
+from tempfile import TemporaryFile
 import sys
 import re
 from itertools import groupby
 from operator import attrgetter
+from threading import Thread, Lock, Timer
 from distutils.version import StrictVersion
 
 
@@ -107,34 +111,98 @@ def findUser():
             quietRun( 'whoami' ).strip() )
 
 
+def runParallel( tasks ):
+    """Run functions concurrently, one thread each, and wait for them
+       tasks: list of functions (with no arguments) to call
+       raises: first exception raised by any task"""
+    errors = []
+
+    def run( task ):
+        "Run task, saving any exception"
+        try:
+            task()
+        # pylint: disable=broad-except
+        except Exception:
+            errors.append( sys.exc_info() )
+        # pylint: enable=broad-except
+
+    threads = [ Thread( target=run, args=( task, ) ) for task in tasks ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        # Re-raise with the original traceback
+        etype, value, tb = errors[ 0 ]
+        raise etype, value, tb
+
+
+def killGroup( pid ):
+    "Kill process group pid, if it still exists"
+    try:
+        os.killpg( pid, SIGKILL )
+    except OSError:
+        pass
+
+def runWithTimeout( cmd, timeout ):
+    """Run a command, killing it if it takes too long
+       cmd: command (list)
+       timeout: timeout in seconds
+       returns: output (stdout and stderr), exit code or None
+                if we timed out"""
+    # The command is usually a wrapper (sudo, su, sh) around ssh, so
+    # we run it in its own session and kill the whole group; killing
+    # just the wrapper would leave ssh holding our pipe open
+    popen = Popen( cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT,
+                   close_fds=True, preexec_fn=os.setsid )
+    killer = Timer( timeout, killGroup, args=( popen.pid, ) )
+    killer.start()
+    out, _err = popen.communicate( '' )
+    timedOut = not killer.is_alive()
+    killer.cancel()
+    return out, None if timedOut else popen.returncode
+
+
 class ClusterCleanup( object ):
     "Cleanup callback"
 
     inited = False
     serveruser = {}
+    timeout = 60  # seconds per server
 
     @classmethod
     def add( cls, server, user='' ):
         "Add an entry to server: user dict"
         if not cls.inited:
             addCleanupCallback( cls.cleanup )
+            cls.inited = True
         if not user:
             user = findUser()
         cls.serveruser[ server ] = user
 
     @classmethod
     def cleanup( cls ):
-        "Clean up"
+        "Clean up all servers in parallel"
         info( '*** Cleaning up cluster\n' )
-        for server, user in cls.serveruser.iteritems():
-            if server == 'localhost':
-                # Handled by mininet.clean.cleanup()
-                continue
-            else:
-                cmd = [ 'su', user, '-c',
-                        'ssh %s@%s sudo mn -c' % ( user, server ) ]
-                info( cmd, '\n' )
-                info( quietRun( cmd ) )
+        results = {}
+
+        def clean( server, user ):
+            "Clean up server"
+            cmd = [ 'su', user, '-c',
+                    'ssh %s@%s sudo mn -c' % ( user, server ) ]
+            info( cmd, '\n' )
+            results[ server ] = runWithTimeout( cmd, cls.timeout )
+
+        # localhost is handled by mininet.clean.cleanup()
+        runParallel( [ lambda s=server, u=user: clean( s, u )
+                       for server, user in cls.serveruser.iteritems()
+                       if server != 'localhost' ] )
+        for server in sorted( results ):
+            output, code = results[ server ]
+            info( output )
+            if code is None:
+                error( '*** Cleanup of %s timed out after %ds\n' %
+                       ( server, cls.timeout ) )
 
 # BL note: so little code is required for remote nodes,
 # we will probably just want to update the main Node()
@@ -251,6 +319,18 @@ def rcmd( self, *cmd, **opts):
                 break
         return result
 
+    def rcmds( self, cmds, sudo=True ):
+        """rcmds: run a batch of commands on underlying server
+           in root namespace, using a single remote shell
+           cmds: list of command strings
+           sudo: run commands as root?
+           returns: combined stdout and stderr"""
+        if not cmds:
+            return ''
+        popen = self.rpopen( [ 'sh', '-s' ], sudo=sudo, tt=False )
+        out, _err = popen.communicate( '\n'.join( cmds ) + '\n' )
+        return out
+
     @staticmethod
     def _ignoreSignal():
         "Detach from process group to ignore all signals"
@@ -350,6 +430,9 @@ def batchShutdown( cls, switches, **_kwargs ):
 class RemoteLink( Link ):
     "A RemoteLink is a link between nodes which may be on different servers"
 
+    # Tunnels aren't veths, so TCIntf has to probe them
+    vethPairs = False
+
     def __init__( self, node1, node2, **kwargs ):
         """Initialize a RemoteLink
            see Link() for parameters"""
@@ -482,6 +565,17 @@ class RemoteGRELink( RemoteLink ):
     "Remote link using GRE tunnels"
 
     GRE_KEY = 0
+    keyLock = Lock()  # tunnels may be created in parallel
+
+    # ip link type and options for tunnel interfaces
+    tunnelType = 'gretap'
+    tunnelOpts = 'ttl 64 key %(key)d'
+
+    # ( node name, intf name ) for tunnel intfs created by makeTunnels()
+    prepared = set()
+
+    # Local source IP address for each remote server IP
+    srcIPs = {}
 
     def __init__(self, node1, node2, **kwargs):
         RemoteLink.__init__( self, node1, node2, **kwargs )
@@ -520,41 +614,123 @@ def makeIntfPair( self, intfname1, intfname2, addr1=None, addr2=None,
             self.makeTunnel( node1, node2, intfname1, intfname2, addr1, addr2 )
             self.tunnel = 1
 
+    @classmethod
+    def srcIP( cls, remoteIP ):
+        "Return the IP of the local interface that connects to remoteIP"
+        if remoteIP not in cls.srcIPs:
+            output = quietRun( 'ip route get %s' % remoteIP )
+            cls.srcIPs[ remoteIP ] = output.split( ' src ' )[ 1 ].split()[ 0 ]
+        return cls.srcIPs[ remoteIP ]
+
+    @classmethod
+    def tunnelIPs( cls, node1, node2 ):
+        "Return local and remote tunnel IP addresses for node1"
+        IP1, IP2 = node1.serverIP, node2.serverIP
+        # GRE tunnel needs to be set up with the IP of the local interface
+        # that connects the remote node, NOT '127.0.0.1' of localhost,
+        # whichever end is local
+        if node1.server == 'localhost':
+            IP1 = cls.srcIP( IP2 )
+        elif node2.server == 'localhost':
+            IP2 = cls.srcIP( IP1 )
+        return IP1, IP2
+
+    @classmethod
+    def nextKey( cls ):
+        "Return a new tunnel key"
+        with cls.keyLock:
+            cls.GRE_KEY += 1
+            return cls.GRE_KEY
+
+    @classmethod
+    def tunnelCmds( cls, node, intfname, addr, local, remote, key ):
+        """Return ip -batch commands to create, configure and move
+           a tunnel intf into node"""
+        cmds = [ 'link add name %s type %s local %s remote %s %s' % (
+                 intfname, cls.tunnelType, local, remote,
+                 cls.tunnelOpts % { 'key': key } ) ]
+        if addr:
+            cmds.append( 'link set %s address %s' % ( intfname, addr ) )
+        cmds += [ 'link set dev %s up mtu 1450' % intfname,
+                  'link set %s netns %s' % ( intfname, node.pid ) ]
+        return cmds
+
+    @staticmethod
+    def runBatch( node, intfnames, cmds ):
+        """Run ip commands on node's server using a single remote shell
+           and a single ip -batch, first deleting any stale intfs
+           node: node whose server we run on
+           intfnames: tunnel intfs to delete first
+           cmds: ip -batch commands
+           raises: Exception on error"""
+        script = [ 'ip -force -batch - 2>/dev/null <<EOF' ]
+        script += [ 'link delete %s' % intfname for intfname in intfnames ]
+        script += [ 'EOF', 'ip -batch - <<EOF' ] + cmds + [ 'EOF' ]
+        result = node.rcmds( script )
+        if result:
+            raise Exception( 'error creating tunnels on %s: %s'
+                             % ( node.server, result ) )
+
+    @classmethod
+    def makeTunnels( cls, specs ):
+        """Create many tunnels at once, using one remote command
+           per server; makeTunnel() will then use the prepared intfs
+           specs: list of ( node1, node2, intfname1, intfname2,
+                  addr1, addr2 ) for cross-server links"""
+        batches = {}  # server -> ( node, intfnames, cmds )
+        for node1, node2, intfname1, intfname2, addr1, addr2 in specs:
+            assert node1.server != node2.server
+            key = cls.nextKey()
+            IP1, IP2 = cls.tunnelIPs( node1, node2 )
+            for node, intfname, addr, local, remote in (
+                    ( node1, intfname1, addr1, IP1, IP2 ),
+                    ( node2, intfname2, addr2, IP2, IP1 ) ):
+                _node, intfnames, cmds = batches.setdefault(
+                    node.server, ( node, [], [] ) )
+                intfnames.append( intfname )
+                cmds += cls.tunnelCmds( node, intfname, addr,
+                                        local, remote, key )
+        debug( '\n*** Making %d %s tunnels on %d servers\n' %
+               ( len( specs ), cls.tunnelType, len( batches ) ) )
+        for node, intfnames, cmds in batches.values():
+            cls.runBatch( node, intfnames, cmds )
+        for node1, node2, intfname1, intfname2, _addr1, _addr2 in specs:
+            cls.prepared.add( ( node1.name, intfname1 ) )
+            cls.prepared.add( ( node2.name, intfname2 ) )
+
     def makeTunnel(self, node1, node2, intfname1, intfname2,
                        addr1=None, addr2=None):
         "Make a tunnel across switches on different servers"
         # We should never try to create a tunnel to ourselves!
         assert node1.server != node2.server
+        # Tunnel may have been created already by makeTunnels()
+        ends = ( node1.name, intfname1 ), ( node2.name, intfname2 )
+        if all( end in self.prepared for end in ends ):
+            self.prepared.difference_update( ends )
+            return
         if node2.server == 'localhost':
             return self.makeTunnel( node2, node1, intfname2, intfname1,
                                     addr2, addr1 )
-        IP1, IP2 = node1.serverIP, node2.serverIP
-        # GRE tunnel needs to be set up with the IP of the local interface
-        # that connects the remote node, NOT '127.0.0.1' of localhost
-        if node1.server == 'localhost':
-            output = quietRun('ip route get %s' % node2.serverIP)
-            IP1 = output.split(' src ')[1].split()[0]
-        debug( '\n*** Make GRE tunnel ' + node1.server + ':' + intfname1 +
-               ' == ' + node2.server + ':' + intfname2 )
-        tun1 = 'local ' + IP1 + ' remote ' + IP2
-        tun2 = 'local ' + IP2 + ' remote ' + IP1
-        self.__class__.GRE_KEY += 1
-        for (node, intfname, addr, tun) in [(node1, intfname1, addr1, tun1),
-                                            (node2, intfname2, addr2, tun2)]:
-            node.rcmd('ip link delete ' + intfname)
-            result = node.rcmd('ip link add name ' + intfname + ' type gretap '
-                               + tun + ' ttl 64 key '
-                               + str( self.__class__.GRE_KEY) )
-            if result:
-                raise Exception('error creating gretap on %s: %s'
-                                % (node, result))
-            if addr:
-                node.rcmd('ip link set %s address %s' % (intfname, addr))
+        debug( '\n*** Make %s tunnel ' % self.tunnelType + node1.server +
+               ':' + intfname1 + ' == ' + node2.server + ':' + intfname2 )
+        IP1, IP2 = self.tunnelIPs( node1, node2 )
+        key = self.nextKey()
+        for node, intfname, addr, local, remote in (
+                ( node1, intfname1, addr1, IP1, IP2 ),
+                ( node2, intfname2, addr2, IP2, IP1 ) ):
+            self.runBatch( node, [ intfname ],
+                           self.tunnelCmds( node, intfname, addr,
+                                            local, remote, key ) )
+
 
-            node.rcmd('ip link set dev %s up' % intfname)
-            node.rcmd('ip link set dev %s mtu 1450' % intfname)
-            if not self.moveIntf(intfname, node):
-                raise Exception('interface move failed on node %s' % node)
+class RemoteVXLANLink( RemoteGRELink ):
+    """Remote link using VXLAN tunnels: all tunnels between a pair
+       of servers share one UDP port, multiplexed by VNI"""
+
+    GRE_KEY = 0  # used as VNI
+
+    tunnelType = 'vxlan'
+    tunnelOpts = 'id %(key)d dstport 4789 ttl 64'
 
 
 # Some simple placement algorithms for MininetCluster
@@ -563,7 +739,8 @@ class Placer( object ):
     "Node placement algorithm for MininetCluster"
 
     def __init__( self, servers=None, nodes=None, hosts=None,
-                  switches=None, controllers=None, links=None ):
+                  switches=None, controllers=None, links=None,
+                  linkInfo=None, nodeInfo=None ):
         """Initialize placement object
            servers: list of servers
            nodes: list of all nodes
@@ -571,6 +748,8 @@ def __init__( self, servers=None, nodes=None, hosts=None,
            switches: list of switches
            controllers: list of controllers
            links: list of links
+           linkInfo: list of ( src, dst, params ) for links
+           nodeInfo: dict of node: params
            (all arguments are optional)
            returns: server"""
         self.servers = servers or []
@@ -579,6 +758,9 @@ def __init__( self, servers=None, nodes=None, hosts=None,
         self.switches = switches or []
         self.controllers = controllers or []
         self.links = links or []
+        self.linkInfo = linkInfo or [ ( src, dst, {} )
+                                      for src, dst in self.links ]
+        self.nodeInfo = nodeInfo or {}
 
     def place( self, node ):
         "Return server for a given node"
@@ -723,6 +905,138 @@ def place( self, nodename ):
         return server
 
 
+class MinCutPlacer( Placer ):
+    """Partition the topology graph so as to minimize the number
+       (or total bandwidth) of cross-server links, while keeping
+       the load on each server balanced.
+       Links are weighted by their bw parameter (if any; links
+       without bw get the mean bw), and nodes are weighted by 1
+       plus their share of cpu (if any), so that both node count
+       and CPU reservations are balanced."""
+
+    def __init__( self, *args, **kwargs ):
+        """imbalance: allowed load above the mean per server (.05)
+           passes: maximum number of refinement passes (10)"""
+        self.imbalance = kwargs.pop( 'imbalance', .05 )
+        self.passes = kwargs.pop( 'passes', 10 )
+        Placer.__init__( self, *args, **kwargs )
+        self.nodes = self.nodes or self.hosts + self.switches
+        self.graph = self.weightedGraph()
+        self.weight = self.nodeWeights()
+        self.placement = self.calculatePlacement()
+
+    def weightedGraph( self ):
+        "Return adjacency dict of node: { neighbor: link weight }"
+        bws = [ float( params[ 'bw' ] ) for _src, _dst, params
+                in self.linkInfo if params.get( 'bw' ) ]
+        default = sum( bws ) / len( bws ) if bws else 1.0
+        graph = { node: {} for node in self.nodes }
+        for src, dst, params in self.linkInfo:
+            if src == dst:
+                continue
+            weight = float( params.get( 'bw' ) or default )
+            for a, b in ( src, dst ), ( dst, src ):
+                neighbors = graph.setdefault( a, {} )
+                neighbors[ b ] = neighbors.get( b, 0 ) + weight
+        return graph
+
+    def nodeWeights( self ):
+        "Return dict of node: load weight"
+        cpus = { node: float( self.nodeInfo.get( node, {} ).get( 'cpu' )
+                              or 0 ) for node in self.graph }
+        total = sum( cpus.values() )
+        if not total:
+            return { node: 1.0 for node in self.graph }
+        # Scale cpu so that total cpu weight equals node count
+        scale = len( cpus ) / total
+        return { node: 1.0 + cpu * scale for node, cpu in cpus.items() }
+
+    def calculatePlacement( self ):
+        "Grow initial partitions, then refine them"
+        nodes = [ node for node in self.nodes if node in self.graph ]
+        nodes += sorted( set( self.graph ) - set( nodes ) )
+        if not self.servers or not nodes:
+            return {}
+        target = sum( self.weight.values() ) / len( self.servers )
+        placement = self.grow( nodes, target )
+        self.refine( nodes, placement,
+                     target * ( 1 + self.imbalance ) )
+        return placement
+
+    def grow( self, nodes, target ):
+        """Initial partition by graph growing: fill each server with
+           a connected region, preferring the most strongly connected
+           unplaced neighbor
+           nodes: nodes in placement order
+           target: load per server
+           returns: placement dict"""
+        placement = {}
+        order = { node: i for i, node in enumerate( nodes ) }
+        seeds = iter( nodes )
+        for index, server in enumerate( self.servers ):
+            last = index == len( self.servers ) - 1
+            load, frontier = 0.0, {}  # frontier: node -> connection
+            while len( placement ) < len( nodes ) and (
+                    last or load < target ):
+                if frontier:
+                    node = max( frontier, key=lambda n: ( frontier[ n ],
+                                                          -order[ n ] ) )
+                    del frontier[ node ]
+                else:
+                    node = next( n for n in seeds if n not in placement )
+                placement[ node ] = server
+                load += self.weight[ node ]
+                for neighbor, weight in self.graph[ node ].items():
+                    if neighbor not in placement:
+                        frontier[ neighbor ] = (
+                            frontier.get( neighbor, 0 ) + weight )
+        return placement
+
+    def refine( self, nodes, placement, capacity ):
+        """Greedy refinement: move nodes to the server they are most
+           connected to, as long as this reduces the cut and keeps
+           that server under capacity
+           nodes: nodes in placement order
+           placement: placement dict (updated)
+           capacity: maximum load per server"""
+        load = dict.fromkeys( self.servers, 0.0 )
+        for node, server in placement.items():
+            load[ server ] += self.weight[ node ]
+        for _ in range( self.passes ):
+            moved = False
+            for node in nodes:
+                current = placement[ node ]
+                conn = {}
+                for neighbor, weight in self.graph[ node ].items():
+                    server = placement[ neighbor ]
+                    conn[ server ] = conn.get( server, 0 ) + weight
+                best, bestGain = None, 0
+                for server, weight in sorted( conn.items() ):
+                    gain = weight - conn.get( current, 0 )
+                    if ( server != current and gain > bestGain and
+                         load[ server ] + self.weight[ node ] <= capacity ):
+                        best, bestGain = server, gain
+                if best:
+                    placement[ node ] = best
+                    load[ current ] -= self.weight[ node ]
+                    load[ best ] += self.weight[ node ]
+                    moved = True
+            if not moved:
+                break
+
+    def cut( self ):
+        "Return total weight of cross-server links"
+        return sum( weight for node, neighbors in self.graph.items()
+                    for neighbor, weight in neighbors.items()
+                    if self.placement[ node ] != self.placement[ neighbor ]
+                    ) / 2
+
+    def place( self, node ):
+        """Return server for node, placing unknown nodes
+           (e.g. controllers) on the first server"""
+        return self.placement.get( node, self.servers[ 0 ] )
+
+
 # The MininetCluster class is not strictly necessary.
 # However, it has several purposes:
 # 1. To set up ssh connection sharing/multiplexing
@@ -743,11 +1057,13 @@ def __init__( self, *args, **kwargs ):
         """servers: a list of servers to use (note: include
            localhost or None to use local system as well)
            user: user name for server ssh
-           placement: Placer() subclass"""
+           placement: Placer() subclass
+           parallel: build nodes and links on all servers concurrently"""
         params = { 'host': RemoteHost,
                    'switch': RemoteOVSSwitch,
                    'link': RemoteLink,
-                   'precheck': True }
+                   'precheck': True,
+                   'parallel': False }
         params.update( kwargs )
         servers = params.pop( 'servers', [ 'localhost' ] )
         servers = [ s if s else 'localhost' for s in servers ]
@@ -761,9 +1077,11 @@ def __init__( self, *args, **kwargs ):
             self.precheck()
         self.connections = {}
         self.placement = params.pop( 'placement', SwitchBinPlacer )
+        self.parallel = params.pop( 'parallel' )
         # Make sure control directory exists
         self.cdir = os.environ[ 'HOME' ] + '/.ssh/mn'
         errRun( [ 'mkdir', '-p', self.cdir ] )
+        self.startConnections()
         Mininet.__init__( self, *args, **params )
 
     def popen( self, cmd ):
@@ -774,38 +1092,141 @@ def popen( self, cmd ):
         signal( SIGINT, old )
         return conn
 
+    def startConnections( self ):
+        """Start a persistent ssh ControlMaster connection to each
+           remote server; remote nodes on that server share it
+           (via controlPath) rather than each ssh command paying
+           for its own connection setup and authentication"""
+        for server in self.servers:
+            if server == 'localhost' or ( None, server ) in self.connections:
+                continue
+            dest = '%s@%s' % ( self.user, self.serverIP[ server ] )
+            cfile = '%s/%s' % ( self.cdir, server )
+            # -M: master mode, -N: no command, -f: background after auth
+            cmd = [ 'sudo', '-E', '-u', self.user ] + self.sshcmd
+            cmd += [ '-M', '-N', '-f', '-o', 'ControlPath=' + cfile,
+                     '-o', 'ControlPersist=yes', dest ]
+            debug( ' '.join( cmd ), '\n' )
+            # The backgrounded master may keep its stdio open, so we
+            # can't wait for EOF on pipes as errRun() does; we just
+            # wait for the foreground ssh to exit
+            with open( os.devnull, 'r+' ) as devnull, \
+                    TemporaryFile() as errfile:
+                code = Popen( cmd, stdin=devnull, stdout=devnull,
+                              stderr=errfile ).wait()
+                errfile.seek( 0 )
+                err = errfile.read()
+            if code != 0:
+                error( '*** Could not start shared connection to %s: %s\n'
+                       % ( server, err ) )
+                continue
+            self.connections[ ( None, server ) ] = ( dest, cfile, cmd )
+
+    def stopConnections( self ):
+        "Shut down shared ssh connections"
+        for ( _src, server ), ( dest, cfile, _cmd ) in (
+                self.connections.items() ):
+            debug( '*** Closing shared connection to %s\n' % server )
+            errRun( [ 'sudo', '-E', '-u', self.user, 'ssh', '-O', 'exit',
+                      '-o', 'ControlPath=' + cfile, dest ] )
+        self.connections = {}
+
+    def stop( self ):
+        "Stop network and shut down shared connections"
+        Mininet.stop( self )
+        self.stopConnections()
+
     def baddLink( self, *args, **kwargs ):
         "break addlink for testing"
         pass
 
-    def precheck( self ):
-        """Pre-check to make sure connection works and that
-           we can call sudo without a password"""
-        result = 0
+    def precheck( self, timeout=15 ):
+        """Pre-check all servers in parallel to make sure that the
+           connection works, that we can call sudo without a password,
+           that mnexec is installed, and that each server can reach
+           every other server
+           timeout: timeout in seconds for each server's checks"""
         info( '*** Checking servers\n' )
-        for server in self.servers:
-            ip = self.serverIP[ server ]
-            if not server or server == 'localhost':
-                continue
-            info( server, '' )
-            dest = '%s@%s' % ( self.user, ip )
-            cmd = [ 'sudo', '-E', '-u', self.user ]
-            cmd += self.sshcmd + [ '-n', dest, 'sudo true' ]
+        checks = [ 'ssh', 'sudo', 'mnexec' ]
+        results = {}  # server -> { check: ok }
+
+        def targetIP( server, other ):
+            "IP address which server should use to reach other"
+            ip = self.serverIP[ other ]
+            if other == 'localhost' and server != 'localhost':
+                # Use our address on the route to server
+                output = quietRun( 'ip route get %s' %
+                                   self.serverIP[ server ] )
+                if ' src ' in output:
+                    ip = output.split( ' src ' )[ 1 ].split()[ 0 ]
+            return ip
+
+        def check( server ):
+            "Run all checks for server in a single command"
+            others = [ other for other in self.servers if other != server ]
+            script = ( 'sudo -n true && echo sudo:ok; '
+                       'which mnexec > /dev/null && echo mnexec:ok; ' )
+            for other in others:
+                script += ( '( ping -c 1 -W %d %s > /dev/null 2>&1 && '
+                            'echo %s:ok ) & ' % (
+                                timeout / 2, targetIP( server, other ),
+                                other ) )
+            script += 'wait'
+            if server == 'localhost':
+                cmd = [ 'sh', '-c', script ]
+            else:
+                dest = '%s@%s' % ( self.user, self.serverIP[ server ] )
+                cmd = [ 'sudo', '-E', '-u', self.user ] + self.sshcmd
+                cmd += [ '-n', '-o', 'ConnectTimeout=%d' % timeout,
+                         dest, script ]
             debug( ' '.join( cmd ), '\n' )
-            _out, _err, code = errRun( cmd )
-            if code != 0:
-                error( '\nstartConnection: server connection check failed '
-                       'to %s using command:\n%s\n'
-                        % ( server, ' '.join( cmd ) ) )
-            result |= code
-        if result:
+            try:
+                output, code = runWithTimeout( cmd, timeout )
+            except OSError as e:
+                # e.g. sudo or ssh is not installed
+                error( '*** %s: could not run %s: %s\n' %
+                       ( server, cmd[ 0 ], e ) )
+                output, code = '', None
+            passed = set( line.split( ':' )[ 0 ]
+                          for line in output.splitlines()
+                          if line.endswith( ':ok' ) )
+            # ssh returns 255 if it couldn't connect
+            if code is not None and code != 255:
+                passed.add( 'ssh' )
+            if server == 'localhost':
+                # We are already root here
+                passed.add( 'sudo' )
+            results[ server ] = { name: name in passed
+                                  for name in checks + others }
+
+        runParallel( [ lambda s=server: check( s )
+                       for server in self.servers ] )
+        # Print a consolidated table: one row per server, with a
+        # reachability column for each server
+        columns = checks + self.servers
+        width = max( len( name ) for name in columns + [ 'server' ] ) + 1
+        table = [ ''.join( name.ljust( width )
+                           for name in [ 'server' ] + columns ) ]
+        for server in self.servers:
+            row = [ server ] + [
+                '-' if name == server else
+                'ok' if results[ server ][ name ] else 'FAIL'
+                for name in columns ]
+            table.append( ''.join( col.ljust( width ) for col in row ) )
+        failed = any( not ok for server in self.servers
+                      for ok in results[ server ].values() )
+        if not failed:
+            info( '\n'.join( table ) + '\n' )
+        else:
+            error( '\n'.join( table ) + '\n' )
             error( '*** Server precheck failed.\n'
-                   '*** Make sure that the above ssh command works'
-                   ' correctly.\n'
+                   '*** Make sure that passwordless ssh and sudo work'
+                   ' for %s on all servers,\n'
+                   '*** that Mininet is installed, and that all servers'
+                   ' can reach each other.\n'
                    '*** You may also need to run mn -c on all nodes, and/or\n'
-                   '*** use sudo -E.\n' )
+                   '*** use sudo -E.\n' % self.user )
             sys.exit( 1 )
-        info( '\n' )
 
     def modifiedaddHost( self, *args, **kwargs ):
         "Slightly modify addHost"
@@ -824,7 +1245,10 @@ def placeNodes( self ):
                                  nodes=self.topo.nodes(),
                                  hosts=self.topo.hosts(),
                                  switches=self.topo.switches(),
-                                 links=self.topo.links() )
+                                 links=self.topo.links(),
+                                 linkInfo=self.topo.links( withInfo=True ),
+                                 nodeInfo={ node: self.topo.nodeInfo( node )
+                                            for node in nodes } )
         for node in nodes:
             config = self.topo.nodeInfo( node )
             # keep local server name consistent accross nodes
@@ -850,12 +1274,121 @@ def addController( self, *args, **kwargs ):
             Intf( 'eth0', node=controller ).updateIP()
         return controller
 
-    def buildFromTopo( self, *args, **kwargs ):
+    def buildFromTopo( self, topo=None ):
         "Start network"
         info( '*** Placing nodes\n' )
         self.placeNodes()
         info( '\n' )
-        Mininet.buildFromTopo( self, *args, **kwargs )
+        if self.parallel:
+            self.buildParallel( topo )
+        else:
+            Mininet.buildFromTopo( self, topo )
+
+    def buildParallel( self, topo ):
+        """Build network from topo with one thread per server:
+           each server's nodes and internal links are created
+           concurrently, followed by cross-server links, which are
+           created in rounds of concurrent, disjoint server pairs
+           topo: Topo object, with nodes already placed"""
+        info( '*** Creating network\n' )
+        self.addDefaultControllers()
+        # Assign addresses and ports here, in topo order, so that
+        # they don't depend on thread scheduling
+        self.addresses.reserveTopo( topo )
+        nodeParams, links = self.topoParams( topo )
+        nodeSpecs = {}  # server -> [ ( name, cls, params ) ]
+        for name in topo.hosts():
+            params = self.hostDefaults( **nodeParams[ name ] )
+            cls = params.pop( 'cls', self.host )
+            nodeSpecs.setdefault( params[ 'server' ], [] ).append(
+                ( name, cls, params ) )
+        for name in topo.switches():
+            params = self.switchDefaults( name, **nodeParams[ name ] )
+            cls = params.pop( 'cls', self.switch )
+            nodeSpecs.setdefault( params[ 'server' ], [] ).append(
+                ( name, cls, params ) )
+        linkSpecs = {}  # frozenset( servers ) -> [ ( index, params ) ]
+        for index, ( src, dst, params ) in enumerate( links ):
+            servers = frozenset( ( topo.nodeInfo( src )[ 'server' ],
+                                   topo.nodeInfo( dst )[ 'server' ] ) )
+            linkSpecs.setdefault( servers, [] ).append(
+                ( index, dict( params ) ) )
+        nodes, newLinks = {}, {}
+
+        def addLinks( specs ):
+            "Create links for ( index, params ) specs"
+            for index, params in specs:
+                params[ 'node1' ] = nodes[ params[ 'node1' ] ]
+                params[ 'node2' ] = nodes[ params[ 'node2' ] ]
+                newLinks[ index ] = self.addLink( **params )
+
+        def addTunnelLinks( specs ):
+            "Create cross-server links, batching tunnel setup if possible"
+            tunnels = {}  # link class -> tunnel specs
+            for _index, params in specs:
+                cls = params.get( 'cls', self.link )
+                if ( not hasattr( cls, 'makeTunnels' ) or
+                     'port1' not in params or 'port2' not in params ):
+                    continue
+                node1, node2 = nodes[ params[ 'node1' ] ], nodes[
+                    params[ 'node2' ] ]
+                # Choose MACs and intf names here, as addLink() and
+                # Link() would, so that the link uses prepared intfs
+                for addr in 'addr1', 'addr2':
+                    if addr not in params:
+                        params[ addr ] = self.addresses.linkMac(
+                            explicit=True )
+                params.setdefault( 'intfName1', '%s-eth%s' % (
+                    node1, params[ 'port1' ] ) )
+                params.setdefault( 'intfName2', '%s-eth%s' % (
+                    node2, params[ 'port2' ] ) )
+                tunnels.setdefault( cls, [] ).append( (
+                    node1, node2, params[ 'intfName1' ],
+                    params[ 'intfName2' ], params[ 'addr1' ],
+                    params[ 'addr2' ] ) )
+            for cls, tunnelSpecs in tunnels.items():
+                cls.makeTunnels( tunnelSpecs )
+            addLinks( specs )
+
+        def buildServer( server ):
+            "Create nodes and internal links on server"
+            for name, cls, params in nodeSpecs.get( server, [] ):
+                nodes[ name ] = cls( name, **params )
+            addLinks( linkSpecs.pop( frozenset( [ server ] ), [] ) )
+
+        info( '*** Adding nodes and links on %d servers\n' %
+              len( nodeSpecs ) )
+        with timer.phase( 'spawn' ):
+            runParallel( [ lambda s=server: buildServer( s )
+                           for server in nodeSpecs ] )
+        # Add nodes to net in topo order
+        for name in topo.hosts():
+            self.hosts.append( nodes[ name ] )
+            self.nameToNode[ name ] = nodes[ name ]
+        for name in topo.switches():
+            self.switches.append( nodes[ name ] )
+            self.nameToNode[ name ] = nodes[ name ]
+        # Cross-server links: each round handles server pairs which
+        # have no server in common, so no node is touched by two threads
+        info( '*** Adding links between %d server pairs\n' %
+              len( linkSpecs ) )
+        with timer.phase( 'links' ):
+            pending = sorted( linkSpecs, key=sorted )
+            while pending:
+                busy, batch = set(), []
+                for pair in list( pending ):
+                    if not busy & pair:
+                        busy |= pair
+                        batch.append( linkSpecs[ pair ] )
+                        pending.remove( pair )
+                runParallel( [ lambda specs=specs: addTunnelLinks( specs )
+                               for specs in batch ] )
+        # Keep net.links in topo order
+        newSet = set( newLinks.values() )
+        self.links = ( [ link for link in self.links
+                         if link not in newSet ] +
+                       [ newLinks[ index ] for index in sorted( newLinks ) ] )
+        info( '\n' )
 
 
 def testNsTunnels( remote='ubuntu2', link=RemoteGRELink ):
@@ -4,7 +4,7 @@
 
 from mininet.examples.cluster import ( MininetCluster, SwitchBinPlacer,
                                        RemoteLink )
-# ^ Could also use: RemoteSSHLink, RemoteGRELink
+# ^ Could also use: RemoteSSHLink, RemoteGRELink, RemoteVXLANLink
 from mininet.topolib import TreeTopo
 from mininet.log import setLogLevel
 from mininet.examples.clustercli import ClusterCLI as CLI
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""
+Test the min-cut placer for cluster edition
+(no servers are needed, since we only test placement)
+"""
+
+import unittest
+
+from mininet.examples.cluster import MinCutPlacer
+from mininet.topo import Topo
+from mininet.topolib import TorusTopo
+
+
+def placer( topo, servers, **kwargs ):
+    "Return MinCutPlacer for topo"
+    return MinCutPlacer( servers=servers, nodes=topo.nodes(),
+                         hosts=topo.hosts(), switches=topo.switches(),
+                         links=topo.links(),
+                         linkInfo=topo.links( withInfo=True ), **kwargs )
+
+
+class testMinCutPlacer( unittest.TestCase ):
+
+    def testTorus( self ):
+        "An 8x8 torus should be split into balanced quadrants"
+        p = placer( TorusTopo( 8, 8 ), [ 'a', 'b', 'c', 'd' ] )
+        counts = {}
+        for server in p.placement.values():
+            counts[ server ] = counts.get( server, 0 ) + 1
+        self.assertEqual( sorted( counts.values() ), [ 32 ] * 4 )
+        self.assertEqual( p.cut(), 32 )
+
+    def testBandwidth( self ):
+        "The cut should avoid high-bandwidth links"
+        topo = Topo()
+        for i in range( 4 ):
+            topo.addSwitch( 's%d' % ( i + 1 ) )
+        # s1 -- s2 and s3 -- s4 are fat; the ring closes with thin links
+        topo.addLink( 's1', 's2', bw=1000 )
+        topo.addLink( 's2', 's3', bw=1 )
+        topo.addLink( 's3', 's4', bw=1000 )
+        topo.addLink( 's4', 's1', bw=1 )
+        p = placer( topo, [ 'a', 'b' ] )
+        self.assertEqual( p.place( 's1' ), p.place( 's2' ) )
+        self.assertEqual( p.place( 's3' ), p.place( 's4' ) )
+        self.assertNotEqual( p.place( 's1' ), p.place( 's3' ) )
+        self.assertEqual( p.cut(), 2 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+"""
+Test runWithTimeout() for cluster edition
+(no servers are needed, since we run local commands)
+"""
+
+import unittest
+from time import time
+
+from mininet.examples.cluster import runWithTimeout
+
+
+class testRunWithTimeout( unittest.TestCase ):
+
+    def testOutput( self ):
+        "Commands that finish in time should return output and exit code"
+        self.assertEqual( runWithTimeout( [ 'sh', '-c', 'echo ok; exit 3' ],
+                                          5 ), ( 'ok\n', 3 ) )
+
+    def testForking( self ):
+        "The timeout should also kill children of the command"
+        start = time()
+        _out, code = runWithTimeout( [ 'sh', '-c', 'sleep 6; echo done' ],
+                                     .5 )
+        self.assertEqual( code, None )
+        self.assertLess( time() - start, 3 )
+
+
+if __name__ == '__main__':
+    unittest.main()
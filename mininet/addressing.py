@@ -0,0 +1,271 @@
+"""
+addressing.py: address allocation for Mininet networks
+
+AddressPlanner hands out host IP addresses, link MAC addresses and
+switch DPIDs, making sure that nothing is allocated twice and that
+automatically allocated addresses never collide with addresses that
+were specified explicitly:
+
+    addresses = AddressPlanner( ipBase='10.0.0.0/8' )
+    addresses.reserveTopo( topo )
+    params = addresses.hostParams( autoSetMacs=True )
+    mac = addresses.linkMac()
+    dpid = addresses.dpid( 's1' )
+
+Allocation is deterministic: host addresses are allocated in order
+from ipBase, as Mininet always has, link MACs are allocated in order
+from a locally administered base address (rather than at random), and
+DPIDs are derived from switch names (s1 -> 1).
+
+Addresses can be released (e.g. when a node is deleted) with
+release(), so that a node that is removed and added again gets the
+same address and DPID. Explicitly specified addresses that collide
+with addresses we have already allocated produce a warning.
+
+plan() allocates everything for a topology in one pass, returning a
+build plan (see Topo.makePlan()). Given subnetLen, each switch gets
+its own block of host addresses (e.g. hosts on s1 get 10.0.1.x and
+hosts on s2 get 10.0.2.x), which makes addresses easy to route and
+easy to read; hosts still use ipBase's prefix length, so the network
+remains a single subnet. The plan's 'subnets' entry maps each switch
+to its block, for generating routing tables.
+"""
+
+from itertools import count
+import re
+
+from mininet.log import warn
+from mininet.util import ipAdd, ipParse, netParse, macColonHex
+
+
+class AddressPlanner( object ):
+    "Allocate IP addresses, MAC addresses and DPIDs without collisions"
+
+    def __init__( self, ipBase='10.0.0.0/8', macBase=0x020000000000,
+                  subnetLen=None ):
+        """ipBase: base IP address for hosts
+           macBase: base for link MAC addresses (locally administered)
+           subnetLen: prefix length of per-switch address blocks
+             (used by plan(); default: no per-switch blocks)"""
+        self.ipBase = ipBase
+        self.ipBaseNum, self.prefixLen = netParse( ipBase )
+        self.maxHost = 0xffffffff >> self.prefixLen
+        hostIP = self.maxHost & self.ipBaseNum
+        self.nextHost = hostIP if hostIP > 0 else 1
+        self.lastHost = None
+        self.macs = count( macBase + 1 )
+        self.subnetLen = subnetLen
+        # Addresses in use: IP strings, MACs and DPIDs as ints
+        self.usedIPs, self.usedMacs, self.usedDpids = set(), set(), set()
+        # Addresses we allocated: ( 'ip' | 'mac' | 'dpid', address )
+        self.allocated = set()
+
+    # Reservations
+
+    @staticmethod
+    def macNum( mac ):
+        "Return MAC address string as an int"
+        return int( mac.replace( ':', '' ), 16 )
+
+    @staticmethod
+    def dpidNum( dpid ):
+        "Return DPID string as an int"
+        return int( dpid.replace( ':', '' ), 16 )
+
+    def addresses( self, ip=None, mac=None, dpid=None ):
+        """Return ( kind, name, key, used set ) for the given addresses
+           ip: IP address (with optional /prefix)
+           mac: MAC address
+           dpid: DPID (hex string)"""
+        addrs = []
+        if ip:
+            addrs.append( ( 'ip', ip, ip.split( '/' )[ 0 ], self.usedIPs ) )
+        if mac:
+            addrs.append( ( 'mac', mac, self.macNum( mac ), self.usedMacs ) )
+        if dpid:
+            addrs.append( ( 'dpid', dpid, self.dpidNum( dpid ),
+                            self.usedDpids ) )
+        return addrs
+
+    def reserve( self, ip=None, mac=None, dpid=None ):
+        """Mark explicitly specified addresses as used
+           ip: IP address (with optional /prefix)
+           mac: MAC address
+           dpid: DPID (hex string)"""
+        for kind, name, key, used in self.addresses( ip, mac, dpid ):
+            if ( kind, key ) in self.allocated:
+                warn( '*** Warning: %s %s is already in use\n' %
+                      ( kind, name ) )
+                self.allocated.discard( ( kind, key ) )
+            used.add( key )
+
+    def release( self, ip=None, mac=None, dpid=None ):
+        """Mark addresses as free again, e.g. when a node is deleted
+           ip: IP address (with optional /prefix)
+           mac: MAC address
+           dpid: DPID (hex string)"""
+        for kind, _name, key, used in self.addresses( ip, mac, dpid ):
+            used.discard( key )
+            self.allocated.discard( ( kind, key ) )
+            if kind == 'ip':
+                # Reuse released host addresses, in order
+                num = ipParse( key )
+                if num & ~self.maxHost == self.ipBaseNum & ~self.maxHost:
+                    self.nextHost = min( self.nextHost, num & self.maxHost )
+
+    def reserveTopo( self, topo ):
+        "Reserve all addresses specified explicitly in topo"
+        for name in topo.nodes( sort=False ):
+            info = topo.nodeInfo( name )
+            self.reserve( ip=info.get( 'ip' ), mac=info.get( 'mac' ),
+                          dpid=info.get( 'dpid' ) )
+        for _src, _dst, info in topo.iterLinks( withInfo=True ):
+            self.reserve( mac=info.get( 'addr1' ) )
+            self.reserve( mac=info.get( 'addr2' ) )
+
+    # Allocation
+
+    def allocHost( self, start=None, end=None, autoSetMacs=False ):
+        """Allocate the next free host number
+           start, end: host number range (default: all of ipBase)
+           autoSetMacs: the MAC derived from the number must be free too
+           returns: host number"""
+        end = self.maxHost if end is None else end
+        host = self.nextHost if start is None else start
+        while ( ipAdd( host, ipBaseNum=self.ipBaseNum,
+                       prefixLen=self.prefixLen ) in self.usedIPs or
+                ( autoSetMacs and host in self.usedMacs ) ):
+            host += 1
+        if host >= end:
+            raise Exception( 'AddressPlanner: out of host addresses '
+                             'in %s' % self.ipBase )
+        if start is None:
+            self.nextHost = host + 1
+        ip = ipAdd( host, ipBaseNum=self.ipBaseNum, prefixLen=self.prefixLen )
+        self.usedIPs.add( ip )
+        self.allocated.add( ( 'ip', ip ) )
+        if autoSetMacs:
+            self.usedMacs.add( host )
+            self.allocated.add( ( 'mac', host ) )
+        self.lastHost = host
+        return host
+
+    def hostParams( self, autoSetMacs=False, ip=None, start=None,
+                    end=None ):
+        """Allocate the next free host address
+           autoSetMacs: also return a MAC derived from the address
+           ip: explicitly specified IP address (optional)
+           start, end: host number range (default: all of ipBase)
+           returns: { 'ip': ip/prefixLen, 'mac': mac } as needed"""
+        params = {}
+        if ip:
+            self.reserve( ip=ip )
+            host = ipParse( ip.split( '/' )[ 0 ] ) & self.maxHost
+        else:
+            host = self.allocHost( start, end, autoSetMacs )
+            params[ 'ip' ] = '%s/%s' % (
+                ipAdd( host, ipBaseNum=self.ipBaseNum,
+                       prefixLen=self.prefixLen ), self.prefixLen )
+        if autoSetMacs:
+            self.usedMacs.add( host )
+            self.allocated.add( ( 'mac', host ) )
+            params[ 'mac' ] = macColonHex( host )
+        return params
+
+    def linkMac( self, explicit=False ):
+        """Allocate the next free link MAC address
+           explicit: caller will pass the MAC on as an explicit address
+             (e.g. to Mininet.addLink()), so don't warn when it's
+             reserved"""
+        # count() is thread-safe, so links may be added concurrently
+        mac = next( self.macs )
+        while mac in self.usedMacs:
+            mac = next( self.macs )
+        self.usedMacs.add( mac )
+        if not explicit:
+            self.allocated.add( ( 'mac', mac ) )
+        return macColonHex( mac )
+
+    def dpid( self, name, dpid=None ):
+        """Allocate a DPID for a switch
+           name: switch name (s1 -> 1)
+           dpid: explicitly specified dpid (optional)
+           returns: dpid as hex string, or None if name has no number"""
+        if dpid:
+            self.reserve( dpid=dpid )
+            return dpid
+        nums = re.findall( r'\d+', name )
+        if not nums:
+            return None
+        num = int( nums[ 0 ] )
+        if num in self.usedDpids:
+            free = max( self.usedDpids ) + 1
+            warn( '*** Warning: dpid %x for %s is in use; using %x\n' %
+                  ( num, name, free ) )
+            num = free
+        self.usedDpids.add( num )
+        self.allocated.add( ( 'dpid', num ) )
+        # Switch pads the dpid to its own length
+        return '%x' % num
+
+    # Whole-topology planning
+
+    def subnets( self, switches ):
+        """Return per-switch host number ranges
+           switches: switch names, in order
+           returns: { switch: ( start, end ) }"""
+        size = 1 << ( 32 - self.subnetLen )
+        if self.subnetLen < self.prefixLen or (
+                size * ( len( switches ) + 1 ) > self.maxHost ):
+            raise Exception( 'AddressPlanner: %s is too small for %d '
+                             '/%d subnets' % ( self.ipBase, len( switches ),
+                                               self.subnetLen ) )
+        # Block 0 is left for hosts that aren't attached to a switch
+        return { switch: ( ( i + 1 ) * size + 1, ( i + 2 ) * size - 1 )
+                 for i, switch in enumerate( switches ) }
+
+    def plan( self, topo, autoSetMacs=False ):
+        """Allocate addresses, dpids and interface names for topo
+           topo: Topo
+           autoSetMacs: set host MACs from their IP addresses
+           returns: build plan (see Topo.makePlan())"""
+        self.reserveTopo( topo )
+        switches = topo.switches()
+        nodes, subnets, ranges = {}, {}, {}
+        if self.subnetLen:
+            ranges = self.subnets( switches )
+            for switch, ( start, _end ) in ranges.iteritems():
+                subnets[ switch ] = '%s/%s' % (
+                    ipAdd( start - 1, ipBaseNum=self.ipBaseNum,
+                           prefixLen=self.prefixLen ), self.subnetLen )
+        # Hosts are numbered in the same order as buildFromTopo(), and
+        # (given subnetLen) allocated from the block of the first switch
+        # they are linked to
+        nexts = { switch: start for switch, ( start, _end ) in
+                  ranges.iteritems() }
+        for name in topo.hosts():
+            ip = topo.nodeInfo( name ).get( 'ip' )
+            neighbors = topo.g.edge.get( name, {} )
+            switch = topo.sorted( node for node in neighbors
+                                  if node in ranges )
+            if ip or not switch:
+                nodes[ name ] = self.hostParams( autoSetMacs, ip=ip )
+                continue
+            switch = switch[ 0 ]
+            start, end = nexts[ switch ], ranges[ switch ][ 1 ]
+            nodes[ name ] = self.hostParams( autoSetMacs, start=start,
+                                             end=end )
+            nexts[ switch ] = self.lastHost + 1
+        for name in switches:
+            dpid = self.dpid( name, topo.nodeInfo( name ).get( 'dpid' ) )
+            nodes[ name ] = { 'dpid': dpid } if dpid else {}
+        links = []
+        for node1, node2, key, info in topo.links( sort=True, withKeys=True,
+                                                   withInfo=True ):
+            params = { 'intfName1': '%s-eth%s' % ( node1, info[ 'port1' ] ),
+                       'intfName2': '%s-eth%s' % ( node2, info[ 'port2' ] ),
+                       'addr1': self.linkMac(), 'addr2': self.linkMac() }
+            links.append( ( node1, node2, key, params ) )
+        return { 'ipBase': self.ipBase, 'autoSetMacs': autoSetMacs,
+                 'subnetLen': self.subnetLen, 'subnets': subnets,
+                 'nodes': nodes, 'links': links }
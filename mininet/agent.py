@@ -0,0 +1,300 @@
+"""
+agent.py: a multiplexed command agent for Mininet nodes
+
+Normally, each node is a bash shell that talks to Mininet over its own
+pty, and Node.monitor() looks for sentinel characters in its output
+to find the end of each command's output. With thousands of nodes,
+that means thousands of shells, ptys and file descriptors.
+
+Instead, a single agent process can hold the namespace fds of many
+nodes and run commands in any of them on request:
+
+    agent = NamespaceAgent()
+    agent.add( 'h1', h1.pid )
+    out, err, exitcode = agent.run( 'h1', 'ip addr show' )
+
+Requests and replies are framed (a 4-byte length followed by a JSON
+object) and sent over a single socketpair. Each reply carries the
+command's stdout, stderr and exit status separately, so no output
+parsing is needed. The agent runs commands concurrently, so replies
+may arrive out of order; each request has an id which is echoed in
+its reply.
+
+The agent is started using mnexec -c, and talks to us over its stdin.
+It exits when we close our end of the socket.
+
+AgentHost (in mininet.node) uses a shared NamespaceAgent for cmd()
+and pexec().
+"""
+
+from socket import socketpair, fromfd, AF_UNIX, SOCK_STREAM
+from select import poll, POLLIN, POLLHUP
+from subprocess import Popen
+from threading import Lock
+from itertools import count
+import json
+import os
+import struct
+import sys
+
+from mininet.log import debug
+from mininet.util import setns, CLONE_NEWNET, CLONE_NEWNS
+
+
+# Framing: 4-byte big-endian length, followed by a JSON object
+
+HEADER = struct.Struct( '!I' )
+
+def encodeFrame( obj ):
+    "Return obj as a frame"
+    data = json.dumps( obj )
+    return HEADER.pack( len( data ) ) + data
+
+def decodeFrames( buf ):
+    """Decode complete frames from buf
+       buf: received data
+       returns: list of objects, remaining data"""
+    objs = []
+    while len( buf ) >= HEADER.size:
+        size, = HEADER.unpack( buf[ :HEADER.size ] )
+        end = HEADER.size + size
+        if len( buf ) < end:
+            break
+        objs.append( json.loads( buf[ HEADER.size:end ] ) )
+        buf = buf[ end: ]
+    return objs, buf
+
+# JSON can't carry arbitrary bytes, so we send output as latin-1,
+# which maps each byte to one code point
+
+def toText( data ):
+    "Encode command output for JSON"
+    return data.decode( 'latin-1' )
+
+def fromText( text ):
+    "Decode command output from JSON"
+    return text.encode( 'latin-1' )
+
+
+class Agent( object ):
+    "Agent side: run commands in node namespaces on request"
+
+    def __init__( self, sock ):
+        "sock: connected socket to serve requests from"
+        self.sock = sock
+        self.namespaces = {}  # node -> ( net fd, mnt fd or None )
+        self.jobs = {}  # pipe fd -> running command (dict)
+        self.poller = poll()
+        self.inbuf = ''
+
+    def serve( self ):
+        "Serve requests until our socket is closed"
+        sockfd = self.sock.fileno()
+        self.poller.register( sockfd, POLLIN )
+        while True:
+            for fd, _event in self.poller.poll():
+                if fd == sockfd:
+                    data = self.sock.recv( 65536 )
+                    if not data:
+                        return
+                    reqs, self.inbuf = decodeFrames( self.inbuf + data )
+                    for req in reqs:
+                        self.handle( req )
+                else:
+                    self.readJob( fd )
+
+    def reply( self, req, **result ):
+        "Send reply to request"
+        result[ 'id' ] = req.get( 'id' )
+        self.sock.sendall( encodeFrame( result ) )
+
+    def handle( self, req ):
+        "Handle a request"
+        op = req.get( 'op' )
+        try:
+            if op == 'add':
+                self.add( req[ 'node' ], req[ 'pid' ] )
+                self.reply( req, exitcode=0 )
+            elif op == 'del':
+                for fd in self.namespaces.pop( req[ 'node' ], () ):
+                    if fd is not None:
+                        os.close( fd )
+                self.reply( req, exitcode=0 )
+            elif op == 'run':
+                self.spawn( req )
+            else:
+                raise Exception( 'unknown op %s' % op )
+        # pylint: disable=broad-except
+        except Exception as e:
+            self.reply( req, error=str( e ), exitcode=-1 )
+        # pylint: enable=broad-except
+
+    def add( self, node, pid ):
+        "Open and hold namespace fds for node's pid"
+        net = os.open( '/proc/%d/ns/net' % pid, os.O_RDONLY )
+        try:
+            mnt = os.open( '/proc/%d/ns/mnt' % pid, os.O_RDONLY )
+        except OSError:
+            mnt = None
+        self.namespaces[ node ] = ( net, mnt )
+
+    def spawn( self, req ):
+        """Start a command in a node's namespace
+           req: { node, args (list) or shell (string), merge (bool) }"""
+        net, mnt = self.namespaces[ req[ 'node' ] ]
+        if 'args' in req:
+            args = [ str( arg ) for arg in req[ 'args' ] ]
+        else:
+            args = [ 'sh', '-c', req[ 'shell' ] ]
+        merge = req.get( 'merge', False )
+        outr, outw = os.pipe()
+        errr, errw = ( None, outw ) if merge else os.pipe()
+        cwd = os.getcwd()
+        pid = os.fork()
+        if pid == 0:
+            # Child: enter namespaces, like mnexec -a, and run command
+            try:
+                setns( net, CLONE_NEWNET )
+                if mnt is not None:
+                    setns( mnt, CLONE_NEWNS )
+                    os.chdir( cwd )
+                devnull = os.open( os.devnull, os.O_RDONLY )
+                os.dup2( devnull, 0 )
+                os.dup2( outw, 1 )
+                os.dup2( errw, 2 )
+                # Close everything else (cheaper than closing every
+                # possible fd up to the limit)
+                for fd in os.listdir( '/proc/self/fd' ):
+                    if int( fd ) > 2:
+                        try:
+                            os.close( int( fd ) )
+                        except OSError:
+                            pass
+                os.execvp( args[ 0 ], args )
+            # pylint: disable=broad-except
+            except Exception as e:
+                os.write( 2, '%s: %s\n' % ( args[ 0 ], e ) )
+            # pylint: enable=broad-except
+            os._exit( 127 )
+        job = { 'req': req, 'pid': pid, 'out': [], 'err': [], 'open': 0 }
+        for r, w, name in ( outr, outw, 'out' ), ( errr, errw, 'err' ):
+            if r is None:
+                continue
+            os.close( w )
+            job[ 'open' ] += 1
+            self.jobs[ r ] = ( job, name )
+            self.poller.register( r, POLLIN | POLLHUP )
+
+    def readJob( self, fd ):
+        "Read output from a running command, and reply when it's done"
+        job, name = self.jobs[ fd ]
+        data = os.read( fd, 65536 )
+        if data:
+            job[ name ].append( data )
+            return
+        # EOF
+        self.poller.unregister( fd )
+        os.close( fd )
+        del self.jobs[ fd ]
+        job[ 'open' ] -= 1
+        if job[ 'open' ] == 0:
+            _pid, status = os.waitpid( job[ 'pid' ], 0 )
+            exitcode = ( os.WEXITSTATUS( status ) if os.WIFEXITED( status )
+                         else -os.WTERMSIG( status ) )
+            self.reply( job[ 'req' ], exitcode=exitcode,
+                        out=toText( ''.join( job[ 'out' ] ) ),
+                        err=toText( ''.join( job[ 'err' ] ) ) )
+
+
+class NamespaceAgent( object ):
+    "Client side: start an agent and send it requests"
+
+    def __init__( self ):
+        ours, theirs = socketpair( AF_UNIX, SOCK_STREAM )
+        # Make sure the agent can import us
+        env = dict( os.environ )
+        env[ 'PYTHONPATH' ] = os.pathsep.join(
+            [ os.path.dirname( os.path.dirname( __file__ ) ) ] +
+            [ p for p in [ env.get( 'PYTHONPATH' ) ] if p ] )
+        # mnexec -c: close all descriptors except stdin/out/err
+        self.process = Popen( [ 'mnexec', '-c', sys.executable,
+                                '-m', 'mininet.agent' ],
+                              stdin=theirs.fileno(), env=env,
+                              close_fds=True )
+        theirs.close()
+        self.sock = ours
+        self.ids = count( 1 )
+        self.sendLock = Lock()
+        self.recvLock = Lock()
+        self.inbuf = ''
+        self.replies = {}  # id -> reply not yet collected
+        self.nodes = set()  # nodes we hold namespaces for
+        debug( '*** Started namespace agent %d\n' % self.process.pid )
+
+    def request( self, **req ):
+        """Send a request and wait for its reply
+           returns: reply dict"""
+        with self.sendLock:
+            req[ 'id' ] = next( self.ids )
+            self.sock.sendall( encodeFrame( req ) )
+        # Replies may arrive in any order, so collect other threads'
+        # replies for them while waiting for ours
+        while True:
+            with self.recvLock:
+                if req[ 'id' ] in self.replies:
+                    return self.replies.pop( req[ 'id' ] )
+                data = self.sock.recv( 65536 )
+                if not data:
+                    raise Exception( 'namespace agent exited' )
+                replies, self.inbuf = decodeFrames( self.inbuf + data )
+                for reply in replies:
+                    self.replies[ reply[ 'id' ] ] = reply
+
+    def check( self, reply ):
+        "Raise an exception if reply is an error"
+        if 'error' in reply:
+            raise Exception( 'namespace agent: %s' % reply[ 'error' ] )
+        return reply
+
+    def add( self, node, pid ):
+        """Add a node's namespaces to the agent
+           node: node name
+           pid: pid of a process in the node's namespaces"""
+        self.check( self.request( op='add', node=node, pid=pid ) )
+        self.nodes.add( node )
+
+    def remove( self, node ):
+        """Release a node's namespaces
+           node: node name"""
+        self.nodes.discard( node )
+        self.check( self.request( op='del', node=node ) )
+
+    def run( self, node, cmd, merge=False ):
+        """Run a command in a node's namespaces
+           node: node name
+           cmd: shell command string, or list of args
+           merge: merge stderr into stdout
+           returns: out, err, exitcode"""
+        if isinstance( cmd, basestring ):
+            reply = self.request( op='run', node=node, shell=cmd,
+                                  merge=merge )
+        else:
+            reply = self.request( op='run', node=node, args=cmd,
+                                  merge=merge )
+        self.check( reply )
+        return ( fromText( reply[ 'out' ] ), fromText( reply[ 'err' ] ),
+                 reply[ 'exitcode' ] )
+
+    def alive( self ):
+        "Is the agent still running?"
+        return self.process.poll() is None
+
+    def stop( self ):
+        "Stop the agent"
+        self.sock.close()
+        self.process.wait()
+
+
+if __name__ == '__main__':
+    # We are the agent: our stdin is the socket
+    Agent( fromfd( 0, AF_UNIX, SOCK_STREAM ) ).serve()
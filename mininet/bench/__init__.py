@@ -0,0 +1,6 @@
+"""
+Benchmarks for Mininet
+
+scaling: build/start/pingall/stop time, memory and fd usage
+         across topology sizes, link types and switch types
+"""
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+"""
+scaling.py: build/teardown scaling benchmark for Mininet
+
+For each combination of topology, size, link class and switch class,
+we create a network and measure:
+
+- build, start, pingall and stop times (seconds)
+- per-phase timings from mininet.perf (spawn, links, tc, ...)
+- resident memory of Mininet itself and of its node processes (KB)
+- open file descriptors in the Mininet process
+
+Results are written as JSON (one record per run) and optionally
+CSV, so that they can be compared across versions. Given a baseline
+results file, we report (and exit nonzero on) any run which is
+slower than the baseline by more than a given threshold.
+
+Example:
+
+    sudo python -m mininet.bench.scaling --topos linear,tree \\
+        --sizes 16,64 --links default,tc --switches ovs,lxbr \\
+        --output bench.json --compare baseline.json
+
+Note: pingall is O(n^2), so it is only run up to --maxping hosts,
+and it is skipped for topologies with loops (torus).
+"""
+
+from optparse import OptionParser
+from math import log
+from time import time
+import json
+import os
+import sys
+
+from mininet.clean import cleanup
+from mininet.log import setLogLevel, info, error, warn
+from mininet.net import Mininet
+from mininet.node import OVSSwitch, OVSBridge, DefaultController
+from mininet.nodelib import LinuxBridge
+from mininet.link import Link, TCLink
+from mininet.perf import timer
+from mininet.topo import SingleSwitchTopo, LinearTopo
+from mininet.topolib import TreeTopo, TorusTopo
+from mininet.util import ensureRoot
+
+
+# Topologies of approximately n hosts
+
+def treeTopo( n ):
+    "Binary tree with about n hosts"
+    return TreeTopo( depth=max( 1, int( round( log( n, 2 ) ) ) ), fanout=2 )
+
+def torusTopo( n ):
+    "Square torus with about n hosts"
+    side = max( 3, int( round( n ** .5 ) ) )
+    return TorusTopo( side, side )
+
+TOPOS = { 'single': lambda n: SingleSwitchTopo( k=n ),
+          'linear': lambda n: LinearTopo( k=n ),
+          'tree': treeTopo,
+          'torus': torusTopo }
+
+# Topologies with loops, which we can't pingall without STP
+LOOPY = ( 'torus', )
+
+LINKS = { 'default': Link, 'tc': TCLink }
+
+# Link parameters for TCLink, so that tc is actually exercised
+TCPARAMS = { 'bw': 100, 'delay': '1ms' }
+
+SWITCHES = { 'ovs': OVSSwitch, 'ovsbr': OVSBridge, 'lxbr': LinuxBridge }
+
+# Switches which need an OpenFlow controller
+NEEDSCONTROLLER = ( 'ovs', )
+
+# Measured values that we compare against a baseline
+METRICS = ( 'build', 'start', 'pingall', 'stop' )
+
+
+def rssKB( pid='self' ):
+    "Return resident set size of a process in KB, or 0"
+    try:
+        with open( '/proc/%s/status' % pid ) as f:
+            for line in f:
+                if line.startswith( 'VmRSS:' ):
+                    return int( line.split()[ 1 ] )
+    except IOError:
+        pass
+    return 0
+
+def fdCount():
+    "Return number of open file descriptors in this process"
+    return len( os.listdir( '/proc/self/fd' ) )
+
+def nodeRssKB( net ):
+    "Return total resident memory of net's node shells in KB"
+    return sum( rssKB( node.pid ) for node in net.values() if node.pid )
+
+
+def runOne( topoName, size, linkName, switchName, maxPing=64 ):
+    """Benchmark one configuration
+       topoName: key in TOPOS
+       size: approximate number of hosts
+       linkName: key in LINKS
+       switchName: key in SWITCHES
+       maxPing: largest network to run pingall on
+       returns: result dict"""
+    topo = TOPOS[ topoName ]( size )
+    link = LINKS[ linkName ]
+    if link is TCLink:
+        for src, dst, key in topo.links( withKeys=True ):
+            topo.linkInfo( src, dst, key ).update( TCPARAMS )
+    controller = ( DefaultController if switchName in NEEDSCONTROLLER
+                   else None )
+    result = { 'topo': topoName, 'size': size, 'link': linkName,
+               'switch': switchName, 'hosts': len( topo.hosts() ),
+               'switches': len( topo.switches() ),
+               'links': len( topo.links() ),
+               'rss0': rssKB(), 'fds0': fdCount() }
+    timer.enable()
+    start = time()
+    net = Mininet( topo=topo, switch=SWITCHES[ switchName ], link=link,
+                   controller=controller, build=False )
+    net.build()
+    result[ 'build' ] = time() - start
+    start = time()
+    net.start()
+    result[ 'start' ] = time() - start
+    result.update( rss=rssKB(), fds=fdCount(), noderss=nodeRssKB( net ) )
+    result[ 'pingall' ] = None
+    if topoName not in LOOPY and len( net.hosts ) <= maxPing:
+        if controller:
+            net.waitConnected( timeout=30 )
+        start = time()
+        result[ 'loss' ] = net.pingAll()
+        result[ 'pingall' ] = time() - start
+    start = time()
+    net.stop()
+    result[ 'stop' ] = time() - start
+    result[ 'phases' ] = { name: hist.total
+                           for name, hist in timer.phases.iteritems() }
+    timer.enable( False )
+    return result
+
+
+def compare( results, baseline, threshold ):
+    """Compare results with baseline results
+       results: list of result dicts
+       baseline: list of baseline result dicts
+       threshold: allowed slowdown as a fraction (e.g. .2 for 20%)
+       returns: list of regression descriptions"""
+    def key( r ):
+        "Configuration key for result r"
+        return r[ 'topo' ], r[ 'size' ], r[ 'link' ], r[ 'switch' ]
+    base = { key( r ): r for r in baseline }
+    regressions = []
+    for r in results:
+        b = base.get( key( r ) )
+        if not b:
+            continue
+        for metric in METRICS:
+            new, old = r.get( metric ), b.get( metric )
+            if new is None or not old:
+                continue
+            if new > old * ( 1 + threshold ):
+                regressions.append( '%s %s: %.3fs vs. %.3fs (+%d%%)' % (
+                    '/'.join( str( k ) for k in key( r ) ), metric,
+                    new, old, 100 * ( new - old ) / old ) )
+    return regressions
+
+
+def writeCSV( results, filename ):
+    """Write results as CSV
+       results: list of result dicts
+       filename: output file name"""
+    phases = sorted( set( name for r in results
+                          for name in r.get( 'phases', {} ) ) )
+    fields = [ 'topo', 'size', 'link', 'switch', 'hosts', 'switches',
+               'links' ] + list( METRICS ) + [ 'rss', 'noderss', 'fds' ]
+    with open( filename, 'w' ) as f:
+        f.write( ','.join( fields + [ 'phase_' + p for p in phases ] ) +
+                 '\n' )
+        for r in results:
+            values = [ r.get( field ) for field in fields ]
+            values += [ r.get( 'phases', {} ).get( p ) for p in phases ]
+            f.write( ','.join( '' if v is None else str( v )
+                               for v in values ) + '\n' )
+
+
+def parseArgs():
+    "Parse command line options"
+    opts = OptionParser( description='Mininet build/teardown '
+                         'scaling benchmark' )
+    opts.add_option( '--topos', default='single,linear,tree',
+                     help='|'.join( sorted( TOPOS ) ) + ' (comma-separated)' )
+    opts.add_option( '--sizes', default='4,16,64',
+                     help='approximate host counts (comma-separated)' )
+    opts.add_option( '--links', default='default,tc',
+                     help='|'.join( sorted( LINKS ) ) + ' (comma-separated)' )
+    opts.add_option( '--switches', default='ovs,ovsbr,lxbr',
+                     help='|'.join( sorted( SWITCHES ) ) +
+                     ' (comma-separated)' )
+    opts.add_option( '--maxping', type='int', default=64,
+                     help='largest network to run pingall on' )
+    opts.add_option( '--output', default='bench.json',
+                     help='JSON results file' )
+    opts.add_option( '--csv', default=None, help='CSV results file' )
+    opts.add_option( '--compare', default=None,
+                     help='baseline JSON results file' )
+    opts.add_option( '--threshold', type='float', default=.2,
+                     help='allowed slowdown vs. baseline (.2 = 20%)' )
+    opts.add_option( '--verbosity', '-v', default='warning',
+                     help='log level' )
+    options, _args = opts.parse_args()
+    return options
+
+
+def main():
+    "Run benchmarks as specified on the command line"
+    options = parseArgs()
+    setLogLevel( options.verbosity )
+    ensureRoot()
+    results = []
+    for topoName in options.topos.split( ',' ):
+        for size in [ int( s ) for s in options.sizes.split( ',' ) ]:
+            for linkName in options.links.split( ',' ):
+                for switchName in options.switches.split( ',' ):
+                    config = '%s/%s/%s/%s' % ( topoName, size, linkName,
+                                               switchName )
+                    info( '*** Benchmarking', config, '\n' )
+                    try:
+                        result = runOne( topoName, size, linkName,
+                                         switchName,
+                                         maxPing=options.maxping )
+                    # pylint: disable=broad-except
+                    except Exception as e:
+                        error( '*** %s failed: %s\n' % ( config, e ) )
+                        timer.enable( False )
+                        cleanup()
+                        continue
+                    # pylint: enable=broad-except
+                    results.append( result )
+                    warn( '%s: build %.3f start %.3f stop %.3f\n' % (
+                        config, result[ 'build' ], result[ 'start' ],
+                        result[ 'stop' ] ) )
+    with open( options.output, 'w' ) as f:
+        json.dump( results, f, indent=1, sort_keys=True )
+    if options.csv:
+        writeCSV( results, options.csv )
+    if options.compare:
+        with open( options.compare ) as f:
+            baseline = json.load( f )
+        regressions = compare( results, baseline, options.threshold )
+        for regression in regressions:
+            error( '*** Regression: %s\n' % regression )
+        if regressions:
+            sys.exit( 1 )
+
+
+if __name__ == '__main__':
+    main()
@@ -34,7 +34,8 @@
 import os
 import atexit
 
-from mininet.log import info, output, error
+from mininet.log import lg, info, output, error
+from mininet.link import Intf
 from mininet.term import makeTerms, runX11
 from mininet.util import ( quietRun, dumpNodeConnections,
                            dumpPorts )
@@ -57,7 +58,13 @@ def __init__( self, mininet, stdin=sys.stdin, script=None ):
         self.inPoller = poll()
         self.inPoller.register( stdin )
         self.inputFile = script
+        # Cache of node name -> IP address for name substitution
+        self.ipCache = {}
+        self.ipEpoch = Intf.addrEpoch
         Cmd.__init__( self )
+        # Our prompt and command output must not overtake buffered
+        # log output
+        lg.setBuffered( False )
         info( '*** Starting CLI:\n' )
 
         if self.inputFile:
@@ -161,8 +168,9 @@ def do_net( self, _line ):
     def do_sh( self, line ):
         """Run an external shell command
            Usage: sh [cmd args]"""
-        assert self  # satisfy pylint and allow override
         call( line, shell=True )
+        # The command may have changed node addresses
+        self.invalidateIPs()
 
     # do_py() and do_px() need to catch any exception during eval()/exec()
     # pylint: disable=broad-except
@@ -170,6 +178,7 @@ def do_sh( self, line ):
     def do_py( self, line ):
         """Evaluate a Python expression.
            Node names may be used, e.g.: py h1.cmd('ls')"""
+        self.invalidateIPs()
         try:
             result = eval( line, globals(), self.getLocals() )
             if not result:
@@ -187,6 +196,7 @@ def do_py( self, line ):
     def do_px( self, line ):
         """Execute a Python statement.
             Node names may be used, e.g.: px print h1.cmd('ls')"""
+        self.invalidateIPs()
         try:
             exec( line, globals(), self.getLocals() )
         except Exception as e:
@@ -397,6 +407,27 @@ def do_switch( self, line ):
                 error( 'invalid command: '
                        'switch <switch name> {start, stop}\n' )
 
+    def nodeIP( self, name ):
+        """Return IP address of a node's default interface, using
+           our cache unless an interface address may have changed.
+           name: node name
+           returns: IP address or None"""
+        if self.ipEpoch != Intf.addrEpoch:
+            self.invalidateIPs()
+        if name not in self.ipCache:
+            intf = self.mn[ name ].defaultIntf()
+            self.ipCache[ name ] = intf.updateIP() if intf else None
+        return self.ipCache[ name ]
+
+    def invalidateIPs( self, name=None ):
+        """Invalidate cached IP addresses
+           name: node name, or None to invalidate all nodes"""
+        if name is None:
+            self.ipCache.clear()
+            self.ipEpoch = Intf.addrEpoch
+        else:
+            self.ipCache.pop( name, None )
+
     def default( self, line ):
         """Called on an input line when the command prefix is not recognized.
            Overridden to run shell commands when a node is the first
@@ -413,14 +444,16 @@ def default( self, line ):
             node = self.mn[ first ]
             rest = args.split( ' ' )
             # Substitute IP addresses for node names in command
-            # If updateIP() returns None, then use node name
-            rest = [ self.mn[ arg ].defaultIntf().updateIP() or arg
+            # If nodeIP() returns None, then use node name
+            rest = [ self.nodeIP( arg ) or arg
                      if arg in self.mn else arg
                      for arg in rest ]
             rest = ' '.join( rest )
             # Run cmd on node:
             node.sendCmd( rest )
             self.waitForNode( node )
+            # The command may have reconfigured the node's addresses
+            self.invalidateIPs( first )
         else:
             error( '*** Unknown command: %s\n' % line )
 
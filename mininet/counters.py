@@ -0,0 +1,253 @@
+"""
+counters.py: per-interface traffic counters for Mininet
+
+IntfCounters samples the traffic counters of every interface in a
+network at a fixed interval and keeps the samples in a bounded ring
+buffer, so that link utilization can be watched across thousands of
+ports without perturbing the experiment:
+
+    counters = IntfCounters( net, interval=.5 )
+    counters.start()
+    ... run experiment ...
+    counters.stop()
+    counters.writeCSV( 'counters.csv' )
+
+Samples can also be exported as JSON, or served in Prometheus text
+format over HTTP while the experiment is running:
+
+    counters.serve( port=9100 )
+
+Rather than forking a command (or entering a namespace) per node per
+sample, we read /proc/<pid>/net/dev, which reports the counters of
+the network namespace that <pid> belongs to. Note that we can't
+simply read /sys/class/net/<intf>/statistics, since sysfs shows the
+network namespace of whoever mounted it rather than that of the
+reader. We read each namespace once per sample, keep the proc files
+open (rereading them from the start), and store samples as flat
+arrays of unsigned integers. Interfaces of nodes that we can't read
+locally (remote nodes, or nodes without a pid) read as zero.
+"""
+
+from array import array
+from collections import deque
+from threading import Thread, Event
+from time import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+import json
+
+from mininet.log import info, error
+from mininet.util import namespace
+
+
+# Fields of /proc/net/dev, in order
+NETDEV = ( 'rx_bytes', 'rx_packets', 'rx_errs', 'rx_drop', 'rx_fifo',
+           'rx_frame', 'rx_compressed', 'rx_multicast',
+           'tx_bytes', 'tx_packets', 'tx_errs', 'tx_drop', 'tx_fifo',
+           'tx_colls', 'tx_carrier', 'tx_compressed' )
+
+
+def parseNetDev( text, fields=NETDEV ):
+    """Parse /proc/net/dev
+       text: contents of /proc/<pid>/net/dev
+       fields: fields to return (subset of NETDEV)
+       returns: { intf: [ field values ] }"""
+    cols = [ NETDEV.index( field ) for field in fields ]
+    result = {}
+    # The first two lines are headers
+    for line in text.splitlines()[ 2: ]:
+        name, sep, values = line.partition( ':' )
+        if not sep:
+            continue
+        values = values.split()
+        result[ name.strip() ] = [ int( values[ col ] ) for col in cols ]
+    return result
+
+
+class IntfCounters( object ):
+    "Periodically sample traffic counters for a network's interfaces"
+
+    fields = ( 'rx_bytes', 'rx_packets', 'rx_drop',
+               'tx_bytes', 'tx_packets', 'tx_drop' )
+
+    def __init__( self, net, interval=1.0, size=600, intfs=None ):
+        """net: Mininet network
+           interval: sampling interval in seconds
+           size: number of samples to keep
+           intfs: list of Intfs to sample (default: all but lo)"""
+        self.interval = interval
+        self.samples = deque( maxlen=size )  # ( time, array ) in order
+        if intfs is None:
+            intfs = [ intf for node in net.values()
+                      for intf in node.intfList() if intf.name != 'lo' ]
+        self.intfs = intfs
+        self.labels = [ ( intf.node.name, intf.name ) for intf in intfs ]
+        self.namespaces = self.groupByNamespace( intfs )
+        self.files = {}  # pid -> open /proc/<pid>/net/dev
+        self.thread = None
+        self.stopped = Event()
+        self.server = None
+
+    @staticmethod
+    def groupByNamespace( intfs ):
+        """Group interfaces by network namespace, so that each namespace
+           is read only once per sample
+           intfs: list of Intfs (of local nodes; others are skipped)
+           returns: [ ( pid, [ ( index, intf name ) ] ) ]"""
+        namespaces = {}
+        for index, intf in enumerate( intfs ):
+            pid = getattr( intf.node, 'pid', None )
+            if pid is None or getattr( intf.node, 'isRemote', False ):
+                continue
+            namespaces.setdefault( namespace( pid ), ( pid, [] ) )[
+                1 ].append( ( index, intf.name ) )
+        return namespaces.values()
+
+    def readNetDev( self, pid ):
+        """Return the contents of /proc/<pid>/net/dev, keeping it open
+           pid: pid of a process in the namespace to read
+           returns: file contents, or None if unreadable"""
+        try:
+            f = self.files.get( pid )
+            if f is None:
+                f = self.files[ pid ] = open( '/proc/%d/net/dev' % pid )
+            f.seek( 0 )
+            return f.read()
+        except IOError:
+            # Process is gone; try again next time
+            f = self.files.pop( pid, None )
+            if f:
+                f.close()
+            return None
+
+    def sample( self ):
+        "Record one sample of all counters"
+        nfields = len( self.fields )
+        values = array( 'L', [ 0 ] ) * ( len( self.intfs ) * nfields )
+        now = time()
+        for pid, intfs in self.namespaces:
+            text = self.readNetDev( pid )
+            if not text:
+                continue
+            stats = parseNetDev( text, self.fields )
+            for index, name in intfs:
+                counts = stats.get( name )
+                if counts:
+                    start = index * nfields
+                    values[ start:start + nfields ] = array( 'L', counts )
+        self.samples.append( ( now, values ) )
+
+    def run( self ):
+        "Sample until stopped"
+        while not self.stopped.is_set():
+            start = time()
+            self.sample()
+            self.stopped.wait( max( 0, self.interval - ( time() - start ) ) )
+
+    def start( self ):
+        "Start sampling in a background thread"
+        if self.thread:
+            return
+        info( '*** Sampling %d interfaces every %.3fs\n' %
+              ( len( self.intfs ), self.interval ) )
+        self.stopped.clear()
+        self.thread = Thread( target=self.run, name='IntfCounters' )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop( self ):
+        "Stop sampling and serving"
+        if self.thread:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def rows( self ):
+        """Iterate over samples
+           returns: ( time, node, intf, values ) for each intf/sample"""
+        nfields = len( self.fields )
+        for now, values in list( self.samples ):
+            for index, ( node, intf ) in enumerate( self.labels ):
+                start = index * nfields
+                yield now, node, intf, values[ start:start + nfields ]
+
+    def writeCSV( self, filename ):
+        """Write samples as CSV
+           filename: output file name"""
+        with open( filename, 'w' ) as f:
+            f.write( ','.join( ( 'time', 'node', 'intf' ) + self.fields ) +
+                     '\n' )
+            for now, node, intf, values in self.rows():
+                f.write( '%.6f,%s,%s,%s\n' % (
+                    now, node, intf, ','.join( str( v ) for v in values ) ) )
+
+    def toDict( self ):
+        "Return samples as a JSON-friendly dict"
+        return { 'fields': self.fields,
+                 'intfs': [ { 'node': node, 'intf': intf }
+                            for node, intf in self.labels ],
+                 'samples': [ { 'time': now, 'values': values.tolist() }
+                              for now, values in list( self.samples ) ] }
+
+    def writeJSON( self, filename ):
+        """Write samples as JSON
+           filename: output file name"""
+        with open( filename, 'w' ) as f:
+            json.dump( self.toDict(), f )
+
+    def prometheus( self ):
+        "Return latest sample in Prometheus text format"
+        if not self.samples:
+            return ''
+        now, values = self.samples[ -1 ]
+        nfields = len( self.fields )
+        lines = []
+        for field, name in enumerate( self.fields ):
+            metric = 'mininet_intf_%s_total' % name
+            lines.append( '# TYPE %s counter' % metric )
+            for index, ( node, intf ) in enumerate( self.labels ):
+                lines.append( '%s{node="%s",intf="%s"} %d %d' % (
+                    metric, node, intf, values[ index * nfields + field ],
+                    now * 1000 ) )
+        return '\n'.join( lines ) + '\n'
+
+    def serve( self, port=9100, host='' ):
+        """Serve latest sample in Prometheus text format over HTTP
+           port: TCP port to listen on
+           host: address to listen on (default: all)"""
+        counters = self
+
+        class Handler( BaseHTTPRequestHandler ):
+            "Return counters for any GET request"
+
+            def do_GET( self ):
+                "Handle GET request"
+                body = counters.prometheus()
+                self.send_response( 200 )
+                self.send_header( 'Content-Type',
+                                  'text/plain; version=0.0.4' )
+                self.send_header( 'Content-Length', str( len( body ) ) )
+                self.end_headers()
+                self.wfile.write( body )
+
+            def log_message( self, *args ):
+                "Don't log requests"
+                pass
+
+        try:
+            self.server = HTTPServer( ( host, port ), Handler )
+        except IOError as e:
+            error( '*** Could not serve counters on port %d: %s\n' %
+                   ( port, e ) )
+            return
+        thread = Thread( target=self.server.serve_forever,
+                         name='IntfCountersServer' )
+        thread.daemon = True
+        thread.start()
+        info( '*** Serving interface counters on port %d\n' % port )
@@ -0,0 +1,480 @@
+"""
+faults.py: failure injection for Mininet
+
+FaultScheduler executes a timeline of link and node events:
+
+    faults = FaultScheduler( net )
+    faults.down( 1, 's1', 's2' )         # link s1-s2 down at t=1s
+    faults.up( 2.5, 's1', 's2' )
+    faults.flap( 3, 's2', 's3', duration=.2, count=10, period=.5 )
+    faults.netem( 4, 'h1', 's1', loss=10, delay='5ms' )
+    faults.nodeDown( 5, 'h3' )           # all of h3's links
+    faults.run()                         # or start() and join()
+    faults.writeLog( 'faults.csv' )
+
+Timelines can also be read from a file (see load()), with one event
+per line:
+
+    # time action node1 [node2] [param=value...]
+    1 down s1 s2
+    3 flap s2 s3 duration=.2 count=10 period=.5
+    4 netem h1 s1 loss=10 delay=5ms
+    5 nodedown h3
+    6 trace s1 s2 filename=cell.txt src=s1
+
+trace() replays a time series of bandwidth, delay and loss on a link
+(or one direction of it), using TCIntf.updateCmds() to change the
+link's qdiscs in place:
+
+    faults.trace( 0, 's1', 's2', 'cell.txt', src='s1' )
+
+Trace files have one sample per line, either as time param=value...
+
+    0 bw=10 delay=20ms loss=0
+    .1 bw=8.5
+
+or as CSV with a header line:
+
+    time,bw,delay,loss
+    0,10,20,0
+    .1,8.5,,
+
+Empty CSV fields leave their parameters unchanged. Bare numbers for
+delay and jitter are taken as milliseconds. Traced links must already
+be TCLinks with the same qdiscs (e.g. bw and delay should both be set
+initially if both are traced).
+
+Rather than running a command per interface, the timeline is
+compiled ahead of time into slices of events that happen at the same
+time. Samples from any number of traces that fall in the same tick
+are merged into the same slice. Each slice's commands are grouped by
+network namespace and run as one 'ip -batch' and/or 'tc -batch' per
+namespace, all in parallel.
+For each slice, we log when it was scheduled and when its changes had
+taken effect.
+
+setIntfStatus() uses the same mechanism to bring any number of
+interfaces up or down at once (see Mininet.configLinkStatus()); it
+falls back to Intf.ifconfig() for remote interfaces.
+
+Note: scheduled interfaces must be local, since we enter their
+namespaces using mnexec; delay and loss changes use netem (handle 10:,
+as in TCIntf).
+"""
+
+from subprocess import PIPE, STDOUT
+from time import time, sleep
+from threading import Thread
+
+from mininet.log import info, error, debug
+from mininet.link import TCIntf
+from mininet.util import makeNumeric, namespace, SpawnPopen
+
+
+# Batched command execution
+
+def groupCmds( cmds, namespaces=None ):
+    """Group interface commands by namespace and tool
+       cmds: list of ( intf, tool, command ), where tool is ip or tc
+       namespaces: cache of pid -> namespace (optional)
+       returns: { ( namespace, tool ): ( pid, [ commands ] ) }"""
+    batches = {}
+    namespaces = {} if namespaces is None else namespaces
+    for intf, tool, cmd in cmds:
+        pid = intf.node.pid
+        if pid not in namespaces:
+            namespaces[ pid ] = namespace( pid )
+        batches.setdefault( ( namespaces[ pid ], tool ),
+                            ( pid, [] ) )[ 1 ].append( cmd )
+    return batches
+
+def runBatches( batches ):
+    """Run batches of commands concurrently, each as a single
+       'ip -batch' or 'tc -batch' in its namespace
+       batches: { ( namespace, tool ): ( pid, [ commands ] ) }
+       returns: list of error output"""
+    ours = namespace( 'self' )
+    popens = []
+    for ( ns, tool ), ( pid, cmds ) in batches.iteritems():
+        args = [ tool, '-force', '-batch', '-' ]
+        if ns != ours:
+            args = [ 'mnexec', '-a', str( pid ) ] + args
+        popen = SpawnPopen( args, stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+        popen.stdin.write( '\n'.join( cmds ) + '\n' )
+        popen.stdin.close()
+        popens.append( popen )
+    errors = []
+    for popen in popens:
+        output = popen.stdout.read()
+        popen.wait()
+        if output:
+            errors.append( output )
+    return errors
+
+def statusCmds( intfs, status ):
+    """Return commands to bring interfaces up or down
+       intfs: list of Intfs
+       status: 'up' or 'down'"""
+    return [ ( intf, 'ip', 'link set dev %s %s' % ( intf, status ) )
+             for intf in intfs ]
+
+def isLocal( node ):
+    "Is node running in a local namespace that we can batch commands in?"
+    return ( not getattr( node, 'isRemote', False ) and
+             getattr( node, 'pid', None ) is not None )
+
+def setIntfStatus( intfs, status ):
+    """Bring interfaces up or down in bulk
+       intfs: list of Intfs
+       status: 'up' or 'down'
+       returns: list of error output"""
+    local = [ intf for intf in intfs if isLocal( intf.node ) ]
+    errors = runBatches( groupCmds( statusCmds( local, status ) ) )
+    # Remote nodes (and nodes without a pid) need their own shells
+    for intf in intfs:
+        if not isLocal( intf.node ):
+            result = intf.ifconfig( status )
+            if result:
+                errors.append( result )
+    return errors
+
+
+# Delay and loss changes via netem
+
+NETEM = ( 'delay', 'jitter', 'loss', 'max_queue_size' )
+
+def netemParent( intf ):
+    "Return the parent of intf's netem qdisc (see TCIntf.config())"
+    params = getattr( intf, 'params', {} )
+    if not isinstance( intf, TCIntf ) or params.get( 'bw' ) is None:
+        return 'root'
+    if params.get( 'enable_ecn' ) or params.get( 'enable_red' ):
+        return 'parent 6:'
+    return 'parent 5:1'
+
+def netemCmd( intf, delay=None, jitter=None, loss=None,
+              max_queue_size=None ):
+    "Return a tc command that sets intf's netem parameters"
+    args = ( ( [ 'delay %s' % delay ] if delay is not None else [] ) +
+             ( [ jitter ] if jitter is not None and delay is not None
+               else [] ) +
+             [ 'loss %.5f' % ( loss or 0 ) ] +
+             ( [ 'limit %d' % max_queue_size ] if max_queue_size is not None
+               else [] ) )
+    return ( intf, 'tc', 'qdisc replace dev %s %s handle 10: netem %s' %
+             ( intf, netemParent( intf ), ' '.join( args ) ) )
+
+
+# Trace-driven shaping via TCIntf.updateCmds()
+
+SHAPE = ( 'bw', 'delay', 'jitter', 'loss' )
+
+def readTrace( filename ):
+    """Read a bandwidth/delay/loss trace
+       filename: trace file (see above)
+       returns: [ ( time, { param: value } ) ]"""
+    samples, header = [], None
+    with open( filename ) as f:
+        for line in f:
+            line = line.split( '#' )[ 0 ].strip()
+            if not line:
+                continue
+            if ',' in line:
+                words = [ w.strip() for w in line.split( ',' ) ]
+            else:
+                words = line.split()
+            if header is None and not isinstance( makeNumeric( words[ 0 ] ),
+                                                  ( int, float ) ):
+                header = [ w.lower() for w in words[ 1: ] ]
+                continue
+            if header:
+                if len( words ) - 1 > len( header ):
+                    raise Exception( '%s: too many fields in %r' %
+                                     ( filename, line ) )
+                params = dict( ( param, value ) for param, value in
+                               zip( header, words[ 1: ] ) if value )
+            else:
+                params = dict( w.split( '=', 1 ) for w in words[ 1: ] )
+            for param, value in params.items():
+                if param not in SHAPE:
+                    raise Exception( '%s: unknown trace parameter %s' %
+                                     ( filename, param ) )
+                value = makeNumeric( value )
+                if param in ( 'delay', 'jitter' ) and not isinstance(
+                        value, str ):
+                    value = '%sms' % value
+                params[ param ] = value
+            samples.append( ( float( words[ 0 ] ), params ) )
+    return samples
+
+
+class FaultScheduler( object ):
+    "Execute a timeline of link and node events"
+
+    # Events closer together than this are run in the same slice
+    resolution = .001
+
+    def __init__( self, net ):
+        "net: Mininet network"
+        self.net = net
+        self.events = []  # ( time, action, target, params )
+        self.log = []  # ( scheduled time, completion time, events )
+        self.thread = None
+        self.shaped = {}  # intf -> tc parameters after shape events
+
+    # Timeline
+
+    def add( self, t, action, target, **params ):
+        """Add an event
+           t: time (seconds from start)
+           action: up, down, netem or shape
+           target: ( node1, node2 ) for links, or node for all its links
+           params: netem or shape parameters"""
+        if action not in ( 'up', 'down', 'netem', 'shape' ):
+            raise Exception( 'FaultScheduler: unknown action %s' % action )
+        self.events.append( ( t, action, target, params ) )
+
+    def down( self, t, node1, node2 ):
+        "Take link(s) between node1 and node2 down at time t"
+        self.add( t, 'down', ( node1, node2 ) )
+
+    def up( self, t, node1, node2 ):
+        "Bring link(s) between node1 and node2 up at time t"
+        self.add( t, 'up', ( node1, node2 ) )
+
+    def flap( self, t, node1, node2, duration=1, count=1, period=None ):
+        """Take link(s) between node1 and node2 down and up again
+           t: time of first flap
+           duration: time to stay down
+           count: number of flaps
+           period: time between flaps (default: 2 * duration)"""
+        period = 2 * duration if period is None else period
+        for i in range( count ):
+            self.down( t + i * period, node1, node2 )
+            self.up( t + i * period + duration, node1, node2 )
+
+    def nodeDown( self, t, node ):
+        "Take all of a node's links down at time t"
+        self.add( t, 'down', node )
+
+    def nodeUp( self, t, node ):
+        "Bring all of a node's links up at time t"
+        self.add( t, 'up', node )
+
+    def netem( self, t, node1, node2, **params ):
+        """Change delay/loss of link(s) between node1 and node2 at time t
+           params: delay, jitter, loss, max_queue_size"""
+        for param in params:
+            if param not in NETEM:
+                raise Exception( 'FaultScheduler: unknown netem '
+                                 'parameter %s' % param )
+        self.add( t, 'netem', ( node1, node2 ), **params )
+
+    def shape( self, t, node1, node2, src=None, **params ):
+        """Change bw/delay/jitter/loss of TCLink(s) between node1 and
+           node2 in place at time t
+           src: only change traffic sent by src (default: both ways)
+           params: bw, delay, jitter, loss"""
+        for param in params:
+            if param not in SHAPE:
+                raise Exception( 'FaultScheduler: unknown shape '
+                                 'parameter %s' % param )
+        if src is not None:
+            params[ 'src' ] = src
+        self.add( t, 'shape', ( node1, node2 ), **params )
+
+    def trace( self, t, node1, node2, filename=None, src=None,
+               samples=None, repeat=1, period=None ):
+        """Replay a bandwidth/delay/loss trace on TCLink(s) between
+           node1 and node2
+           t: start time of trace
+           filename: trace file (see readTrace())
+           src: only shape traffic sent by src (default: both ways)
+           samples: [ ( time, params ) ] to use instead of a file
+           repeat: number of times to replay the trace
+           period: length of the trace, for repeats (default: time of
+             the last sample plus the average sample interval)"""
+        if samples is None:
+            samples = readTrace( filename )
+        if not samples:
+            return
+        if period is None:
+            first, last = samples[ 0 ][ 0 ], samples[ -1 ][ 0 ]
+            period = last + ( ( last - first ) / ( len( samples ) - 1 )
+                              if len( samples ) > 1 else 0 )
+        for i in range( repeat ):
+            for dt, params in samples:
+                self.shape( t + i * period + dt, node1, node2, src=src,
+                            **params )
+
+    def load( self, filename ):
+        """Read events from a file, one per line:
+           time action node1 [node2] [param=value...]
+           where action is up, down, flap, netem, shape, trace,
+           nodeup or nodedown"""
+        with open( filename ) as f:
+            for line in f:
+                line = line.split( '#' )[ 0 ].strip()
+                if not line:
+                    continue
+                words = line.split()
+                t, action = float( words[ 0 ] ), words[ 1 ].lower()
+                args = [ w for w in words[ 2: ] if '=' not in w ]
+                params = dict( ( k, makeNumeric( v ) ) for k, v in
+                               ( w.split( '=', 1 ) for w in words[ 2: ]
+                                 if '=' in w ) )
+                if action == 'nodedown':
+                    self.nodeDown( t, *args )
+                elif action == 'nodeup':
+                    self.nodeUp( t, *args )
+                elif action in ( 'up', 'down', 'flap', 'netem', 'shape',
+                                 'trace' ):
+                    getattr( self, action )( t, *args, **params )
+                else:
+                    raise Exception( '%s: unknown action %s' %
+                                     ( filename, action ) )
+
+    # Compilation
+
+    def intfs( self, target ):
+        "Return the interfaces for an event target"
+        if isinstance( target, tuple ):
+            node1, node2 = [ self.net[ n ] for n in target ]
+            intfs = [ intf for pair in node1.connectionsTo( node2 )
+                      for intf in pair ]
+            if not intfs:
+                error( 'FaultScheduler: %s and %s are not connected\n' %
+                       target )
+            return intfs
+        node = self.net[ target ]
+        return [ intf for pair in
+                 ( ( link.intf1, link.intf2 ) for link in self.net.links
+                   if node in ( link.intf1.node, link.intf2.node ) )
+                 for intf in pair ]
+
+    @staticmethod
+    def tcParams( intf ):
+        "Return intf's current tc parameters, for shape events"
+        params = getattr( intf, 'tcParams', None )
+        if params is None:
+            raise Exception( 'FaultScheduler: %s has no tc configuration; '
+                             'shape and trace events need TCLinks' % intf )
+        return params
+
+    def shapeCmds( self, intf, params ):
+        """Return commands to change intf's tc parameters in place, and
+           record its new parameters
+           params: changed parameters"""
+        old = self.shaped.get( intf ) or self.tcParams( intf )
+        new = dict( old )
+        new.update( params )
+        cmds = intf.updateCmds( old, new )
+        if cmds is None:
+            raise Exception( 'FaultScheduler: %s: changing %s would require '
+                             'new qdiscs; configure the link with initial '
+                             'values for all traced parameters' %
+                             ( intf, params ) )
+        self.shaped[ intf ] = new
+        # Strip the tc command, since we run these with tc -batch
+        return [ ( intf, 'tc', ( cmd % ( '', intf ) ).strip() )
+                 for cmd in cmds ]
+
+    def compile( self ):
+        """Compile the timeline into slices of batched commands
+           returns: [ ( time, batches, events ) ]"""
+        events = sorted( self.events, key=lambda e: e[ 0 ] )
+        netem = {}  # intf -> current netem parameters
+        self.shaped = {}
+        targets = {}  # target -> intfs
+        namespaces = {}  # pid -> namespace
+        slices = []
+        # Events are sorted, so we can walk them once, slice by slice
+        i = 0
+        while i < len( events ):
+            t = events[ i ][ 0 ]
+            j = i + 1
+            while j < len( events ) and events[ j ][ 0 ] - t < self.resolution:
+                j += 1
+            current, i = events[ i:j ], j
+            # Later changes to the same interface override earlier ones
+            cmds = {}
+            shapes = {}  # intf -> changed tc parameters
+            for _t, action, target, params in current:
+                if target not in targets:
+                    targets[ target ] = self.intfs( target )
+                for intf in targets[ target ]:
+                    if action == 'shape':
+                        src = params.get( 'src' )
+                        if src is None or intf.node.name == src:
+                            shapes.setdefault( intf, {} ).update(
+                                ( k, v ) for k, v in params.iteritems()
+                                if k != 'src' )
+                    elif action == 'netem':
+                        if intf not in netem:
+                            netem[ intf ] = {
+                                k: getattr( intf, 'params', {} ).get( k )
+                                for k in NETEM }
+                        netem[ intf ].update( params )
+                        if intf in self.shaped:
+                            self.shaped[ intf ].update( params )
+                        cmds[ intf, 'tc' ] = netemCmd( intf,
+                                                       **netem[ intf ] )
+                    else:
+                        cmds[ intf, 'ip' ] = statusCmds(
+                            [ intf ], action )[ 0 ]
+            cmds = cmds.values()
+            for intf, params in shapes.iteritems():
+                cmds += self.shapeCmds( intf, params )
+            slices.append( ( t, groupCmds( cmds, namespaces ), current ) )
+        return slices
+
+    # Execution
+
+    def run( self ):
+        """Execute the timeline, starting now
+           returns: log of ( scheduled time, completion time, events )"""
+        slices = self.compile()
+        info( '*** Running %d fault events in %d slices\n' %
+              ( len( self.events ), len( slices ) ) )
+        start = time()
+        for t, batches, events in slices:
+            delay = start + t - time()
+            if delay > 0:
+                sleep( delay )
+            for output in runBatches( batches ):
+                error( '*** FaultScheduler: %s' % output )
+            done = time() - start
+            debug( '*** %.6f: %d events done at %.6f\n' %
+                   ( t, len( events ), done ) )
+            self.log.append( ( t, done, events ) )
+        # Keep our links' parameters up to date for TCIntf.update()
+        for intf, params in self.shaped.iteritems():
+            intf.tcParams = params
+            intf.params.update( ( k, params[ k ] ) for k in SHAPE )
+        return self.log
+
+    def start( self ):
+        "Execute the timeline in a background thread"
+        self.thread = Thread( target=self.run, name='FaultScheduler' )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def join( self ):
+        "Wait for the timeline to finish"
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def writeLog( self, filename ):
+        """Write the log as CSV, one line per event
+           filename: output file name"""
+        with open( filename, 'w' ) as f:
+            f.write( 'scheduled,done,action,target,params\n' )
+            for t, done, events in self.log:
+                for _t, action, target, params in events:
+                    target = ( '-'.join( target )
+                               if isinstance( target, tuple ) else target )
+                    f.write( '%.6f,%.6f,%s,%s,%s\n' % (
+                        t, done, action, target,
+                        ' '.join( '%s=%s' % kv
+                                  for kv in sorted( params.items() ) ) ) )
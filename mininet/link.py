@@ -25,18 +25,24 @@
 """
 
 from mininet.log import info, error, debug
-from mininet.util import makeIntfPair
+from mininet.perf import timer
+from mininet.util import makeIntfPair, namespace
 import re
 
 class Intf( object ):
 
     "Basic interface object that can configure itself."
 
+    # Bumped whenever an interface address may have changed, so that
+    # callers (e.g. the CLI) can safely cache addresses between changes
+    addrEpoch = 0
+
     def __init__( self, name, node=None, port=None, link=None,
                   mac=None, **params ):
         """name: interface name (e.g. h1-eth0)
            node: owning node (where this intf most likely lives)
            link: parent link if we're part of a link
+           fresh: we were just created (so config() can skip probes)
            other arguments are passed to config()"""
         self.node = node
         self.name = name
@@ -50,6 +56,7 @@ def __init__( self, name, node=None, port=None, link=None,
             self.ip = '127.0.0.1'
             self.prefixLen = 8
         # Add to node (and move ourselves if necessary )
+        Intf.addrEpoch += 1
         if node:
             moveIntfFn = params.pop( 'moveIntfFn', None )
             if moveIntfFn:
@@ -57,8 +64,10 @@ def __init__( self, name, node=None, port=None, link=None,
             else:
                 node.addIntf( self, port=port )
         # Save params for future reference
+        self.fresh = params.pop( 'fresh', False )
         self.params = params
         self.config( **params )
+        self.fresh = False
 
     def cmd( self, *args, **kwargs ):
         "Run a command in our owning node"
@@ -70,6 +79,7 @@ def ifconfig( self, *args ):
 
     def setIP( self, ipstr, prefixLen=None ):
         """Set our IP address"""
+        Intf.addrEpoch += 1
         # This is a sign that we should perhaps rethink our prefix
         # mechanism and/or the way we specify IP addresses
         if '/' in ipstr:
@@ -197,6 +207,7 @@ def config( self, mac=None, ip=None, ifconfig=None,
 
     def delete( self ):
         "Delete interface"
+        Intf.addrEpoch += 1
         self.cmd( 'ip link del ' + self.name )
         # We used to do this, but it slows us down:
         # if self.node.inNamespace:
@@ -229,6 +240,17 @@ class TCIntf( Intf ):
     # For higher data rates, we will probably need to change them.
     bwParamMax = 1000
 
+    # Offload settings ( gro, txo, rxo ) of new veths, probed once
+    vethOffloads = None
+
+    # Link options that config() can change on a live interface,
+    # and their defaults
+    configDefaults = dict( bw=None, delay=None, jitter=None, loss=None,
+                           gro=False, txo=True, rxo=True, speedup=0,
+                           use_hfsc=False, use_tbf=False, latency_ms=None,
+                           enable_ecn=False, enable_red=False,
+                           max_queue_size=None )
+
     def bwCmds( self, bw=None, speedup=0, use_hfsc=False, use_tbf=False,
                 latency_ms=None, enable_ecn=False, enable_red=False ):
         "Return tc commands to set bandwidth"
@@ -306,6 +328,21 @@ def delayCmds( parent, delay=None, jitter=None,
                 parent = ' parent 10:1 '
         return cmds, parent
 
+    @classmethod
+    def probeOffloads( cls, intf ):
+        """Return ( gro, txo, rxo ) settings of a new veth intf, probing
+           it if we haven't already (or () if ethtool isn't working)"""
+        if cls.vethOffloads is None:
+            features = dict( line.split( ': ', 1 ) for line in
+                             intf.cmd( 'ethtool -k', intf ).splitlines()
+                             if ': ' in line )
+            names = ( 'generic-receive-offload', 'tx-checksumming',
+                      'rx-checksumming' )
+            TCIntf.vethOffloads = (
+                tuple( features[ f ].startswith( 'on' ) for f in names )
+                if all( f in features for f in names ) else () )
+        return cls.vethOffloads
+
     def tc( self, cmd, tc='tc' ):
         "Execute tc command for our interface"
         c = cmd % (tc, self)  # Add in tc command and our name
@@ -338,15 +375,33 @@ def config( self, bw=None, delay=None, jitter=None, loss=None,
 
         result = Intf.config( self, **params)
 
+        # Remember what we configured, for update()
+        self.tcParams = dict( bw=bw, delay=delay, jitter=jitter, loss=loss,
+                              gro=gro, txo=txo, rxo=rxo, speedup=speedup,
+                              use_hfsc=use_hfsc, use_tbf=use_tbf,
+                              latency_ms=latency_ms, enable_ecn=enable_ecn,
+                              enable_red=enable_red,
+                              max_queue_size=max_queue_size )
+
         def on( isOn ):
             "Helper method: bool -> 'on'/'off'"
             return 'on' if isOn else 'off'
 
-        # Set offload parameters with ethool
-        self.cmd( 'ethtool -K', self,
-                  'gro', on( gro ),
-                  'tx', on( txo ),
-                  'rx', on( rxo ) )
+        # Set offload parameters with ethool, unless they are already
+        # set (which they usually are for new veths)
+        offloads = ( gro, txo, rxo )
+        current = getattr( self, 'offloads', None )
+        if current is None and self.fresh:
+            current = self.probeOffloads( self )
+        if offloads != current:
+            self.cmd( 'ethtool -K', self,
+                      'gro', on( gro ),
+                      'tx', on( txo ),
+                      'rx', on( rxo ) )
+        self.offloads = offloads
+
+        # Handle of the root qdisc we create, if any (see reapply())
+        self.tcRoot = None
 
         # Optimization: return if nothing else to configure
         # Question: what happens if we want to reset things?
@@ -354,12 +409,12 @@ def on( isOn ):
              and max_queue_size is None ):
             return
 
-        # Clear existing configuration
-        tcoutput = self.tc( '%s qdisc show dev %s' )
-        if "priomap" not in tcoutput and "noqueue" not in tcoutput:
-            cmds = [ '%s qdisc del dev %s root' ]
-        else:
-            cmds = []
+        # Clear existing configuration (new veths have none)
+        cmds = []
+        if not self.fresh:
+            tcoutput = self.tc( '%s qdisc show dev %s' )
+            if "priomap" not in tcoutput and "noqueue" not in tcoutput:
+                cmds = [ '%s qdisc del dev %s root' ]
 
         # Bandwidth limits via various methods
         bwcmds, parent = self.bwCmds( bw=bw, speedup=speedup,
@@ -375,6 +430,7 @@ def on( isOn ):
                                             max_queue_size=max_queue_size,
                                             parent=parent )
         cmds += delaycmds
+        self.tcRoot = '5:' if bwcmds else '10:' if delaycmds else None
 
         # Ugly but functional: display configuration info
         stuff = ( ( [ '%.2fMbit' % bw ] if bw is not None else [] ) +
@@ -387,7 +443,8 @@ def on( isOn ):
 
         # Execute all the commands in our node
         debug("at map stage w/cmds: %s\n" % cmds)
-        tcoutputs = [ self.tc(cmd) for cmd in cmds ]
+        with timer.phase( 'tc', timeline=False ):
+            tcoutputs = [ self.tc(cmd) for cmd in cmds ]
         for output in tcoutputs:
             if output != '':
                 error( "*** Error: %s" % output )
@@ -398,12 +455,126 @@ def on( isOn ):
 
         return result
 
+    # Parameters that determine the shape of our qdisc tree
+    shapeParams = ( 'use_hfsc', 'use_tbf', 'enable_ecn', 'enable_red' )
+    netemParams = ( 'delay', 'jitter', 'loss', 'max_queue_size' )
+    bwParams = ( 'bw', 'speedup', 'latency_ms' )
+    offloadParams = ( 'gro', 'txo', 'rxo' )
+
+    @classmethod
+    def tcShape( cls, params ):
+        "Return a description of the qdisc tree that config() builds"
+        if ( params[ 'bw' ] is None and not params[ 'delay' ] and
+             not params[ 'loss' ] and params[ 'max_queue_size' ] is None ):
+            return None
+        return ( params[ 'bw' ] is not None,
+                 any( params[ p ] is not None for p in cls.netemParams ),
+                 tuple( bool( params[ p ] ) for p in cls.shapeParams ) )
+
+    @classmethod
+    def reapply( cls, intfs ):
+        """Restore the tc configuration of any intfs whose root qdisc
+           has been replaced (e.g. by OVS), checking the qdiscs of all
+           intfs with one 'tc qdisc show' per namespace
+           intfs: interfaces (intfs without tc configuration are ignored)
+           returns: list of intfs that were reconfigured"""
+        groups = {}
+        for intf in intfs:
+            if isinstance( intf, cls ) and getattr( intf, 'tcRoot', None ):
+                node = intf.node
+                # We can only look up namespaces of local nodes
+                if getattr( node, 'isRemote', False ):
+                    key = node.server, node.pid
+                elif node.pid is None:
+                    key = node
+                else:
+                    key = namespace( node.pid )
+                groups.setdefault( key, [] ).append( intf )
+        reconfigured = []
+        for group in groups.itervalues():
+            # qdisc <kind> <handle> dev <intf> root ...
+            roots = dict( ( words[ 4 ], words[ 2 ] ) for words in
+                          ( line.split() for line in
+                            group[ 0 ].cmd( 'tc qdisc show' ).splitlines() )
+                          if len( words ) > 5 and words[ 5 ] == 'root' )
+            for intf in group:
+                if roots.get( intf.name ) != intf.tcRoot:
+                    debug( '*** %s: restoring tc configuration\n' % intf )
+                    intf.config( **intf.params )
+                    reconfigured.append( intf )
+        return reconfigured
+
+    def updateCmds( self, old, new ):
+        """Return tc commands that change our configuration from old to
+           new in place, or None if the qdisc tree must be rebuilt
+           old, new: dicts of config() parameters
+           returns: list of tc command templates (see tc())"""
+        changed = set( p for p in new if new[ p ] != old.get( p ) )
+        # tcShape() only depends on whether parameters are None or
+        # false, so we can usually skip it (e.g. for trace replay)
+        if any( ( old.get( p ) is None, not old.get( p ) ) !=
+                ( new[ p ] is None, not new[ p ] ) for p in changed ) and (
+                self.tcShape( old ) != self.tcShape( new ) ):
+            return None
+        cmds, parent = [], ' root '
+        if not changed.isdisjoint( self.bwParams + self.netemParams ):
+            bwcmds, parent = self.bwCmds(
+                **{ p: new[ p ] for p in self.bwParams + self.shapeParams } )
+            if not changed.isdisjoint( self.bwParams ):
+                # htb and hfsc root qdiscs can't be changed, and don't
+                # need to be, since the rate is set in class 5:1
+                cmds += [ cmd for cmd in bwcmds
+                          if ' root handle 5:0 ' not in cmd ]
+        if not changed.isdisjoint( self.netemParams ):
+            cmds += self.delayCmds(
+                parent, **{ p: new[ p ] for p in self.netemParams } )[ 0 ]
+        return [ cmd.replace( ' add ', ' change ', 1 ) for cmd in cmds ]
+
+    def update( self, **params ):
+        """Change bw, delay, jitter, loss etc. without rebuilding our
+           qdiscs (and disrupting traffic) where possible
+           params: config() parameters to change
+           returns: list of tc/ethtool output (empty on success)"""
+        old = getattr( self, 'tcParams', None )
+        new = dict( old or {} )
+        new.update( params )
+        # Anything other than tc/offload parameters needs config()
+        cmds = ( self.updateCmds( old, new )
+                 if old and set( params ) <= set( old ) else None )
+        self.params.update( params )
+        if cmds is None:
+            debug( '*** %s: rebuilding qdiscs\n' % self )
+            self.config( **self.params )
+            return []
+        offloads = tuple( new[ p ] for p in self.offloadParams )
+        if offloads != getattr( self, 'offloads', None ):
+            on = lambda isOn: 'on' if isOn else 'off'
+            cmds.append( 'ethtool -K %%s gro %s tx %s rx %s' % (
+                on( new[ 'gro' ] ), on( new[ 'txo' ] ), on( new[ 'rxo' ] ) ) )
+            self.offloads = offloads
+        self.tcParams = new
+        if not cmds:
+            return []
+        # Run everything in a single command
+        cmds = [ cmd % ( 'tc', self ) if cmd.startswith( '%s ' ) else
+                 cmd % self for cmd in cmds ]
+        debug( '*** %s: updating: %s\n' % ( self, cmds ) )
+        with timer.phase( 'tc', timeline=False ):
+            output = self.cmd( ' ; '.join( cmds ) )
+        if output:
+            error( '*** Error: %s' % output )
+        return [ output ] if output else []
+
 
 class Link( object ):
 
     """A basic link is just a veth pair.
        Other types of links could be tunnels, link emulators, etc.."""
 
+    # makeIntfPair() creates new veth pairs (which start out with
+    # no qdisc and default offload settings)
+    vethPairs = True
+
     # pylint: disable=too-many-branches
     def __init__( self, node1, node2, port1=None, port2=None,
                   intfName1=None, intfName2=None, addr1=None, addr2=None,
@@ -443,6 +614,11 @@ def __init__( self, node1, node2, port1=None, port2=None,
         if not intfName2:
             intfName2 = self.intfName( node2, params2[ 'port' ] )
 
+        if self.vethPairs:
+            # Our intfs' config() can skip probing the new veths
+            params1.setdefault( 'fresh', True )
+            params2.setdefault( 'fresh', True )
+
         self.fast = fast
         if fast:
             params1.setdefault( 'moveIntfFn', self._ignore )
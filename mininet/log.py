@@ -2,6 +2,8 @@
 
 import logging
 from logging import Logger
+from threading import Thread, Event
+from time import sleep
 import types
 
 # Create a new loglevel, 'CLI info', which enables a Mininet user to see only
@@ -55,6 +57,94 @@ def emit( self, record ):
             self.handleError( record )
 
 
+class BufferedStreamHandler( StreamHandlerNoNewline ):
+    """StreamHandlerNoNewline that buffers info and debug output and
+       writes it out in the background, so that busy loops (e.g. building
+       a large network at info level) don't wait for the terminal.
+       Output at OUTPUT level or above is written immediately, after
+       anything buffered before it, so interactive output isn't delayed."""
+
+    def __init__( self, stream=None, interval=.1, size=65536 ):
+        """stream: output stream (default: stderr)
+           interval: seconds between background writes
+           size: write buffered output once it reaches this size"""
+        StreamHandlerNoNewline.__init__( self, stream )
+        self.interval, self.size = interval, size
+        self.buffer, self.buffered = [], 0
+        self.writer = None
+        self.pending = Event()  # set when there is buffered output
+        self.closed = False
+
+    def emit( self, record ):
+        """Buffer a record, writing buffered output if the record is
+           important or the buffer is full (called with our lock held)"""
+        try:
+            msg = self.format( record )
+            if isinstance( msg, unicode ):
+                msg = msg.encode( 'UTF-8' )
+            self.buffer.append( msg )
+            self.buffered += len( msg )
+            if record.levelno >= OUTPUT or self.buffered >= self.size:
+                self.flush()
+                return
+            self.pending.set()
+            if not self.writer:
+                self.writer = Thread( target=self.writeLoop,
+                                      name='BufferedStreamHandler' )
+                self.writer.daemon = True
+                self.writer.start()
+        except ( KeyboardInterrupt, SystemExit ):
+            raise
+        except:
+            self.handleError( record )
+
+    def writeLoop( self, wait=sleep ):
+        """Write buffered output within interval seconds of its arrival,
+           until closed; we sleep while there is nothing to write
+           wait: sleep() (which may be gone by the time we wake up
+             during interpreter shutdown)"""
+        while not self.closed:
+            self.pending.wait()
+            if self.closed:
+                break
+            wait( self.interval )
+            if not self.closed:
+                self.flush()
+
+    def flush( self ):
+        "Write any buffered output"
+        self.acquire()
+        try:
+            if self.buffer:
+                data = ''.join( self.buffer )
+                self.buffer, self.buffered = [], 0
+                self.stream.write( data )
+            self.pending.clear()
+            StreamHandlerNoNewline.flush( self )
+        finally:
+            self.release()
+
+    def close( self ):
+        "Write any buffered output and stop writing in the background"
+        self.flush()
+        self.closed = True
+        self.pending.set()
+        StreamHandlerNoNewline.close( self )
+
+
+class LazyFormat( object ):
+    """Log message that is only formatted if it is actually logged:
+       debug( LazyFormat( '*** %s : %s\n', name, args ) )"""
+
+    __slots__ = ( 'fmt', 'args' )
+
+    def __init__( self, fmt, *args ):
+        self.fmt, self.args = fmt, args
+
+    def __str__( self ):
+        return self.fmt % self.args
+
+
 class Singleton( type ):
     """Singleton pattern from Wikipedia
        See http://en.wikipedia.org/wiki/Singleton_Pattern
@@ -124,6 +214,24 @@ def setLogLevel( self, levelname=None ):
         self.setLevel( level )
         self.handlers[ 0 ].setLevel( level )
 
+    def setBuffered( self, buffered=True, interval=.1 ):
+        """Buffer info and debug output, writing it in the background
+           (see BufferedStreamHandler); turn this off before writing
+           to the terminal directly (as the CLI does), so that output
+           stays in order
+           buffered: buffer output?
+           interval: seconds between background writes"""
+        old = self.handlers[ 0 ]
+        if not buffered and not isinstance( old, BufferedStreamHandler ):
+            return
+        # Write anything buffered and stop the old handler's writer
+        old.close()
+        ch = ( BufferedStreamHandler( interval=interval ) if buffered
+               else StreamHandlerNoNewline() )
+        ch.setFormatter( old.formatter )
+        ch.setLevel( old.level )
+        self.handlers[ 0 ] = ch
+
     # pylint: disable=method-hidden
     # "An attribute inherited from mininet.log hide this method" (sic)
     # Not sure why this is occurring - this function definitely gets called.
@@ -148,16 +256,18 @@ def output( self, msg, *args, **kwargs ):
 
 # Make things a bit more convenient by adding aliases
 # (info, warn, error, debug) and allowing info( 'this', 'is', 'OK' )
-# In the future we may wish to make things more efficient by only
-# doing the join (and calling the function) unless the logging level
-# is high enough.
+# For efficiency, we only do the join (and call the function) if the
+# logging level is high enough; use LazyFormat to defer % formatting.
 
-def makeListCompatible( fn ):
+def makeListCompatible( fn, level=None ):
     """Return a new function allowing fn( 'a 1 b' ) to be called as
-       newfn( 'a', 1, 'b' )"""
+       newfn( 'a', 1, 'b' )
+       level: skip everything unless lg is enabled for level"""
 
     def newfn( *args ):
         "Generated function. Closure-ish."
+        if level is not None and not lg.isEnabledFor( level ):
+            return
         if len( args ) == 1:
             return fn( *args )
         args = ' '.join( str( arg ) for arg in args )
@@ -169,8 +279,10 @@ def newfn( *args ):
     return newfn
 
 _loggers = lg.info, lg.output, lg.warn, lg.error, lg.debug
-_loggers = tuple( makeListCompatible( logger )
-                  for logger in _loggers )
+_levels = ( logging.INFO, OUTPUT, logging.WARNING, logging.ERROR,
+            logging.DEBUG )
+_loggers = tuple( makeListCompatible( logger, level )
+                  for logger, level in zip( _loggers, _levels ) )
 lg.info, lg.output, lg.warn, lg.error, lg.debug = _loggers
 info, output, warn, error, debug = _loggers
 
@@ -101,10 +101,14 @@
 from mininet.node import ( Node, Host, OVSKernelSwitch, DefaultController,
                            Controller )
 from mininet.nodelib import NAT
-from mininet.link import Link, Intf
+from mininet.link import Link, Intf, TCIntf
+from mininet.topo import Topo
+from mininet.perf import timer
+from mininet.addressing import AddressPlanner
+from mininet.faults import setIntfStatus
 from mininet.util import ( quietRun, fixLimits, numCores, ensureRoot,
-                           macColonHex, ipStr, ipParse, netParse, ipAdd,
-                           waitListening )
+                           macColonHex, ipStr, ipParse, netParse,
+                           waitListening, probeListening )
 from mininet.term import cleanUpScreens, makeTerms
 
 # Mininet version: should be consistent with README and LICENSE
@@ -118,7 +122,8 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
                   build=True, xterms=False, cleanup=False, ipBase='10.0.0.0/8',
                   inNamespace=False,
                   autoSetMacs=False, autoStaticArp=False, autoPinCpus=False,
-                  listenPort=None, waitConnected=False ):
+                  listenPort=None, waitConnected=False,
+                  controllerTimeout=10 ):
         """Create Mininet object.
            topo: Topo (topology) object or None
            switch: default Switch class
@@ -135,7 +140,10 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
            autoStaticArp: set all-pairs static MAC addrs?
            autoPinCpus: pin hosts to (real) cores (requires CPULimitedHost)?
            listenPort: base listening port to open; will be incremented for
-               each additional switch in the net if inNamespace=False"""
+               each additional switch in the net if inNamespace=False
+           waitConnected: wait for switches to connect to controllers?
+           controllerTimeout: seconds to wait for controllers to listen
+               before starting switches (0: don't wait)"""
         self.topo = topo
         self.switch = switch
         self.host = host
@@ -144,9 +152,8 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         self.intf = intf
         self.ipBase = ipBase
         self.ipBaseNum, self.prefixLen = netParse( self.ipBase )
-        hostIP = ( 0xffffffff >> self.prefixLen ) & self.ipBaseNum
-        # Start for address allocation
-        self.nextIP = hostIP if hostIP > 0 else 1
+        # Allocator for host IPs (and MACs), link MACs and dpids
+        self.addresses = AddressPlanner( ipBase=ipBase )
         self.inNamespace = inNamespace
         self.xterms = xterms
         self.cleanup = cleanup
@@ -157,11 +164,13 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         self.nextCore = 0  # next core for pinning hosts to CPUs
         self.listenPort = listenPort
         self.waitConn = waitConnected
+        self.controllerTimeout = controllerTimeout
 
         self.hosts = []
         self.switches = []
         self.controllers = []
         self.links = []
+        self.linkMacs = {}  # link -> ( addr1, addr2 ), for delLink()
 
         self.nameToNode = {}  # name to Node (Host/Switch) objects
 
@@ -170,6 +179,7 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         Mininet.init()  # Initialize Mininet if necessary
 
         self.built = False
+        self.started = False
         if topo and build:
             self.build()
 
@@ -177,11 +187,14 @@ def waitConnected( self, timeout=None, delay=.5 ):
         """wait for each switch to connect to a controller,
            up to 5 seconds
            timeout: time to wait, or None to wait indefinitely
-           delay: seconds to sleep per iteration
+           delay: maximum seconds to sleep per iteration
            returns: True if all switches are connected"""
         info( '*** Waiting for switches to connect\n' )
         time = 0
         remaining = list( self.switches )
+        # Switches usually connect quickly once controllers are
+        # listening, so start with short sleeps and back off
+        wait = min( .01, delay )
         while True:
             for switch in tuple( remaining ):
                 if switch.connected():
@@ -192,8 +205,9 @@ def waitConnected( self, timeout=None, delay=.5 ):
                 return True
             if time > timeout and timeout is not None:
                 break
-            sleep( delay )
-            time += delay
+            sleep( wait )
+            time += wait
+            wait = min( wait * 2, delay )
         warn( 'Timed out after %d seconds\n' % time )
         for switch in remaining:
             if not switch.connected():
@@ -203,27 +217,28 @@ def waitConnected( self, timeout=None, delay=.5 ):
                 remaining.remove( switch )
         return not remaining
 
+    def hostDefaults( self, **params ):
+        """Return host params with default IP and MAC addresses and
+           CPU cores filled in
+           params: parameters for host"""
+        self.addresses.reserve( mac=params.get( 'mac' ) )
+        defaults = self.addresses.hostParams( self.autoSetMacs,
+                                              ip=params.get( 'ip' ) )
+        if self.autoPinCpus:
+            defaults[ 'cores' ] = self.nextCore
+            self.nextCore = ( self.nextCore + 1 ) % self.numCores
+        defaults.update( params )
+        return defaults
+
     def addHost( self, name, cls=None, **params ):
         """Add host.
            name: name of host to add
            cls: custom host class/constructor (optional)
            params: parameters for host
            returns: added host"""
-        # Default IP and MAC addresses
-        defaults = { 'ip': ipAdd( self.nextIP,
-                                  ipBaseNum=self.ipBaseNum,
-                                  prefixLen=self.prefixLen ) +
-                                  '/%s' % self.prefixLen }
-        if self.autoSetMacs:
-            defaults[ 'mac' ] = macColonHex( self.nextIP )
-        if self.autoPinCpus:
-            defaults[ 'cores' ] = self.nextCore
-            self.nextCore = ( self.nextCore + 1 ) % self.numCores
-        self.nextIP += 1
-        defaults.update( params )
         if not cls:
             cls = self.host
-        h = cls( name, **defaults )
+        h = cls( name, **self.hostDefaults( **params ) )
         self.hosts.append( h )
         self.nameToNode[ name ] = h
         return h
@@ -241,25 +256,42 @@ def delNode( self, node, nodes=None):
         node.terminate()
         nodes.remove( node )
         del self.nameToNode[ node.name ]
+        # Free its addresses, so that it can be added again
+        if nodes is self.hosts:
+            self.addresses.release( ip=node.params.get( 'ip' ),
+                                    mac=node.params.get( 'mac' ) )
+        elif nodes is self.switches:
+            self.addresses.release( dpid=getattr( node, 'dpid', None ) )
 
     def delHost( self, host ):
         "Delete a host"
         self.delNode( host, nodes=self.hosts )
 
+    def switchDefaults( self, name, **params ):
+        """Return switch params with default listen port and dpid
+           filled in
+           name: name of switch
+           params: parameters for switch
+           side effect: increments listenPort ivar ."""
+        defaults = { 'listenPort': self.listenPort,
+                     'inNamespace': self.inNamespace }
+        dpid = self.addresses.dpid( name, params.get( 'dpid' ) )
+        if dpid:
+            defaults[ 'dpid' ] = dpid
+        defaults.update( params )
+        if not self.inNamespace and self.listenPort:
+            self.listenPort += 1
+        return defaults
+
     def addSwitch( self, name, cls=None, **params ):
         """Add switch.
            name: name of switch to add
            cls: custom switch class/constructor (optional)
            returns: added switch
            side effect: increments listenPort ivar ."""
-        defaults = { 'listenPort': self.listenPort,
-                     'inNamespace': self.inNamespace }
-        defaults.update( params )
         if not cls:
             cls = self.switch
-        sw = cls( name, **defaults )
-        if not self.inNamespace and self.listenPort:
-            self.listenPort += 1
+        sw = cls( name, **self.switchDefaults( name, **params ) )
         self.switches.append( sw )
         self.nameToNode[ name ] = sw
         return sw
@@ -394,17 +426,27 @@ def addLink( self, node1, node2, port1=None, port2=None,
         if self.intf is not None:
             options.setdefault( 'intf', self.intf )
         # Set default MAC - this should probably be in Link
-        options.setdefault( 'addr1', self.randMac() )
-        options.setdefault( 'addr2', self.randMac() )
+        if 'addr1' not in options:
+            options[ 'addr1' ] = self.addresses.linkMac()
+        else:
+            self.addresses.reserve( mac=options[ 'addr1' ] )
+        if 'addr2' not in options:
+            options[ 'addr2' ] = self.addresses.linkMac()
+        else:
+            self.addresses.reserve( mac=options[ 'addr2' ] )
         cls = self.link if cls is None else cls
         link = cls( node1, node2, **options )
         self.links.append( link )
+        self.linkMacs[ link ] = options[ 'addr1' ], options[ 'addr2' ]
         return link
 
     def delLink( self, link ):
         "Remove a link from this network"
         link.delete()
         self.links.remove( link )
+        addr1, addr2 = self.linkMacs.pop( link, ( None, None ) )
+        self.addresses.release( mac=addr1 )
+        self.addresses.release( mac=addr2 )
 
     def linksBetween( self, node1, node2 ):
         "Return Links between node1 and node2"
@@ -425,6 +467,115 @@ def delLinkBetween( self, node1, node2, index=0, allLinks=False ):
             self.delLink( link )
         return links
 
+    @staticmethod
+    def linkId( link ):
+        "Return key identifying a link by its endpoints and ports"
+        intf1, intf2 = link.intf1, link.intf2
+        return tuple( sorted( [ ( intf1.node.name, intf1.node.ports[ intf1 ] ),
+                                ( intf2.node.name,
+                                  intf2.node.ports[ intf2 ] ) ] ) )
+
+    @staticmethod
+    def reconfigLink( link, oldInfo, newInfo ):
+        """Apply changed link options to a live link, if we can
+           link: link to reconfigure
+           oldInfo: old link options
+           newInfo: new link options
+           returns: True if link was reconfigured in place"""
+        changed = set( k for k in set( oldInfo ) | set( newInfo )
+                       if oldInfo.get( k ) != newInfo.get( k ) )
+        intfs = link.intf1, link.intf2
+        if not ( changed <= set( TCIntf.configDefaults ) and
+                 all( isinstance( intf, TCIntf ) for intf in intfs ) ):
+            return False
+        # Removed options revert to their defaults
+        defaults = TCIntf.configDefaults
+        for intf in intfs:
+            intf.update( **{ k: newInfo.get( k, defaults[ k ] )
+                             for k in changed } )
+        return True
+
+    def detachLink( self, link ):
+        "Detach a link's interfaces from any running switches"
+        if not self.started:
+            return
+        for intf in link.intf1, link.intf2:
+            if intf.node in self.switches and hasattr( intf.node, 'detach' ):
+                intf.node.detach( intf )
+
+    def apply( self, topo ):
+        """Reconfigure the network to match a new topology, changing
+           only the nodes and links that differ from our current one
+           (nodes and links added outside of self.topo are not
+           considered)
+           topo: new Topo
+           returns: changes (see Topo.diff())"""
+        if not self.topo:
+            raise Exception( 'apply: network was not built from a Topo' )
+        changes = self.topo.diff( topo )
+        running = { self.linkId( link ): link for link in self.links }
+
+        def runningLink( n1, n2, key ):
+            "Return live link for a link in self.topo, or None"
+            return running.get(
+                Topo.linkId( self.topo.linkInfo( n1, n2, key ) ) )
+
+        # Options changes: reconfigure in place if possible, else replace
+        delLinks, addLinks = changes[ 'delLinks' ], changes[ 'addLinks' ]
+        for old, new in changes[ 'changedLinks' ]:
+            link = runningLink( *old )
+            if link and self.reconfigLink(
+                    link, Topo.linkOpts( self.topo.linkInfo( *old ) ),
+                    Topo.linkOpts( topo.linkInfo( *new ) ) ):
+                continue
+            delLinks = delLinks + [ old ]
+            addLinks = addLinks + [ new ]
+
+        info( '*** Removing %d links and %d nodes\n' %
+              ( len( delLinks ), len( changes[ 'delNodes' ] ) ) )
+        for n1, n2, key in delLinks:
+            link = runningLink( n1, n2, key )
+            if link:
+                self.detachLink( link )
+                self.delLink( link )
+        for name in changes[ 'delNodes' ]:
+            node = self.nameToNode.get( name )
+            if not node:
+                continue
+            for link in [ l for l in self.links
+                          if node in ( l.intf1.node, l.intf2.node ) ]:
+                self.detachLink( link )
+                self.delLink( link )
+            self.delNode( node )
+
+        info( '*** Adding %d nodes and %d links\n' %
+              ( len( changes[ 'addNodes' ] ), len( addLinks ) ) )
+        hosts, switches = [], []
+        for name in changes[ 'addNodes' ]:
+            params = dict( topo.nodeInfo( name ) )
+            if topo.isSwitch( name ):
+                switches.append( self.addSwitch( name, **params ) )
+            else:
+                hosts.append( self.addHost( name, **params ) )
+        links = [ self.addLink( **topo.linkInfo( n1, n2, key ) )
+                  for n1, n2, key in addLinks ]
+        for host in hosts:
+            if host.defaultIntf():
+                host.configDefault()
+            else:
+                host.configDefault( ip=None, mac=None )
+        if self.started:
+            for switch in switches:
+                switch.start( self.controllers )
+            for link in links:
+                for intf in link.intf1, link.intf2:
+                    node = intf.node
+                    if ( node in self.switches and node not in switches and
+                         hasattr( node, 'attach' ) ):
+                        node.attach( intf )
+        self.topo = topo
+        return changes
+
     def configHosts( self ):
         "Configure a set of hosts."
         for host in self.hosts:
@@ -443,6 +594,52 @@ def configHosts( self ):
             # it needs to be done somewhere.
         info( '\n' )
 
+    def addDefaultControllers( self ):
+        "Add default controller(s) if we have none"
+        if self.controllers or not self.controller:
+            return
+        info( '*** Adding controller\n' )
+        classes = self.controller
+        if not isinstance( classes, list ):
+            classes = [ classes ]
+        for i, cls in enumerate( classes ):
+            # Allow Controller objects because nobody
+            # understands partial()
+            if isinstance( cls, Controller ):
+                self.addController( cls )
+            else:
+                self.addController( 'c%d' % i, cls )
+
+    def topoParams( self, topo ):
+        """Return params for building topo's nodes and links
+           topo: Topo object
+           returns: { name: params }, [ ( src, dst, params ) ]"""
+        # A precomputed build plan (see Topo.makePlan()) supplies
+        # addresses, dpids and interface names, and the link order
+        plan = getattr( topo, 'getPlan', None )
+        plan = plan and plan( ipBase=self.ipBase,
+                              autoSetMacs=self.autoSetMacs )
+        planned = plan[ 'nodes' ] if plan else {}
+        nodeParams = {}
+        for name in topo.nodes():
+            params = dict( planned.get( name, {} ) )
+            params.update( topo.nodeInfo( name ) )
+            nodeParams[ name ] = params
+        # A bit ugly: add batch parameter if appropriate
+        for name in topo.switches():
+            params = nodeParams[ name ]
+            if hasattr( params.get( 'cls', self.switch ), 'batchStartup' ):
+                params.setdefault( 'batch', True )
+        if plan:
+            links = []
+            for srcName, dstName, key, params in plan[ 'links' ]:
+                params = dict( params )
+                params.update( topo.linkInfo( srcName, dstName, key ) )
+                links.append( ( srcName, dstName, params ) )
+        else:
+            links = topo.links( sort=True, withInfo=True )
+        return nodeParams, links
+
     def buildFromTopo( self, topo=None ):
         """Build mininet from a topology object
            At the end of this function, everything should be connected
@@ -455,39 +652,31 @@ def buildFromTopo( self, topo=None ):
 
         info( '*** Creating network\n' )
 
-        if not self.controllers and self.controller:
-            # Add a default controller
-            info( '*** Adding controller\n' )
-            classes = self.controller
-            if not isinstance( classes, list ):
-                classes = [ classes ]
-            for i, cls in enumerate( classes ):
-                # Allow Controller objects because nobody understands partial()
-                if isinstance( cls, Controller ):
-                    self.addController( cls )
-                else:
-                    self.addController( 'c%d' % i, cls )
+        # Make sure that we don't allocate any addresses in the topo
+        self.addresses.reserveTopo( topo )
+
+        with timer.phase( 'spawn' ):
+            self.addDefaultControllers()
+
+        nodeParams, links = self.topoParams( topo )
 
         info( '*** Adding hosts:\n' )
-        for hostName in topo.hosts():
-            self.addHost( hostName, **topo.nodeInfo( hostName ) )
-            info( hostName + ' ' )
+        with timer.phase( 'spawn' ):
+            for hostName in topo.hosts():
+                self.addHost( hostName, **nodeParams[ hostName ] )
+                info( hostName + ' ' )
 
         info( '\n*** Adding switches:\n' )
-        for switchName in topo.switches():
-            # A bit ugly: add batch parameter if appropriate
-            params = topo.nodeInfo( switchName)
-            cls = params.get( 'cls', self.switch )
-            if hasattr( cls, 'batchStartup' ):
-                params.setdefault( 'batch', True )
-            self.addSwitch( switchName, **params )
-            info( switchName + ' ' )
+        with timer.phase( 'spawn' ):
+            for switchName in topo.switches():
+                self.addSwitch( switchName, **nodeParams[ switchName ] )
+                info( switchName + ' ' )
 
         info( '\n*** Adding links:\n' )
-        for srcName, dstName, params in topo.links(
-                sort=True, withInfo=True ):
-            self.addLink( **params )
-            info( '(%s, %s) ' % ( srcName, dstName ) )
+        with timer.phase( 'links' ):
+            for srcName, dstName, params in links:
+                self.addLink( **params )
+                info( '(%s, %s) ' % ( srcName, dstName ) )
 
         info( '\n' )
 
@@ -503,11 +692,13 @@ def build( self ):
         if self.inNamespace:
             self.configureControlNetwork()
         info( '*** Configuring hosts\n' )
-        self.configHosts()
+        with timer.phase( 'config' ):
+            self.configHosts()
         if self.xterms:
             self.startTerms()
         if self.autoStaticArp:
-            self.staticArp()
+            with timer.phase( 'arp' ):
+                self.staticArp()
         self.built = True
 
     def startTerms( self ):
@@ -539,65 +730,97 @@ def start( self ):
         if not self.built:
             self.build()
         info( '*** Starting controller\n' )
-        for controller in self.controllers:
-            info( controller.name + ' ')
-            controller.start()
+        with timer.phase( 'controllers' ):
+            self.startControllers()
         info( '\n' )
         info( '*** Starting %s switches\n' % len( self.switches ) )
-        for switch in self.switches:
-            info( switch.name + ' ')
-            switch.start( self.controllers )
-        started = {}
-        for swclass, switches in groupby(
-                sorted( self.switches, key=type ), type ):
-            switches = tuple( switches )
-            if hasattr( swclass, 'batchStartup' ):
-                success = swclass.batchStartup( switches )
-                started.update( { s: s for s in success } )
+        with timer.phase( 'switches' ):
+            for switch in self.switches:
+                info( switch.name + ' ')
+                switch.start( self.controllers )
+        with timer.phase( 'batchstart' ):
+            started = {}
+            for swclass, switches in groupby(
+                    sorted( self.switches, key=type ), type ):
+                switches = tuple( switches )
+                if hasattr( swclass, 'batchStartup' ):
+                    success = swclass.batchStartup( switches )
+                    started.update( { s: s for s in success } )
         info( '\n' )
+        self.started = True
         if self.waitConn:
-            self.waitConnected()
+            with timer.phase( 'connect' ):
+                self.waitConnected()
+
+    def startControllers( self ):
+        """Start controllers, and wait until they are listening, so that
+           switches can connect to them on the first try
+           returns: True if all controllers are listening"""
+        # Controller.start() runs the controller in the background,
+        # so controllers start up concurrently; we then wait for all
+        # of them at once
+        for controller in self.controllers:
+            info( controller.name + ' ' )
+            controller.start()
+        # We can only probe from the namespaces of local nodes
+        controllers = [ c for c in self.controllers if c.waitListening and
+                        not getattr( c, 'isRemote', False ) ]
+        if not controllers or not self.controllerTimeout:
+            return True
+        listening = probeListening(
+            [ ( c, c.IP(), c.port ) for c in controllers ],
+            timeout=self.controllerTimeout )
+        missing = [ '%s (%s:%s)' % ( c, c.IP(), c.port )
+                    for i, c in enumerate( controllers )
+                    if i not in listening ]
+        if missing:
+            warn( '\n*** Warning: not listening after %s seconds: %s' %
+                  ( self.controllerTimeout, ' '.join( missing ) ) )
+        return not missing
 
     def stop( self ):
         "Stop the controller(s), switches and hosts"
-        info( '*** Stopping %i controllers\n' % len( self.controllers ) )
-        for controller in self.controllers:
-            info( controller.name + ' ' )
-            controller.stop()
-        info( '\n' )
-        if self.terms:
-            info( '*** Stopping %i terms\n' % len( self.terms ) )
-            self.stopXterms()
-        info( '*** Stopping %i links\n' % len( self.links ) )
-        for link in self.links:
-            info( '.' )
-            link.stop()
-        info( '\n' )
-        info( '*** Stopping %i switches\n' % len( self.switches ) )
-        stopped = {}
-        for swclass, switches in groupby(
-                sorted( self.switches, key=type ), type ):
-            switches = tuple( switches )
-            if hasattr( swclass, 'batchShutdown' ):
-                success = swclass.batchShutdown( switches )
-                stopped.update( { s: s for s in success } )
-        for switch in self.switches:
-            info( switch.name + ' ' )
-            if switch not in stopped:
-                switch.stop()
-            switch.terminate()
-        info( '\n' )
-        info( '*** Stopping %i hosts\n' % len( self.hosts ) )
-        for host in self.hosts:
-            info( host.name + ' ' )
-            host.terminate()
-        info( '\n*** Done\n' )
+        with timer.phase( 'teardown' ):
+            info( '*** Stopping %i controllers\n' % len( self.controllers ) )
+            for controller in self.controllers:
+                info( controller.name + ' ' )
+                controller.stop()
+            info( '\n' )
+            if self.terms:
+                info( '*** Stopping %i terms\n' % len( self.terms ) )
+                self.stopXterms()
+            info( '*** Stopping %i links\n' % len( self.links ) )
+            for link in self.links:
+                info( '.' )
+                link.stop()
+            info( '\n' )
+            info( '*** Stopping %i switches\n' % len( self.switches ) )
+            stopped = {}
+            for swclass, switches in groupby(
+                    sorted( self.switches, key=type ), type ):
+                switches = tuple( switches )
+                if hasattr( swclass, 'batchShutdown' ):
+                    success = swclass.batchShutdown( switches )
+                    stopped.update( { s: s for s in success } )
+            for switch in self.switches:
+                info( switch.name + ' ' )
+                if switch not in stopped:
+                    switch.stop()
+                switch.terminate()
+            info( '\n' )
+            info( '*** Stopping %i hosts\n' % len( self.hosts ) )
+            for host in self.hosts:
+                info( host.name + ' ' )
+                host.terminate()
+            self.started = False
+            info( '\n*** Done\n' )
 
     def run( self, test, *args, **kwargs ):
         "Perform a complete start/test/stop cycle."
         self.start()
         info( '*** Running test\n' )
-        result = test( *args, **kwargs )
+        with timer.phase( 'test' ):
+            result = test( *args, **kwargs )
         self.stop()
         return result
 
@@ -902,13 +1125,10 @@ def configLinkStatus( self, src, dst, status ):
             connections = src.connectionsTo( dst )
             if len( connections ) == 0:
                 error( 'src and dst not connected: %s %s\n' % ( src, dst) )
-            for srcIntf, dstIntf in connections:
-                result = srcIntf.ifconfig( status )
-                if result:
-                    error( 'link src status change failed: %s\n' % result )
-                result = dstIntf.ifconfig( status )
-                if result:
-                    error( 'link dst status change failed: %s\n' % result )
+            # Change all of the interfaces at once
+            intfs = [ intf for pair in connections for intf in pair ]
+            for result in setIntfStatus( intfs, status ):
+                error( 'link status change failed: %s\n' % result )
 
     def interact( self ):
         "Start network and run our simple CLI."
@@ -15,6 +15,13 @@
     hosts share the root file system, but they may also specify private
     directories.
 
+LightweightHost: a virtual host without a resident shell; commands
+    are run on demand in its namespace, so that many more hosts fit
+    within process and file descriptor limits.
+
+AgentHost: a LightweightHost whose commands are run by a single
+    namespace agent shared by all AgentHosts.
+
 CPULimitedHost: a virtual host whose CPU bandwidth is limited by
     RT or CFS bandwidth limiting.
 
@@ -57,14 +64,18 @@
 import re
 import signal
 import select
-from subprocess import Popen, PIPE
-from time import sleep
+from threading import Lock
+from subprocess import PIPE, STDOUT
+from time import sleep, time
 
-from mininet.log import info, error, warn, debug
+from mininet.log import info, error, warn, debug, LazyFormat
+from mininet.perf import timer, tracer
 from mininet.util import ( quietRun, errRun, errFail, moveIntf, isShellBuiltin,
-                           numCores, retry, mountCgroups )
+                           numCores, retry, mountCgroups, which,
+                           isListening, SpawnPopen )
 from mininet.moduledeps import moduleDeps, pathCheck, TUN
 from mininet.link import Link, Intf, TCIntf, OVSIntf
+from mininet.agent import NamespaceAgent
 from re import findall
 from distutils.version import StrictVersion
 
@@ -101,6 +112,8 @@ def __init__( self, name, inNamespace=True, **params ):
                 None, None, None, None, None, None, None, None )
         self.waiting = False
         self.readbuf = ''
+        # Start time and exit status of lastCmd, for tracing
+        self.cmdStart, self.lastStatus = None, None
 
         # Start command interpreter shell
         self.startShell()
@@ -198,7 +211,7 @@ def _popen( self, cmd, **params ):
             params: parameters to Popen()"""
         # Leave this is as an instance method for now
         assert self
-        return Popen( cmd, **params )
+        return SpawnPopen( cmd, **params )
 
     def cleanup( self ):
         "Help python collect its garbage."
@@ -207,6 +220,11 @@ def cleanup( self ):
         # for intfName in self.intfNames():
         # if self.name in intfName:
         # quietRun( 'ip link del ' + intfName )
+        # Forget our fds, which may be reused by other nodes
+        for fdmap, f in ( ( self.outToNode, self.stdout ),
+                          ( self.inToNode, self.stdin ) ):
+            if f and not f.closed and fdmap.get( f.fileno() ) is self:
+                del fdmap[ f.fileno() ]
         self.shell = None
 
     # Subshell I/O, commands and control
@@ -284,6 +302,7 @@ def sendCmd( self, *args, **kwargs ):
             # Replace empty commands with something harmless
             cmd = 'echo -n'
         self.lastCmd = cmd
+        self.cmdStart = time() if tracer.enabled else None
         # if a builtin command is backgrounded, it still yields a PID
         if len( cmd ) > 0 and cmd[ -1 ] == '&':
             # print ^A{pid}\n so monitor() can set lastPid
@@ -343,6 +362,10 @@ def waitOutput( self, verbose=False, findPid=True ):
             data = self.monitor( findPid=findPid )
             output += data
             log( data )
+        if self.cmdStart is not None and tracer.enabled:
+            tracer.add( 'cmd', self.name, self.lastCmd, self.cmdStart,
+                        size=len( output ), status=self.lastStatus )
+            self.cmdStart = None
         return output
 
     def cmd( self, *args, **kwargs ):
@@ -350,10 +373,14 @@ def cmd( self, *args, **kwargs ):
            cmd: string"""
         verbose = kwargs.get( 'verbose', False )
         log = info if verbose else debug
-        log( '*** %s : %s\n' % ( self.name, args ) )
+        log( LazyFormat( '*** %s : %s\n', self.name, args ) )
         if self.shell:
+            start = time()
             self.sendCmd( *args, **kwargs )
-            return self.waitOutput( verbose )
+            result = self.waitOutput( verbose )
+            if timer.enabled:
+                timer.addCmd( self.name, self.lastCmd, time() - start )
+            return result
         else:
             warn( '(%s exited - ignoring cmd%s)\n' % ( self, args ) )
 
@@ -365,11 +392,14 @@ def cmdPrint( self, *args):
     def popen( self, *args, **kwargs ):
         """Return a Popen() object in our namespace
            args: Popen() args, single list, or string
-           kwargs: Popen() keyword args"""
+           kwargs: Popen() keyword args, plus
+             trace: record a tracer span (pexec() records its own)"""
         defaults = { 'stdout': PIPE, 'stderr': PIPE,
                      'mncmd':
-                     [ 'mnexec', '-da', str( self.pid ) ] }
+                     [ 'mnexec', '-da', str( self.pid ) ],
+                     'trace': True }
         defaults.update( kwargs )
+        trace = defaults.pop( 'trace' )
         if len( args ) == 1:
             if isinstance( args[ 0 ], list ):
                 # popen([cmd, arg1, arg2...])
@@ -387,17 +417,25 @@ def popen( self, *args, **kwargs ):
         # Shell requires a string, not a list!
         if defaults.get( 'shell', False ):
             cmd = ' '.join( cmd )
+        start = time()
         popen = self._popen( cmd, **defaults )
+        if trace and tracer.enabled:
+            # We only know how long it took to start
+            tracer.add( 'popen', self.name, cmd, start )
         return popen
 
     def pexec( self, *args, **kwargs ):
         """Execute a command using popen
            returns: out, err, exitcode"""
+        start = time()
         popen = self.popen( *args, stdin=PIPE, stdout=PIPE, stderr=PIPE,
-                            **kwargs )
+                            trace=False, **kwargs )
         # Warning: this can fail with large numbers of fds!
         out, err = popen.communicate()
         exitcode = popen.wait()
+        if tracer.enabled:
+            tracer.add( 'pexec', self.name, args, start,
+                        size=len( out ) + len( err ), status=exitcode )
         return out, err, exitcode
 
     # Interface management, configuration, and routing
@@ -425,8 +463,8 @@ def addIntf( self, intf, port=None, moveIntfFn=moveIntf ):
         self.ports[ intf ] = port
         self.nameToIntf[ intf.name ] = intf
         debug( '\n' )
-        debug( 'added intf %s (%d) to node %s\n' % (
-                intf, port, self.name ) )
+        debug( LazyFormat( 'added intf %s (%d) to node %s\n',
+                           intf, port, self.name ) )
         if self.inNamespace:
             debug( 'moving', intf, 'into namespace for', self.name, '\n' )
             moveIntfFn( intf.name, self  )
@@ -647,6 +685,220 @@ class Host( Node ):
     "A host is simply a Node"
     pass
 
+class LightweightHost( Host ):
+    """A host without a resident shell or pty: its namespace is held
+       by an idle mnexec-started process, and each command is run
+       on demand using mnexec -a. Commands run in a fresh sh, so
+       shell state (cwd, variables, jobs) does not persist between
+       them, and backgrounded commands' output is discarded."""
+
+    def startShell( self, mnopts=None ):
+        "Start an idle process to hold our namespace"
+        if self.shell:
+            error( "%s: shell is already running\n" % self.name )
+            return
+        # mnexec: (c)lose descriptors, (d)etach from tty,
+        # run in (n)amespace, and (p)rint pid once it exists
+        opts = '-cd' if mnopts is None else mnopts
+        if self.inNamespace:
+            opts += 'n'
+        opts += 'p'
+        with open( os.devnull, 'r+' ) as devnull:
+            self.shell = self._popen( [ 'mnexec', opts, 'sleep', 'infinity' ],
+                                      stdin=devnull, stdout=PIPE,
+                                      stderr=devnull, close_fds=True )
+        # Wait for namespace, then drop the pipe so we hold no fds
+        self.shell.stdout.readline()
+        self.shell.stdout.close()
+        self.pid = self.shell.pid
+        self.proc = None
+        self.execed = False
+        self.lastCmd = None
+        self.lastPid = None
+        self.readbuf = ''
+        self.waiting = False
+
+    def shellCmd( self, args, printPid=False ):
+        """Return shell command string for cmd()/sendCmd() args,
+           and set lastCmd
+           args: command and arguments, or string
+           printPid: print command's PID?"""
+        if len( args ) == 1 and isinstance( args[ 0 ], list ):
+            cmd = args[ 0 ]
+        elif len( args ) > 0:
+            cmd = args
+        if not isinstance( cmd, str ):
+            cmd = ' '.join( [ str( c ) for c in cmd ] )
+        if not re.search( r'\w', cmd ):
+            cmd = 'echo -n'
+        self.lastCmd = cmd
+        if cmd.rstrip()[ -1: ] == '&':
+            # Detach from our output pipe so that we don't wait for
+            # it, and print ^A{pid}\n so that we can set lastPid
+            cmd = ( '( %s ) < /dev/null > /dev/null 2>&1 & '
+                    'printf "\\001%%d\\012" $!' % cmd.rstrip()[ :-1 ] )
+        elif printPid and not isShellBuiltin( cmd ):
+            cmd = 'mnexec -p ' + cmd
+        return cmd
+
+    def findPid( self, data ):
+        """Set lastPid from a ^A{pid}\n marker in data
+           returns: data without marker"""
+        marker = chr( 1 ) + r'(\d+)\n'
+        pids = re.findall( marker, data )
+        if pids:
+            self.lastPid = int( pids[ 0 ] )
+            data = re.sub( marker, '', data )
+        return data
+
+    def sendCmd( self, *args, **kwargs ):
+        """Start a command in our namespace, and return without
+           waiting for the command to complete.
+           args: command and arguments, or string
+           printPid: print command's PID? (False)"""
+        assert self.shell and not self.waiting
+        cmd = self.shellCmd( args, kwargs.get( 'printPid', False ) )
+        self.cmdStart = time() if tracer.enabled else None
+        self.lastStatus = None
+        # New process group, so that sendInt() reaches the whole command
+        self.proc = self._popen( [ 'mnexec', '-a', str( self.pid ),
+                                   'sh', '-c', cmd ],
+                                 stdin=PIPE, stdout=PIPE, stderr=STDOUT,
+                                 close_fds=True, preexec_fn=os.setpgrp )
+        self.stdin, self.stdout = self.proc.stdin, self.proc.stdout
+        self.pollOut = select.poll()
+        self.pollOut.register( self.stdout )
+        self.lastPid = None
+        self.waiting = True
+
+    def write( self, data ):
+        """Write data to running command.
+           data: string"""
+        if self.proc:
+            os.write( self.stdin.fileno(), data )
+
+    def sendInt( self, intr=chr( 3 ) ):
+        "Interrupt running command."
+        assert intr
+        if self.proc and self.proc.poll() is None:
+            os.killpg( self.proc.pid, signal.SIGINT )
+
+    def monitor( self, timeoutms=None, findPid=True ):
+        """Monitor and return the output of a command.
+           Set self.waiting to False if command has completed.
+           timeoutms: timeout in ms or None to wait indefinitely
+           findPid: look for PID from mnexec -p"""
+        if not self.proc:
+            self.waiting = False
+            return ''
+        ready = self.waitReadable( timeoutms )
+        if not ready:
+            return ''
+        data = self.read( 1024 )
+        if not data:
+            # EOF: command has completed
+            self.lastStatus = self.proc.wait()
+            self.stdin.close()
+            self.stdout.close()
+            self.proc = None
+            self.waiting = False
+            return ''
+        if findPid and chr( 1 ) in data:
+            # Marker can be read in chunks; continue until all of it is read
+            while not re.search( chr( 1 ) + r'\d+\n', data ):
+                more = self.read( 1024 )
+                if not more:
+                    break
+                data += more
+            data = self.findPid( data )
+        return data
+
+    def terminate( self ):
+        "Stop any running command, and release our namespace."
+        if self.proc:
+            if self.proc.poll() is None:
+                os.killpg( self.proc.pid, signal.SIGHUP )
+            self.proc.wait()
+            self.proc = None
+            self.waiting = False
+        super( LightweightHost, self ).terminate()
+
+class AgentHost( LightweightHost ):
+    """A LightweightHost whose cmd() and pexec() are run by a single
+       namespace agent shared by all AgentHosts (see mininet.agent),
+       rather than by forking Mininet itself. Interactive commands
+       (sendCmd()/monitor(), as used by the CLI) and popen() still
+       use mnexec -a. The agent is started by the first AgentHost
+       and stopped when the last one terminates."""
+
+    agent = None  # shared NamespaceAgent
+    agentLock = Lock()
+
+    def startShell( self, mnopts=None ):
+        "Start an idle process to hold our namespace, and register it"
+        LightweightHost.startShell( self, mnopts )
+        with AgentHost.agentLock:
+            if not AgentHost.agent or not AgentHost.agent.alive():
+                AgentHost.agent = NamespaceAgent()
+            self.agent = AgentHost.agent
+            self.agent.add( self.name, self.pid )
+
+    def cmd( self, *args, **kwargs ):
+        """Run a command using the agent, and return its output
+           (stdout and stderr).
+           cmd: string"""
+        verbose = kwargs.get( 'verbose', False )
+        log = info if verbose else debug
+        log( LazyFormat( '*** %s : %s\n', self.name, args ) )
+        if not self.shell:
+            warn( '(%s exited - ignoring cmd%s)\n' % ( self, args ) )
+            return
+        assert not self.waiting
+        start = time()
+        cmd = self.shellCmd( args, kwargs.get( 'printPid', False ) )
+        self.lastPid = None
+        out, _err, exitcode = self.agent.run( self.name, cmd, merge=True )
+        out = self.findPid( out )
+        log( out )
+        if tracer.enabled:
+            tracer.add( 'cmd', self.name, self.lastCmd, start,
+                        size=len( out ), status=exitcode )
+        if timer.enabled:
+            timer.addCmd( self.name, self.lastCmd, time() - start )
+        return out
+
+    def pexec( self, *args, **kwargs ):
+        """Execute a command using the agent
+           returns: out, err, exitcode"""
+        if kwargs:
+            # Popen() options need a real Popen()
+            return LightweightHost.pexec( self, *args, **kwargs )
+        if len( args ) == 1 and isinstance( args[ 0 ], basestring ):
+            cmd = args[ 0 ].split()
+        elif len( args ) == 1:
+            cmd = args[ 0 ]
+        else:
+            cmd = list( args )
+        start = time()
+        out, err, exitcode = self.agent.run( self.name, cmd )
+        if tracer.enabled:
+            tracer.add( 'pexec', self.name, cmd, start,
+                        size=len( out ) + len( err ), status=exitcode )
+        return out, err, exitcode
+
+    def terminate( self ):
+        """Release our namespace in the agent (stopping the agent if
+           we are its last node), and stop"""
+        with AgentHost.agentLock:
+            agent = self.agent
+            if self.shell and agent and agent.alive():
+                agent.remove( self.name )
+            if agent and not ( agent.nodes and agent.alive() ):
+                agent.stop()
+                if AgentHost.agent is agent:
+                    AgentHost.agent = None
+        super( AgentHost, self ).terminate()
+
 class CPULimitedHost( Host ):
 
     "CPU limited host"
@@ -1075,8 +1327,13 @@ def setup( cls ):
                    'You may wish to try '
                    '"service openvswitch-switch start".\n' )
             exit( 1 )
-        version = quietRun( 'ovs-vsctl --version' )
-        cls.OVSVersion = findall( r'\d+\.\d+', version )[ 0 ]
+        # Recent OVS versions report their version in 'show', which
+        # saves us a second ovs-vsctl invocation
+        version = findall( r'ovs_version: "(\d+\.\d+)', out )
+        if not version:
+            version = findall( r'\d+\.\d+',
+                               quietRun( 'ovs-vsctl --version' ) )
+        cls.OVSVersion = version[ 0 ]
 
     @classmethod
     def isOldOVS( cls ):
@@ -1100,9 +1357,9 @@ def vsctl( self, *args, **kwargs ):
     def TCReapply( intf ):
         """Unfortunately OVS and Mininet are fighting
            over tc queuing disciplines. As a quick hack/
-           workaround, we clear OVS's and reapply our own."""
-        if isinstance( intf, TCIntf ):
-            intf.config( **intf.params )
+           workaround, we clear OVS's and reapply our own
+           (if OVS has replaced it)."""
+        TCIntf.reapply( [ intf ] )
 
     def attach( self, intf ):
         "Connect a data port"
@@ -1199,8 +1456,7 @@ def start( self, controllers ):
                     intfs )
         # If necessary, restore TC config overwritten by OVS
         if not self.batch:
-            for intf in self.intfList():
-                self.TCReapply( intf )
+            TCIntf.reapply( self.intfList() )
 
     # This should be ~ int( quietRun( 'getconf ARG_MAX' ) ),
     # but the real limit seems to be much lower
@@ -1229,10 +1485,8 @@ def batchStartup( cls, switches, run=errRun ):
         if cmds:
             run( cmds, shell=True )
         # Reapply link config if necessary...
-        for switch in switches:
-            for intf in switch.intfs.itervalues():
-                if isinstance( intf, TCIntf ):
-                    intf.config( **intf.params )
+        TCIntf.reapply( [ intf for switch in switches
+                          for intf in switch.intfs.itervalues() ] )
         return switches
 
     def stop( self, deleteIntfs=True ):
@@ -1359,6 +1613,9 @@ class Controller( Node ):
     """A Controller is a Node that is running (or has execed?) an
        OpenFlow controller."""
 
+    # Should Mininet.start() wait until we are listening?
+    waitListening = True
+
     def __init__( self, name, inNamespace=False, command='controller',
                   cargs='-v ptcp:%d', cdir=None, ip="127.0.0.1",
                   port=6653, protocol='tcp', **params ):
@@ -1378,15 +1635,7 @@ def __init__( self, name, inNamespace=False, command='controller',
 
     def checkListening( self ):
         "Make sure no controllers are running on our port"
-        # Verify that Telnet is installed first:
-        out, _err, returnCode = errRun( "which telnet" )
-        if 'telnet' not in out or returnCode != 0:
-            raise Exception( "Error running telnet to check for listening "
-                             "controllers; please check that it is "
-                             "installed." )
-        listening = self.cmd( "echo A | telnet -e A %s %d" %
-                              ( self.ip, self.port ) )
-        if 'Connected' in listening:
+        if isListening( self, self.ip, self.port ):
             servers = self.cmd( 'netstat -natp' ).split( '\n' )
             pstr = ':%d ' % self.port
             clist = servers[ 0:1 ] + [ s for s in servers if pstr in s ]
@@ -1428,7 +1677,7 @@ def __repr__( self ):
     @classmethod
     def isAvailable( cls ):
         "Is controller available?"
-        return quietRun( 'which controller' )
+        return which( 'controller' )
 
 
 class OVSController( Controller ):
@@ -1440,9 +1689,9 @@ def __init__( self, name, **kwargs ):
 
     @classmethod
     def isAvailable( cls ):
-        return ( quietRun( 'which ovs-controller' ) or
-                 quietRun( 'which test-controller' ) or
-                 quietRun( 'which ovs-testcontroller' ) ).strip()
+        return ( which( 'ovs-controller' ) or
+                 which( 'test-controller' ) or
+                 which( 'ovs-testcontroller' ) )
 
 class NOX( Controller ):
     "Controller to run a NOX application."
@@ -1495,6 +1744,9 @@ def __init__( self, name, *ryuArgs, **kwargs ):
 class RemoteController( Controller ):
     "Controller running outside of Mininet's control."
 
+    # We don't start remote controllers, so we don't wait for them
+    waitListening = False
+
     def __init__( self, name, ip='127.0.0.1',
                   port=None, **kwargs):
         """Init.
@@ -1531,8 +1783,7 @@ def checkListening( self ):
 
     def isListening( self, ip, port ):
         "Check if a remote controller is listening at a specific ip and port"
-        listening = self.cmd( "echo A | telnet -e A %s %d" % ( ip, port ) )
-        if 'Connected' not in listening:
+        if not isListening( self, ip, port ):
             warn( "Unable to contact the remote controller"
                   " at %s:%d\n" % ( ip, port ) )
             return False
@@ -0,0 +1,276 @@
+"""
+perf.py: timing instrumentation for Mininet
+
+Mininet spends most of its build and teardown time waiting on
+external commands, so it can be hard to see where the time goes
+on large networks. This module provides a global PhaseTimer, timer,
+which records:
+
+- elapsed time for named phases of the network lifecycle
+  (shell spawn, link creation, intf config, tc config, switch
+  startup, controller connection, test and teardown)
+
+- latency histograms for Node.cmd(), per node and per command
+
+Instrumentation is disabled by default and costs next to nothing
+until it is enabled:
+
+    from mininet.perf import timer
+    timer.enable()
+    net = Mininet( topo )
+    ...
+    timer.dump( 'mn-profile.json' )
+
+mn --profile <file> enables it from the command line.
+
+A second global, tracer (a CmdTracer), records individual commands
+(Node.cmd() and friends, errRun() and Node.popen()/pexec()) with
+their node, start and end times, output size and exit status, in a
+ring buffer. (A Node's bash shell doesn't report exit status, so
+status is None for Node.cmd(); LightweightHost and AgentHost record
+it.) It exports Chrome trace JSON, which chrome://tracing
+and Perfetto (ui.perfetto.dev) display as one track per node, so
+that slow nodes and stragglers stand out:
+
+    from mininet.perf import tracer
+    tracer.enable()
+    ...
+    tracer.dump( 'mn-trace.json' )
+
+mn --trace <file> enables it from the command line.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from math import frexp
+from time import time
+import json
+import os
+
+from mininet.log import info
+
+
+class Histogram( object ):
+    "Latency histogram with power-of-two buckets"
+
+    def __init__( self ):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = {}  # bucket exponent -> count
+
+    def add( self, elapsed ):
+        """Add a sample
+           elapsed: elapsed time in seconds"""
+        self.count += 1
+        self.total += elapsed
+        if self.min is None or elapsed < self.min:
+            self.min = elapsed
+        if self.max is None or elapsed > self.max:
+            self.max = elapsed
+        # Bucket n holds samples in [ 2^(n-1), 2^n ) microseconds
+        _mantissa, exponent = frexp( elapsed * 1e6 )
+        self.buckets[ exponent ] = self.buckets.get( exponent, 0 ) + 1
+
+    def mean( self ):
+        "Return mean sample value"
+        return self.total / self.count if self.count else 0.0
+
+    def toDict( self ):
+        "Return histogram as a JSON-friendly dict"
+        # Bucket keys are upper bounds in microseconds
+        return { 'count': self.count, 'total': self.total,
+                 'mean': self.mean(), 'min': self.min, 'max': self.max,
+                 'buckets': { str( 2 ** exp ): n
+                              for exp, n in self.buckets.iteritems() } }
+
+
+class PhaseTimer( object ):
+    "Record phase timings and command latencies"
+
+    def __init__( self ):
+        self.enabled = False
+        self.reset()
+
+    def reset( self ):
+        "Discard all recorded data"
+        self.start = time()
+        self.timeline = []  # ( phase, start offset, elapsed ) in order
+        self.phases = {}  # phase -> Histogram
+        self.nodes = {}  # node name -> Histogram of cmd() latency
+        self.cmds = {}  # command name -> Histogram of cmd() latency
+
+    def enable( self, enabled=True ):
+        """Enable (or disable) instrumentation
+           enabled: True to enable, False to disable"""
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def add( self, name, elapsed, start=None ):
+        """Add elapsed time to a phase
+           name: phase name
+           elapsed: elapsed time in seconds
+           start: start time, to record phase in timeline (optional)"""
+        self.phases.setdefault( name, Histogram() ).add( elapsed )
+        if start is not None:
+            self.timeline.append( ( name, start - self.start, elapsed ) )
+
+    @contextmanager
+    def phase( self, name, timeline=True ):
+        """Context manager to time a lifecycle phase, e.g.
+           with timer.phase( 'links' ): ...
+           name: phase name
+           timeline: record phase in timeline (use False for
+                     frequent phases such as per-interface config)"""
+        if not self.enabled:
+            yield
+            return
+        start = time()
+        try:
+            yield
+        finally:
+            self.add( name, time() - start, start if timeline else None )
+
+    def addCmd( self, node, cmd, elapsed ):
+        """Record latency of a Node.cmd() call
+           node: node name
+           cmd: command string
+           elapsed: elapsed time in seconds"""
+        words = cmd.split( None, 1 )
+        name = words[ 0 ] if words else ''
+        self.nodes.setdefault( node, Histogram() ).add( elapsed )
+        self.cmds.setdefault( name, Histogram() ).add( elapsed )
+
+    def toDict( self ):
+        "Return recorded data as a JSON-friendly dict"
+        def hists( d ):
+            "Convert dict of Histograms"
+            return { k: h.toDict() for k, h in d.iteritems() }
+        return { 'timeline': [ { 'phase': name, 'start': start,
+                                 'elapsed': elapsed }
+                               for name, start, elapsed in self.timeline ],
+                 'phases': hists( self.phases ),
+                 'nodes': hists( self.nodes ),
+                 'cmds': hists( self.cmds ) }
+
+    def dump( self, filename ):
+        """Write recorded data to a JSON file
+           filename: output file name"""
+        with open( filename, 'w' ) as f:
+            json.dump( self.toDict(), f, indent=1, sort_keys=True )
+
+    def report( self, top=10 ):
+        """Print a phase summary and the slowest commands
+           top: number of commands to report"""
+        info( '*** Phase timings (count, total secs):\n' )
+        # Timeline order first, then phases not in the timeline
+        names = []
+        for name, _start, _elapsed in self.timeline:
+            if name not in names:
+                names.append( name )
+        names += sorted( set( self.phases ) - set( names ) )
+        for name in names:
+            hist = self.phases[ name ]
+            info( '%-16s %6d %10.3f\n' % ( name, hist.count, hist.total ) )
+        if self.cmds:
+            info( '*** Slowest commands (count, total, max secs):\n' )
+            cmds = sorted( self.cmds.iteritems(),
+                           key=lambda item: item[ 1 ].total, reverse=True )
+            for name, hist in cmds[ :top ]:
+                info( '%-16s %6d %10.3f %8.3f\n' %
+                      ( name, hist.count, hist.total, hist.max ) )
+
+
+timer = PhaseTimer()
+
+
+class CmdTracer( object ):
+    "Record command spans in a ring buffer, for Chrome trace export"
+
+    def __init__( self, size=100000 ):
+        """size: maximum number of commands to keep (older commands
+             are discarded)"""
+        self.enabled = False
+        self.size = size
+        self.reset()
+
+    def reset( self ):
+        "Discard all recorded commands"
+        self.start = time()
+        # ( kind, node, cmd, start, end, output size, exit status )
+        self.spans = deque( maxlen=self.size )
+
+    def enable( self, enabled=True, size=None ):
+        """Enable (or disable) tracing
+           enabled: True to enable, False to disable
+           size: ring buffer size (optional)"""
+        if size is not None:
+            self.size = size
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def add( self, kind, node, cmd, start, end=None, size=None,
+             status=None ):
+        """Record a command
+           kind: cmd, errRun, popen or pexec
+           node: node name, or None for the root namespace
+           cmd: command string or list
+           start, end: start and end times (end defaults to now)
+           size: output size in bytes (optional)
+           status: exit status (optional)"""
+        # deque.append() is atomic, so this is thread-safe
+        self.spans.append( ( kind, node, cmd, start,
+                             time() if end is None else end, size, status ) )
+
+    def slowest( self, top=10 ):
+        """Return the slowest recorded commands
+           top: number of commands to return"""
+        return sorted( self.spans, key=lambda s: s[ 4 ] - s[ 3 ],
+                       reverse=True )[ :top ]
+
+    def toChrome( self ):
+        "Return recorded commands as a Chrome trace (JSON-friendly dict)"
+        pid = os.getpid()
+        tids = {}  # node -> thread id (one track per node)
+        events = [ { 'name': 'process_name', 'ph': 'M', 'pid': pid,
+                     'args': { 'name': 'mininet' } } ]
+        for kind, node, cmd, start, end, size, status in self.spans:
+            node = node or 'root'
+            if node not in tids:
+                tids[ node ] = len( tids ) + 1
+                events.append( { 'name': 'thread_name', 'ph': 'M',
+                                 'pid': pid, 'tid': tids[ node ],
+                                 'args': { 'name': node } } )
+            if not isinstance( cmd, basestring ):
+                cmd = ' '.join( str( arg ) for arg in cmd )
+            words = cmd.split( None, 1 )
+            events.append( {
+                'name': words[ 0 ] if words else '', 'cat': kind,
+                'ph': 'X', 'pid': pid, 'tid': tids[ node ],
+                'ts': ( start - self.start ) * 1e6,
+                'dur': ( end - start ) * 1e6,
+                'args': { 'cmd': cmd, 'bytes': size, 'status': status } } )
+        return { 'traceEvents': events, 'displayTimeUnit': 'ms' }
+
+    def dump( self, filename ):
+        """Write recorded commands to a Chrome trace JSON file
+           filename: output file name"""
+        with open( filename, 'w' ) as f:
+            json.dump( self.toChrome(), f )
+
+    def report( self, top=10 ):
+        """Print the slowest commands
+           top: number of commands to report"""
+        info( '*** Slowest traced commands (secs, node, command):\n' )
+        for _kind, node, cmd, start, end, _size, _status in self.slowest(
+                top ):
+            if not isinstance( cmd, basestring ):
+                cmd = ' '.join( str( arg ) for arg in cmd )
+            info( '%8.3f %-10s %s\n' % ( end - start, node or 'root',
+                                         cmd[ :60 ] ) )
+
+
+tracer = CmdTracer()
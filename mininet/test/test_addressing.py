@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test address allocation."""
+
+import unittest
+
+from mininet import addressing
+from mininet.addressing import AddressPlanner
+from mininet.topo import Topo, LinearTopo
+from mininet.log import setLogLevel, warn
+
+
+class testAddressPlanner( unittest.TestCase ):
+    "Test AddressPlanner"
+
+    def testHosts( self ):
+        "Host addresses should skip reserved addresses"
+        planner = AddressPlanner( ipBase='192.168.1.0/24' )
+        planner.reserve( ip='192.168.1.2/24' )
+        ips = [ planner.hostParams()[ 'ip' ] for _ in range( 2 ) ]
+        self.assertEqual( ips, [ '192.168.1.1/24', '192.168.1.3/24' ] )
+        params = planner.hostParams( autoSetMacs=True, ip='192.168.1.9' )
+        self.assertEqual( params, { 'mac': '00:00:00:00:00:09' } )
+        small = AddressPlanner( ipBase='10.0.0.0/30' )
+        small.hostParams()
+        small.hostParams()
+        self.assertRaises( Exception, small.hostParams )
+
+    def testMacsAndDpids( self ):
+        "Link MACs and dpids should never collide"
+        planner = AddressPlanner()
+        planner.reserve( mac='02:00:00:00:00:02' )
+        macs = [ planner.linkMac() for _ in range( 2 ) ]
+        self.assertEqual( macs, [ '02:00:00:00:00:01',
+                                  '02:00:00:00:00:03' ] )
+        self.assertEqual( planner.dpid( 's1' ), '1' )
+        setLogLevel( 'error' )
+        self.assertEqual( planner.dpid( 'sw1' ), '2' )
+        setLogLevel( 'warning' )
+        self.assertEqual( planner.dpid( 'nonumber' ), None )
+
+    def testRelease( self ):
+        "Released addresses and dpids should be reused"
+        planner = AddressPlanner( ipBase='10.0.0.0/24' )
+        ips = [ planner.hostParams()[ 'ip' ] for _ in range( 3 ) ]
+        planner.release( ip=ips[ 1 ] )
+        self.assertEqual( planner.hostParams()[ 'ip' ], ips[ 1 ] )
+        self.assertEqual( planner.hostParams()[ 'ip' ], '10.0.0.4/24' )
+        self.assertEqual( planner.dpid( 's1' ), '1' )
+        planner.release( dpid='1' )
+        self.assertEqual( planner.dpid( 's1' ), '1' )
+
+    def testCollisions( self ):
+        "Explicit addresses that we already allocated should warn"
+        planner = AddressPlanner()
+        warnings = []
+        addressing.warn = warnings.append
+        try:
+            planner.reserve( ip=planner.hostParams()[ 'ip' ] )
+            planner.reserve( mac=planner.linkMac() )
+            planner.reserve( mac=planner.linkMac( explicit=True ) )
+            planner.reserve( dpid=planner.dpid( 's1' ) )
+            # Reserving explicit addresses twice is fine
+            planner.reserve( ip='10.1.1.1' )
+            planner.reserve( ip='10.1.1.1' )
+        finally:
+            addressing.warn = warn
+        self.assertEqual( len( warnings ), 3 )
+        self.assertIn( '10.0.0.1/8', warnings[ 0 ] )
+
+    def testSubnets( self ):
+        "Hosts should be allocated from their switch's block"
+        topo = LinearTopo( k=3, n=2 )
+        topo.addHost( 'h9', ip='10.0.0.1/8' )
+        plan = AddressPlanner( subnetLen=24 ).plan( topo )
+        self.assertEqual( plan[ 'subnets' ][ 's2' ], '10.0.2.0/24' )
+        self.assertEqual( plan[ 'nodes' ][ 'h1s2' ][ 'ip' ], '10.0.2.1/8' )
+        self.assertEqual( plan[ 'nodes' ][ 'h2s2' ][ 'ip' ], '10.0.2.2/8' )
+        self.assertEqual( plan[ 'nodes' ][ 'h9' ], {} )
+
+    def testTopo( self ):
+        "Explicit addresses in a topo should be reserved"
+        topo = Topo()
+        topo.addHost( 'h1' )
+        topo.addHost( 'h2', ip='10.0.0.1/8' )
+        plan = topo.makePlan()
+        self.assertEqual( plan[ 'nodes' ][ 'h1' ][ 'ip' ], '10.0.0.2/8' )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the namespace agent and AgentHost."""
+
+import unittest
+
+from mininet.agent import encodeFrame, decodeFrames
+from mininet.node import AgentHost
+from mininet.log import setLogLevel
+
+
+class testAgent( unittest.TestCase ):
+    "Test namespace agent"
+
+    def testFrames( self ):
+        "Verify framing of partial and multiple frames"
+        data = encodeFrame( { 'id': 1 } ) + encodeFrame( { 'id': 2 } )
+        objs, rest = decodeFrames( data[ :-1 ] )
+        self.assertEqual( objs, [ { 'id': 1 } ] )
+        objs, rest = decodeFrames( rest + data[ -1: ] )
+        self.assertEqual( objs, [ { 'id': 2 } ] )
+        self.assertEqual( rest, '' )
+
+    def testAgentHost( self ):
+        "Verify commands, exit codes and namespaces of AgentHosts"
+        h1, h2 = AgentHost( 'h1' ), AgentHost( 'h2' )
+        try:
+            self.assertEqual( h1.cmd( 'echo hello' ), 'hello\n' )
+            self.assertEqual( h1.pexec( 'sh', '-c', 'echo err >&2; exit 3' ),
+                              ( '', 'err\n', 3 ) )
+            # Each host has its own network namespace
+            h1.cmd( 'ip link add test0 type veth peer name test1' )
+            self.assertIn( 'test0', h1.cmd( 'ip link show' ) )
+            self.assertNotIn( 'test0', h2.cmd( 'ip link show' ) )
+            h1.cmd( 'sleep 30 &' )
+            self.assertTrue( h1.lastPid )
+            h1.cmd( 'kill %d' % h1.lastPid )
+        finally:
+            h1.terminate()
+            h2.terminate()
+
+    def testAgentLifetime( self ):
+        "The agent should stop with its last host, and restart if it dies"
+        h1, h2 = AgentHost( 'h1' ), AgentHost( 'h2' )
+        agent = AgentHost.agent
+        h1.terminate()
+        self.assertTrue( agent.alive() )
+        h2.terminate()
+        self.assertFalse( agent.alive() )
+        self.assertEqual( AgentHost.agent, None )
+        h1 = AgentHost( 'h1' )
+        try:
+            AgentHost.agent.process.kill()
+            AgentHost.agent.process.wait()
+            h2 = AgentHost( 'h2' )
+            self.assertEqual( h2.cmd( 'echo hello' ), 'hello\n' )
+            h2.terminate()
+        finally:
+            h1.terminate()
+        self.assertEqual( AgentHost.agent, None )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
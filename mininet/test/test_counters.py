@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test interface counter parsing and sampling."""
+
+import unittest
+import os
+
+from mininet.counters import parseNetDev, IntfCounters
+from mininet.log import setLogLevel
+
+
+NETDEV = """\
+Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:    1000      10    0    0    0     0          0         0     1000      10    0    0    0     0       0          0
+h1-eth0: 123456789012  98765    1    2    0     0          0         3 42  7    0    4    0     0       0          0
+"""
+
+
+class FakeNode( object ):
+    "Stand-in for a Node in this process's namespace"
+    name = 'self'
+    pid = os.getpid()
+
+
+class FakeIntf( object ):
+    "Stand-in for an Intf"
+    def __init__( self, name ):
+        self.name = name
+        self.node = FakeNode()
+
+
+class testCounters( unittest.TestCase ):
+    "Test interface counters"
+
+    def testParseNetDev( self ):
+        "Verify that /proc/net/dev is parsed correctly"
+        stats = parseNetDev( NETDEV )
+        self.assertEqual( sorted( stats ), [ 'h1-eth0', 'lo' ] )
+        self.assertEqual( stats[ 'h1-eth0' ][ :4 ],
+                          [ 123456789012, 98765, 1, 2 ] )
+        stats = parseNetDev( NETDEV, ( 'tx_bytes', 'tx_drop' ) )
+        self.assertEqual( stats[ 'h1-eth0' ], [ 42, 4 ] )
+
+    def testSample( self ):
+        "Verify sampling, ring buffer and export formats"
+        counters = IntfCounters( None, size=2,
+                                 intfs=[ FakeIntf( 'lo' ),
+                                         FakeIntf( 'nonexistent0' ) ] )
+        for _ in range( 3 ):
+            counters.sample()
+        self.assertEqual( len( counters.samples ), 2 )
+        rows = list( counters.rows() )
+        self.assertEqual( len( rows ), 4 )
+        # Missing interfaces read as zero
+        self.assertEqual( list( rows[ 1 ][ 3 ] ),
+                          [ 0 ] * len( counters.fields ) )
+        text = counters.prometheus()
+        self.assertIn( 'mininet_intf_rx_bytes_total{node="self",intf="lo"}',
+                       text )
+        data = counters.toDict()
+        self.assertEqual( len( data[ 'samples' ][ 0 ][ 'values' ] ),
+                          2 * len( counters.fields ) )
+
+    def testFiles( self ):
+        "Proc files should stay open, and unreadable nodes be skipped"
+        remote, stopped = FakeIntf( 'lo' ), FakeIntf( 'lo' )
+        remote.node.isRemote = True
+        stopped.node.pid = None
+        counters = IntfCounters( None, intfs=[ FakeIntf( 'lo' ), remote,
+                                               stopped ] )
+        self.assertEqual( len( counters.namespaces ), 1 )
+        counters.sample()
+        f = counters.files.values()[ 0 ]
+        counters.sample()
+        self.assertTrue( counters.files.values()[ 0 ] is f )
+        _t, values = counters.samples[ -1 ]
+        nfields = len( counters.fields )
+        self.assertEqual( list( values[ nfields: ] ), [ 0 ] * 2 * nfields )
+        counters.stop()
+        self.assertTrue( f.closed )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test failure injection timelines."""
+
+import unittest
+import os
+from time import time
+from tempfile import NamedTemporaryFile
+
+from mininet.faults import FaultScheduler, readTrace, setIntfStatus
+from mininet.link import TCIntf
+from mininet.log import setLogLevel
+
+
+class FakeIntf( object ):
+    "Stand-in for an Intf"
+    def __init__( self, name, node ):
+        self.name, self.node, self.link = name, node, None
+
+    def __str__( self ):
+        return self.name
+
+    def ifconfig( self, *args ):
+        "Record ifconfig() calls"
+        self.node.ifconfigs.append( ( self.name, ) + args )
+        return ''
+
+
+class FakeLink( object ):
+    "Stand-in for a Link"
+    def __init__( self, node1, node2 ):
+        self.intf1 = FakeIntf( '%s-eth%d' % ( node1, len( node1.intfs ) ),
+                               node1 )
+        self.intf2 = FakeIntf( '%s-eth%d' % ( node2, len( node2.intfs ) ),
+                               node2 )
+        node1.intfs.append( self.intf1 )
+        node2.intfs.append( self.intf2 )
+        self.intf1.link = self.intf2.link = self
+
+
+class FakeNode( object ):
+    "Stand-in for a Node in this process's namespace"
+    pid = os.getpid()
+
+    def __init__( self, name ):
+        self.name, self.intfs, self.ifconfigs = name, [], []
+
+    def __str__( self ):
+        return self.name
+
+    def connectionsTo( self, node ):
+        "Return ( ours, theirs ) for intfs that connect us to node"
+        return [ ( intf, intf.link.intf2 ) for intf in self.intfs
+                 if intf.link.intf2.node is node ]
+
+
+class FakeNet( dict ):
+    "Stand-in for Mininet: h1 -- s1 -- h2 (-- h3 ... hn)"
+    def __init__( self, n=2 ):
+        hosts = [ 'h%d' % i for i in range( 1, n + 1 ) ]
+        dict.__init__( self, [ ( name, FakeNode( name ) )
+                               for name in hosts + [ 's1' ] ] )
+        self.links = [ FakeLink( self[ h ], self[ 's1' ] ) for h in hosts ]
+
+
+def shapedNet( n=2, **params ):
+    "Return FakeNet whose intfs are TCIntfs configured with params"
+    net = FakeNet( n )
+    for link in net.links:
+        for intf in link.intf1, link.intf2:
+            # We only need the parts of TCIntf that updateCmds() uses
+            tcintf = TCIntf.__new__( TCIntf )
+            tcintf.name, tcintf.node, tcintf.link = intf.name, intf.node, link
+            tcintf.params = dict( params )
+            tcintf.tcParams = dict( TCIntf.configDefaults, **params )
+            intf.node.intfs[ intf.node.intfs.index( intf ) ] = tcintf
+            if intf is link.intf1:
+                link.intf1 = tcintf
+            else:
+                link.intf2 = tcintf
+    return net
+
+
+class testFaults( unittest.TestCase ):
+    "Test FaultScheduler timelines"
+
+    def testCompile( self ):
+        "Events should be compiled into batched slices"
+        faults = FaultScheduler( FakeNet() )
+        faults.flap( 1, 'h1', 's1', duration=.5, count=2, period=1 )
+        faults.nodeDown( 2, 's1' )
+        slices = faults.compile()
+        self.assertEqual( [ t for t, _b, _e in slices ],
+                          [ 1, 1.5, 2, 2.5 ] )
+        # All of our fake intfs are in one namespace, so each slice
+        # should be a single ip batch; at t=2, later events override
+        # earlier ones for the same intf
+        _t, batches, events = slices[ 2 ]
+        self.assertEqual( len( events ), 2 )
+        self.assertEqual( len( batches ), 1 )
+        ( _ns, tool ), ( _pid, cmds ) = batches.items()[ 0 ]
+        self.assertEqual( tool, 'ip' )
+        self.assertEqual( sorted( cmds ),
+                          [ 'link set dev %s down' % intf for intf in
+                            'h1-eth0', 'h2-eth0', 's1-eth0', 's1-eth1' ] )
+
+    def testRemoteStatus( self ):
+        "Remote and pid-less nodes should use ifconfig(), not mnexec"
+        net = FakeNet()
+        net[ 'h1' ].isRemote = True
+        net[ 'h2' ].pid = None
+        intfs = [ intf for link in net.links
+                  for intf in link.intf1, link.intf2
+                  if intf.node is not net[ 's1' ] ]
+        self.assertEqual( setIntfStatus( intfs, 'down' ), [] )
+        self.assertEqual( net[ 'h1' ].ifconfigs, [ ( 'h1-eth0', 'down' ) ] )
+        self.assertEqual( net[ 'h2' ].ifconfigs, [ ( 'h2-eth0', 'down' ) ] )
+
+    def testCompileScaling( self ):
+        "Compiling should take time linear in the number of events"
+        faults = FaultScheduler( FakeNet() )
+        for i in range( 50000 ):
+            faults.add( i * .002, 'down' if i % 2 else 'up', ( 'h1', 's1' ) )
+        start = time()
+        slices = faults.compile()
+        self.assertLess( time() - start, 2 )
+        self.assertEqual( len( slices ), 50000 )
+
+    def testLoad( self ):
+        "Timelines should be read from files"
+        with NamedTemporaryFile( suffix='.txt' ) as f:
+            f.write( '# comment\n'
+                     '1 down h1 s1\n'
+                     '2 netem h2 s1 loss=10 delay=5ms\n'
+                     '3 flap h1 s1 duration=.1 count=2\n'
+                     '4 nodeup s1\n' )
+            f.flush()
+            faults = FaultScheduler( FakeNet() )
+            faults.load( f.name )
+        self.assertEqual( len( faults.events ), 7 )
+        self.assertIn( ( 2, 'netem', ( 'h2', 's1' ),
+                         { 'loss': 10, 'delay': '5ms' } ), faults.events )
+        _t, batches, _e = faults.compile()[ 1 ]
+        ( _ns, tool ), ( _pid, cmds ) = batches.items()[ 0 ]
+        self.assertEqual( tool, 'tc' )
+        self.assertIn( 'qdisc replace dev h2-eth0 root handle 10: netem '
+                       'delay 5ms loss 10.00000', cmds )
+
+    def testTrace( self ):
+        "Traces should be read, merged into slices and applied in place"
+        with NamedTemporaryFile( suffix='.csv' ) as f:
+            f.write( 'time,bw,delay\n'
+                     '0,10,20\n'
+                     '.5,5,20\n'
+                     '1,8,30ms\n' )
+            f.flush()
+            samples = readTrace( f.name )
+            self.assertEqual( samples[ 1 ], ( .5, { 'bw': 5,
+                                                    'delay': '20ms' } ) )
+            net = shapedNet( bw=10, delay='20ms' )
+            faults = FaultScheduler( net )
+            faults.trace( 0, 'h1', 's1', f.name, src='h1', repeat=2 )
+            faults.trace( 0, 'h2', 's1', f.name )
+        self.assertEqual( len( faults.events ), 9 )
+        slices = faults.compile()
+        self.assertEqual( [ t for t, _b, _e in slices ],
+                          [ 0, .5, 1, 1.5, 2, 2.5 ] )
+        # At t=.5, both traces change bw only: three intfs, one batch
+        _t, batches, events = slices[ 1 ]
+        self.assertEqual( len( events ), 2 )
+        ( _ns, tool ), ( _pid, cmds ) = batches.items()[ 0 ]
+        self.assertEqual( tool, 'tc' )
+        self.assertEqual( len( cmds ), 3 )
+        self.assertTrue( all( cmd.startswith( 'class change dev ' )
+                              for cmd in cmds ) )
+        # At t=1, delay changes too
+        _t, batches, _e = slices[ 2 ]
+        cmds = batches.values()[ 0 ][ 1 ]
+        self.assertIn( 'qdisc change dev h1-eth0  parent 5:1  handle 10: '
+                       'netem delay 30ms', cmds )
+        # Only h1's direction is traced after that
+        _t, batches, _e = slices[ 3 ]
+        self.assertEqual( set( cmd.split()[ 3 ] for cmd in
+                               batches.values()[ 0 ][ 1 ] ),
+                          set( [ 'h1-eth0' ] ) )
+        self.assertEqual( faults.shaped[ net[ 'h1' ].intfs[ 0 ] ][ 'bw' ], 8 )
+
+    def testTraceReplay( self ):
+        "Many links replaying a long trace should compile quickly"
+        with NamedTemporaryFile( suffix='.csv' ) as f:
+            f.write( 'time,bw,delay,loss\n' )
+            # 10s of 10ms samples
+            for i in range( 1000 ):
+                f.write( '%.2f,%d,%d,%d\n' % ( i * .01, 5 + i % 7,
+                                               10 + i % 11, i % 3 ) )
+            f.flush()
+            net = shapedNet( n=50, bw=10, delay='20ms', loss=0 )
+            faults = FaultScheduler( net )
+            for i in range( 1, 51 ):
+                faults.trace( 0, 'h%d' % i, 's1', f.name, src='h%d' % i )
+        self.assertEqual( len( faults.events ), 50000 )
+        start = time()
+        slices = faults.compile()
+        self.assertLess( time() - start, 5 )
+        self.assertEqual( len( slices ), 1000 )
+        # Each slice changes every traced intf in one tc batch
+        _t, batches, _events = slices[ 1 ]
+        self.assertEqual( len( batches ), 1 )
+        ( _ns, tool ), ( _pid, cmds ) = batches.items()[ 0 ]
+        self.assertEqual( tool, 'tc' )
+        self.assertEqual( len( set( cmd.split()[ 3 ] for cmd in cmds ) ),
+                          50 )
+        intf = net[ 'h7' ].intfs[ 0 ]
+        self.assertEqual( faults.shaped[ intf ][ 'bw' ], 5 + 999 % 7 )
+        self.assertEqual( faults.shaped[ intf ][ 'delay' ], '%dms' % (
+            10 + 999 % 11 ) )
+
+    def testTraceFields( self ):
+        "Empty CSV fields should be skipped, not shift later columns"
+        with NamedTemporaryFile( suffix='.csv' ) as f:
+            f.write( 'time,bw,delay\n'
+                     '0,10,20\n'
+                     '1,,30\n'
+                     '2, 5 ,\n' )
+            f.flush()
+            self.assertEqual( readTrace( f.name ),
+                              [ ( 0, { 'bw': 10, 'delay': '20ms' } ),
+                                ( 1, { 'delay': '30ms' } ),
+                                ( 2, { 'bw': 5 } ) ] )
+            f.write( '3,1,2,3\n' )
+            f.flush()
+            self.assertRaises( Exception, readTrace, f.name )
+
+    def testTraceShape( self ):
+        "Traces that would need new qdiscs should be rejected"
+        faults = FaultScheduler( shapedNet( bw=10 ) )
+        faults.trace( 0, 'h1', 's1', samples=[ ( 0, { 'loss': 1 } ) ] )
+        self.assertRaises( Exception, faults.compile )
+        faults = FaultScheduler( FakeNet() )
+        faults.shape( 0, 'h1', 's1', bw=1 )
+        self.assertRaises( Exception, faults.compile )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test connect-based readiness probing."""
+
+import unittest
+import socket
+import os
+from threading import Timer
+from time import time
+
+from mininet.util import probeListening, waitListening, isListening
+from mininet.net import Mininet
+from mininet.log import setLogLevel
+
+
+class testListening( unittest.TestCase ):
+    "Test probeListening() and friends in our own namespace"
+
+    def setUp( self ):
+        self.sock = socket.socket()
+        self.sock.bind( ( '127.0.0.1', 0 ) )
+        self.port = self.sock.getsockname()[ 1 ]
+
+    def tearDown( self ):
+        self.sock.close()
+
+    def testNotListening( self ):
+        "A bound but not listening socket should time out quickly"
+        self.assertFalse( isListening( None, '127.0.0.1', self.port ) )
+        start = time()
+        self.assertFalse( waitListening( server='127.0.0.1', port=self.port,
+                                         timeout=.2 ) )
+        self.assertLess( time() - start, 1 )
+
+    def testWait( self ):
+        "Listening should be detected promptly"
+        timer = Timer( .2, self.sock.listen, [ 1 ] )
+        timer.start()
+        start = time()
+        self.assertTrue( waitListening( server='127.0.0.1', port=self.port,
+                                        timeout=5 ) )
+        self.assertLess( time() - start, .4 )
+        timer.join()
+
+    def testMany( self ):
+        "Multiple targets should be probed at once"
+        self.sock.listen( 5 )
+        targets = [ ( None, '127.0.0.1', self.port ) ] * 3
+        targets.append( ( None, '127.0.0.1', 1 ) )
+        self.assertEqual( probeListening( targets, timeout=.2 ),
+                          set( [ 0, 1, 2 ] ) )
+
+
+class FakeController( object ):
+    "Stand-in for a Controller in our namespace that starts listening late"
+    waitListening = True
+    pid = os.getpid()
+
+    def __init__( self, name, delay ):
+        self.name, self.delay = name, delay
+        self.sock = socket.socket()
+        self.sock.bind( ( '127.0.0.1', 0 ) )
+        self.port = self.sock.getsockname()[ 1 ]
+        self.timer = None
+
+    def __str__( self ):
+        return self.name
+
+    def IP( self ):
+        "Return our IP address"
+        return '127.0.0.1'
+
+    def start( self ):
+        "Start listening after delay, or never if delay is None"
+        if self.delay is not None:
+            self.timer = Timer( self.delay, self.sock.listen, [ 1 ] )
+            self.timer.start()
+
+    def stop( self ):
+        "Stop listening"
+        if self.timer:
+            self.timer.join()
+        self.sock.close()
+
+
+class testStartControllers( unittest.TestCase ):
+    "Test that Mininet waits for controllers to listen"
+
+    def testStart( self ):
+        "Controllers should start concurrently, gated on listening"
+        net = Mininet( controller=None, controllerTimeout=2 )
+        net.controllers = [ FakeController( 'c0', .2 ),
+                            FakeController( 'c1', .2 ) ]
+        start = time()
+        self.assertTrue( net.startControllers() )
+        self.assertLess( time() - start, .4 )
+        # A controller that never listens should time out
+        net.controllers.append( FakeController( 'c2', None ) )
+        net.controllerTimeout = .2
+        self.assertFalse( net.startControllers() )
+        for controller in net.controllers:
+            controller.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'critical' )
+    unittest.main()
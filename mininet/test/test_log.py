@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test lazy formatting and buffered log output."""
+
+import unittest
+import logging
+from StringIO import StringIO
+from time import sleep
+
+from mininet.log import ( lg, debug, info, setLogLevel, LazyFormat,
+                          BufferedStreamHandler, OUTPUT )
+
+
+class Counted( object ):
+    "Object that counts how often it is formatted"
+    count = 0
+
+    def __str__( self ):
+        Counted.count += 1
+        return 'counted'
+
+
+class testLog( unittest.TestCase ):
+    "Test mininet.log"
+
+    def testLazy( self ):
+        "Messages should not be formatted unless they are logged"
+        setLogLevel( 'warning' )
+        Counted.count = 0
+        debug( LazyFormat( '%s %s\n', Counted(), Counted() ) )
+        info( 'a', Counted(), '\n' )
+        self.assertEqual( Counted.count, 0 )
+        msg = LazyFormat( '*** %s : %s\n', 'h1', ( 'ls', ) )
+        self.assertEqual( str( msg ), "*** h1 : ('ls',)\n" )
+
+    def testBuffered( self ):
+        "Info output should be buffered, and output level written in order"
+        stream = StringIO()
+        handler = BufferedStreamHandler( stream, interval=.05 )
+        logger = logging.Logger( 'test' )
+        logger.addHandler( handler )
+        logger.info( 'h1 ' )
+        logger.info( 'h2 ' )
+        self.assertEqual( stream.getvalue(), '' )
+        logger.log( OUTPUT, 'done\n' )
+        self.assertEqual( stream.getvalue(), 'h1 h2 done\n' )
+        # Buffered output is written in the background
+        logger.info( 'h3 ' )
+        sleep( .2 )
+        self.assertEqual( stream.getvalue(), 'h1 h2 done\nh3 ' )
+        # With nothing to write, the writer waits rather than polling
+        self.assertFalse( handler.pending.is_set() )
+        handler.close()
+        handler.writer.join( 1 )
+        self.assertFalse( handler.writer.is_alive() )
+
+    def testSetBuffered( self ):
+        "setBuffered() should replace our handler, keeping its level"
+        setLogLevel( 'info' )
+        lg.setBuffered()
+        self.assertTrue( isinstance( lg.handlers[ 0 ],
+                                     BufferedStreamHandler ) )
+        self.assertEqual( lg.handlers[ 0 ].level, logging.INFO )
+        info( '' )
+        old = lg.handlers[ 0 ]
+        lg.setBuffered( False )
+        self.assertFalse( isinstance( lg.handlers[ 0 ],
+                                      BufferedStreamHandler ) )
+        # The old handler should have been flushed and stopped
+        self.assertEqual( old.buffer, [] )
+        old.writer.join( 1 )
+        self.assertFalse( old.writer.is_alive() )
+        # Turning buffering off again keeps the current handler
+        handler = lg.handlers[ 0 ]
+        lg.setBuffered( False )
+        self.assertTrue( lg.handlers[ 0 ] is handler )
+        setLogLevel( 'warning' )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -8,7 +8,7 @@
 from functools import partial
 
 from mininet.net import Mininet
-from mininet.node import Host, Controller
+from mininet.node import Host, LightweightHost, Controller
 from mininet.node import UserSwitch, OVSSwitch, IVSSwitch
 from mininet.topo import SingleSwitchTopo, LinearTopo
 from mininet.log import setLogLevel
@@ -103,6 +103,36 @@ class testLinearUserspace( testLinearCommon, unittest.TestCase ):
     switchClass = UserSwitch
 
 
+class testLightweightHost( unittest.TestCase ):
+    "Test ping and commands with shell-less hosts."
+
+    @staticmethod
+    def tearDown():
+        "Clean up if necessary"
+        if sys.exc_info != ( None, None, None ):
+            cleanup()
+
+    def testSingle5( self ):
+        "Ping test on 5-host single-switch topology"
+        mn = Mininet( SingleSwitchTopo( k=5 ), OVSSwitch, LightweightHost,
+                      Controller, waitConnected=True )
+        dropped = mn.run( mn.ping )
+        self.assertEqual( dropped, 0 )
+
+    def testCmd( self ):
+        "Verify command output and backgrounded commands"
+        mn = Mininet( SingleSwitchTopo( k=1 ), OVSSwitch, LightweightHost,
+                      Controller )
+        mn.start()
+        h1 = mn.hosts[ 0 ]
+        self.assertEqual( h1.cmd( 'echo hello' ), 'hello\n' )
+        self.assertIn( h1.IP(), h1.cmd( 'ip addr show', h1.defaultIntf() ) )
+        h1.cmd( 'sleep 30 &' )
+        self.assertTrue( h1.lastPid )
+        self.assertTrue( h1.cmd( 'kill %d && echo killed' % h1.lastPid ) )
+        mn.stop()
+
+
 if __name__ == '__main__':
     setLogLevel( 'warning' )
     unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test command launching with posix_spawn and errRun() output."""
+
+import unittest
+import os
+import errno
+from subprocess import PIPE, STDOUT
+
+from mininet.util import SpawnPopen, errRun
+from mininet.log import setLogLevel
+
+
+class testSpawn( unittest.TestCase ):
+    "Test SpawnPopen() and errRun()"
+
+    def testOutput( self ):
+        "Verify output, input and exit status"
+        popen = SpawnPopen( 'echo out; echo err >&2; exit 3', shell=True,
+                            stdout=PIPE, stderr=STDOUT )
+        self.assertEqual( popen.communicate()[ 0 ], 'out\nerr\n' )
+        self.assertEqual( popen.returncode, 3 )
+        popen = SpawnPopen( [ 'cat' ], stdin=PIPE, stdout=PIPE )
+        self.assertEqual( popen.communicate( 'abc' )[ 0 ], 'abc' )
+
+    def testMissing( self ):
+        "A missing executable should raise OSError, like Popen()"
+        with self.assertRaises( OSError ) as cm:
+            SpawnPopen( [ 'mininet-nonexistent-command' ] )
+        self.assertEqual( cm.exception.errno, errno.ENOENT )
+
+    def testOptions( self ):
+        "Verify setpgrp, close_fds and the Popen() fallback"
+        popen = SpawnPopen( [ 'sh', '-c', 'ps -o pgid= $$' ], stdout=PIPE,
+                            preexec_fn=os.setpgrp )
+        self.assertEqual( popen.communicate()[ 0 ].strip(),
+                          str( popen.pid ) )
+        os.dup2( 0, 100 )
+        try:
+            popen = SpawnPopen( [ 'ls', '/proc/self/fd' ], stdout=PIPE,
+                                close_fds=True )
+            self.assertNotIn( '100', popen.communicate()[ 0 ].split() )
+        finally:
+            os.close( 100 )
+        # cwd isn't supported by posix_spawn, so this uses Popen()
+        popen = SpawnPopen( [ 'pwd' ], stdout=PIPE, cwd='/' )
+        self.assertEqual( popen.communicate()[ 0 ], '/\n' )
+
+    def testErrRun( self ):
+        "Verify that errRun() collects large output and leaks no fds"
+        fds = len( os.listdir( '/proc/self/fd' ) )
+        out, err, exitcode = errRun(
+            'head -c 1000000 /dev/zero; echo err >&2; exit 2', shell=True )
+        self.assertEqual( len( out ), 1000000 )
+        self.assertEqual( ( err, exitcode ), ( 'err\n', 2 ) )
+        for _ in range( 10 ):
+            errRun( 'true' )
+        self.assertEqual( len( os.listdir( '/proc/self/fd' ) ), fds )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test in-place TCIntf updates and configuration (no network is
+   needed, since we only check the generated commands)"""
+
+import unittest
+import os
+
+from mininet.link import TCIntf
+from mininet.log import setLogLevel
+
+
+def params( **kwargs ):
+    "Return config() parameters: defaults updated with kwargs"
+    result = dict( TCIntf.configDefaults )
+    result.update( kwargs )
+    return result
+
+
+class testTCUpdate( unittest.TestCase ):
+    "Test TCIntf.updateCmds()"
+
+    # We don't need a node or an interface for updateCmds()
+    intf = TCIntf.__new__( TCIntf )
+
+    def testBandwidth( self ):
+        "Changing bw should only change class 5:1"
+        cmds = self.intf.updateCmds( params( bw=10 ), params( bw=20 ) )
+        self.assertEqual( len( cmds ), 1 )
+        self.assertIn( 'class change', cmds[ 0 ] )
+        self.assertIn( 'classid 5:1', cmds[ 0 ] )
+        self.assertIn( 'rate 20', cmds[ 0 ] )
+
+    def testNetem( self ):
+        "Changing delay or loss should only change the netem qdisc"
+        old = params( bw=10, delay='1ms' )
+        cmds = self.intf.updateCmds( old, params( bw=10, delay='5ms',
+                                                  loss=1 ) )
+        self.assertEqual( len( cmds ), 1 )
+        self.assertIn( 'qdisc change', cmds[ 0 ] )
+        self.assertIn( 'parent 5:1', cmds[ 0 ] )
+        self.assertIn( 'netem delay 5ms', cmds[ 0 ] )
+        # Without bw, netem is the root qdisc
+        cmds = self.intf.updateCmds( params( loss=1 ), params( loss=2 ) )
+        self.assertIn( 'root', cmds[ 0 ] )
+
+    def testTbf( self ):
+        "tbf root qdiscs can be changed in place"
+        cmds = self.intf.updateCmds( params( bw=10, use_tbf=True ),
+                                     params( bw=20, use_tbf=True ) )
+        self.assertEqual( len( cmds ), 1 )
+        self.assertIn( 'qdisc change', cmds[ 0 ] )
+        self.assertIn( 'tbf', cmds[ 0 ] )
+
+    def testRebuild( self ):
+        "Adding or removing qdiscs should require a rebuild"
+        self.assertEqual( self.intf.updateCmds( params( bw=10 ),
+                                                params( bw=10, loss=1 ) ),
+                          None )
+        self.assertEqual( self.intf.updateCmds( params( bw=10 ),
+                                                params() ), None )
+        self.assertEqual( self.intf.updateCmds(
+            params( bw=10 ), params( bw=10, use_hfsc=True ) ), None )
+
+    def testNoChange( self ):
+        "Unchanged or offload-only parameters need no tc commands"
+        self.assertEqual( self.intf.updateCmds( params( bw=10 ),
+                                                params( bw=10 ) ), [] )
+        self.assertEqual( self.intf.updateCmds(
+            params( bw=10 ), params( bw=10, gro=True ) ), [] )
+
+
+ETHTOOL = """Features for h1-eth0:
+rx-checksumming: on
+tx-checksumming: on
+generic-receive-offload: off
+"""
+
+
+QDISCS = """qdisc noqueue 0: dev lo root refcnt 2
+qdisc htb 5: dev h1-eth0 root refcnt 2 r2q 10 default 0x1
+qdisc noqueue 0: dev h1-eth1 root refcnt 2
+qdisc netem 10: dev h1-eth2 root refcnt 2 limit 1000 loss 1%
+"""
+
+
+class FakeNode( object ):
+    "Stand-in for a Node in this process's namespace that records commands"
+    pid = os.getpid()
+
+    def __init__( self ):
+        self.cmds = []
+
+    def cmd( self, *args, **_kwargs ):
+        "Record command"
+        cmd = ' '.join( str( arg ) for arg in args )
+        self.cmds.append( cmd )
+        return ( ETHTOOL if cmd.startswith( 'ethtool -k' ) else
+                 QDISCS if cmd == 'tc qdisc show' else '' )
+
+    def addIntf( self, *args, **kwargs ):
+        "Ignore interface"
+        pass
+
+
+class testTCConfig( unittest.TestCase ):
+    "Test TCIntf.config() probes"
+
+    def setUp( self ):
+        TCIntf.vethOffloads = None
+
+    def testFresh( self ):
+        "New veths should only be probed once, and only with ethtool -k"
+        node = FakeNode()
+        TCIntf( 'h1-eth0', node=node, fresh=True, bw=10 )
+        TCIntf( 'h1-eth1', node=node, fresh=True, bw=10 )
+        cmds = [ cmd.split()[ 0:2 ] for cmd in node.cmds ]
+        self.assertEqual( cmds.count( [ 'ethtool', '-k' ] ), 1 )
+        self.assertNotIn( [ 'ethtool', '-K' ], cmds )
+        self.assertNotIn( 'show', ' '.join( node.cmds ) )
+        self.assertEqual( TCIntf.vethOffloads, ( False, True, True ) )
+        # Non-default offload settings still need ethtool
+        TCIntf( 'h1-eth2', node=node, fresh=True, txo=False )
+        self.assertIn( 'ethtool -K h1-eth2 gro off tx off rx on',
+                       node.cmds )
+
+    def testReconfig( self ):
+        "Existing interfaces should be probed as before"
+        node = FakeNode()
+        intf = TCIntf( 'h1-eth0', node=node, bw=10 )
+        self.assertIn( 'ethtool -K h1-eth0 gro off tx on rx on',
+                       node.cmds )
+        self.assertIn( 'tc qdisc show dev h1-eth0', node.cmds )
+        node.cmds = []
+        intf.config( **intf.params )
+        self.assertIn( 'tc qdisc show dev h1-eth0', node.cmds )
+        # We know we set the offloads already
+        self.assertNotIn( 'ethtool', ' '.join( node.cmds ) )
+
+    def testReapply( self ):
+        "Only intfs whose root qdisc has been replaced should be redone"
+        node = FakeNode()
+        intfs = [ TCIntf( 'h1-eth0', node=node, fresh=True, bw=10 ),
+                  TCIntf( 'h1-eth1', node=node, fresh=True, bw=10 ),
+                  TCIntf( 'h1-eth2', node=node, fresh=True, loss=1 ),
+                  TCIntf( 'h1-eth3', node=node, fresh=True ) ]
+        node.cmds = []
+        self.assertEqual( TCIntf.reapply( intfs ), [ intfs[ 1 ] ] )
+        self.assertEqual( node.cmds.count( 'tc qdisc show' ), 1 )
+
+    def testReapplyRemote( self ):
+        "Remote nodes should not be grouped with local namespaces"
+        local, remote = FakeNode(), FakeNode()
+        remote.isRemote, remote.server = True, 'server2'
+        intfs = [ TCIntf( 'h1-eth0', node=local, fresh=True, bw=10 ),
+                  TCIntf( 'h1-eth1', node=remote, fresh=True, bw=10 ) ]
+        local.cmds, remote.cmds = [], []
+        self.assertEqual( TCIntf.reapply( intfs ), [ intfs[ 1 ] ] )
+        self.assertEqual( local.cmds, [ 'tc qdisc show' ] )
+        self.assertEqual( remote.cmds.count( 'tc qdisc show' ), 1 )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test topology diffs and incremental reconfiguration."""
+
+import unittest
+
+from mininet.topo import Topo, LinearTopo
+from mininet.net import Mininet
+from mininet.link import TCLink
+from mininet.clean import cleanup
+from mininet.log import setLogLevel
+
+
+class PairTopo( Topo ):
+    "Hosts h1..hn, each linked to h1, with optional link options"
+
+    def build( self, n=2, **opts ):
+        self.addHost( 'h1' )
+        for i in range( 2, n + 1 ):
+            self.addLink( self.addHost( 'h%d' % i ), 'h1', **opts )
+
+
+class testTopoDiff( unittest.TestCase ):
+    "Test Topo.diff()"
+
+    def testSame( self ):
+        "Identical topologies should have no differences"
+        changes = LinearTopo( k=3 ).diff( LinearTopo( k=3 ) )
+        self.assertFalse( any( changes.values() ) )
+
+    def testGrow( self ):
+        "Growing a linear topology should only add nodes and links"
+        changes = LinearTopo( k=2 ).diff( LinearTopo( k=3 ) )
+        self.assertEqual( changes[ 'addNodes' ], [ 'h3', 's3' ] )
+        self.assertEqual( changes[ 'delNodes' ], [] )
+        self.assertEqual( sorted( changes[ 'addLinks' ] ),
+                          [ ( 'h3', 's3', 1 ), ( 's3', 's2', 1 ) ] )
+        self.assertEqual( changes[ 'delLinks' ], [] )
+
+    def testChanges( self ):
+        "Changed link options and nodes should be detected"
+        old = PairTopo( n=3, bw=10 )
+        new = PairTopo( n=3, bw=20 )
+        changes = old.diff( new )
+        self.assertEqual( len( changes[ 'changedLinks' ] ), 2 )
+        self.assertFalse( changes[ 'addLinks' ] or changes[ 'delLinks' ] )
+        new.nodeInfo( 'h3' )[ 'ip' ] = '10.0.0.33/8'
+        changes = old.diff( new )
+        self.assertEqual( changes[ 'delNodes' ], [ 'h3' ] )
+        self.assertEqual( changes[ 'addNodes' ], [ 'h3' ] )
+        self.assertEqual( changes[ 'delLinks' ], [ ( 'h3', 'h1', 1 ) ] )
+        self.assertEqual( changes[ 'addLinks' ], [ ( 'h3', 'h1', 1 ) ] )
+        self.assertEqual( len( changes[ 'changedLinks' ] ), 1 )
+
+
+class testApply( unittest.TestCase ):
+    "Test Mininet.apply()"
+
+    def tearDown( self ):
+        cleanup()
+
+    def testApply( self ):
+        "Apply a series of topology changes to a running network"
+        net = Mininet( topo=PairTopo( n=3, bw=10 ), link=TCLink,
+                       controller=None )
+        net.start()
+        h2 = net[ 'h2' ]
+        # Changing bw should reconfigure links in place
+        net.apply( PairTopo( n=3, bw=20 ) )
+        self.assertIs( net[ 'h2' ], h2 )
+        self.assertEqual( h2.intf().params[ 'bw' ], 20 )
+        self.assertIn( 'rate 20Mbit', h2.cmd( 'tc class show dev h2-eth0' ) )
+        # Growing and shrinking should add and remove hosts and links
+        net.apply( PairTopo( n=4, bw=20 ) )
+        self.assertEqual( len( net.hosts ), 4 )
+        self.assertEqual( len( net.links ), 3 )
+        self.assertEqual( net[ 'h4' ].intfNames(), [ 'h4-eth0' ] )
+        net.apply( PairTopo( n=2, bw=20 ) )
+        self.assertEqual( [ h.name for h in net.hosts ], [ 'h1', 'h2' ] )
+        self.assertEqual( len( net.links ), 1 )
+        self.assertEqual( net[ 'h1' ].intfNames(), [ 'h1-eth0' ] )
+        net.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
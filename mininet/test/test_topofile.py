@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test topology serialization and build plans."""
+
+import unittest
+import os
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from mininet.topo import Topo, LinearTopo
+from mininet.topolib import TreeTopo
+from mininet.node import UserSwitch
+from mininet.log import setLogLevel
+
+
+class testTopoFile( unittest.TestCase ):
+    "Test saving and loading topologies"
+
+    def setUp( self ):
+        self.tmpdir = mkdtemp()
+
+    def tearDown( self ):
+        rmtree( self.tmpdir )
+
+    def roundTrip( self, topo, filename ):
+        "Save and reload topo, and check that it's unchanged"
+        path = os.path.join( self.tmpdir, filename )
+        topo.save( path )
+        loaded = Topo.load( path )
+        self.assertEqual( loaded.hosts(), topo.hosts() )
+        self.assertEqual( loaded.switches(), topo.switches() )
+        self.assertEqual( loaded.links( sort=True, withKeys=True,
+                                        withInfo=True ),
+                          topo.links( sort=True, withKeys=True,
+                                      withInfo=True ) )
+        self.assertEqual( loaded.ports, topo.ports )
+        self.assertEqual( loaded.buildPlan, topo.buildPlan )
+        return loaded
+
+    def testJSON( self ):
+        "Verify JSON round trip, including options and classes"
+        topo = LinearTopo( k=3, n=2 )
+        topo.addSwitch( 's9', cls=UserSwitch, dpid='99' )
+        topo.addLink( 's9', 's1', bw=10, delay='1ms' )
+        loaded = self.roundTrip( topo, 'topo.json' )
+        self.assertEqual( loaded.nodeInfo( 's9' )[ 'cls' ], UserSwitch )
+
+    def testCustomClass( self ):
+        "Classes that can't be imported on load should be rejected on save"
+        custom = {}
+        # As mn --custom reads custom files
+        exec 'class CustomSwitch( object ): pass' in custom, custom
+        local = type( 'LocalSwitch', ( object, ),
+                      { '__module__': '__main__' } )
+        for cls in custom[ 'CustomSwitch' ], local:
+            topo = Topo()
+            topo.addSwitch( 's1', cls=cls )
+            path = os.path.join( self.tmpdir, 'topo.json' )
+            self.assertRaises( Exception, topo.save, path )
+
+    def testBinary( self ):
+        "Verify binary round trip with a build plan"
+        topo = TreeTopo( depth=3, fanout=3 )
+        topo.makePlan()
+        self.roundTrip( topo, 'topo.mnt' )
+
+    def testBinaryVersion( self ):
+        "Binary files from other Python versions should be rejected"
+        path = os.path.join( self.tmpdir, 'topo.mnt' )
+        LinearTopo( k=2 ).save( path )
+        with open( path, 'rb' ) as f:
+            contents = f.read()
+        header = Topo.header()
+        self.assertTrue( contents.startswith( header ) )
+        with open( path, 'wb' ) as f:
+            f.write( 'MNTOPO 2 3.99 4\n' + contents[ len( header ): ] )
+        self.assertRaises( Exception, Topo.load, path )
+
+    def testPlan( self ):
+        "Verify that plans match Mininet's defaults"
+        topo = LinearTopo( k=2 )
+        plan = topo.makePlan( ipBase='192.168.0.0/24', autoSetMacs=True )
+        self.assertEqual( plan[ 'nodes' ][ 'h2' ],
+                          { 'ip': '192.168.0.2/24',
+                            'mac': '00:00:00:00:00:02' } )
+        self.assertEqual( plan[ 'nodes' ][ 's2' ],
+                          { 'dpid': '2' } )
+        names = [ ( p[ 'intfName1' ], p[ 'intfName2' ] )
+                  for _n1, _n2, _k, p in plan[ 'links' ] ]
+        self.assertEqual( names, [ ( 'h1-eth0', 's1-eth1' ),
+                                   ( 'h2-eth0', 's2-eth1' ),
+                                   ( 's2-eth2', 's1-eth2' ) ] )
+        macs = [ p[ addr ] for _n1, _n2, _k, p in plan[ 'links' ]
+                 for addr in 'addr1', 'addr2' ]
+        self.assertEqual( len( set( macs ) ), len( macs ) )
+        # Different parameters should produce a new plan
+        self.assertEqual( topo.getPlan()[ 'nodes' ][ 'h1' ][ 'ip' ],
+                         '10.0.0.1/8' )
+
+    def testStalePlan( self ):
+        "Changing the topology should invalidate its plan"
+        topo = LinearTopo( k=2 )
+        topo.makePlan()
+        topo.addHost( 'h3' )
+        topo.addLink( 'h3', 's1' )
+        self.assertEqual( topo.getPlan(), None )
+        # Direct graph changes should be noticed by getPlan()
+        plan = topo.makePlan()
+        del topo.g.edge[ 'h3' ][ 's1' ]
+        del topo.g.edge[ 's1' ][ 'h3' ]
+        self.assertFalse( topo.planFits( plan ) )
+        links = [ ( n1, n2 ) for n1, n2, _k, _p in
+                  topo.getPlan()[ 'links' ] ]
+        self.assertEqual( len( links ), 3 )
+        self.assertNotIn( ( 'h3', 's1' ), links )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
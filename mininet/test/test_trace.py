@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test command tracing and Chrome trace export."""
+
+import unittest
+
+from mininet.perf import CmdTracer, tracer
+from mininet.util import errRun
+from mininet.node import LightweightHost
+from mininet.log import setLogLevel
+
+
+class testTrace( unittest.TestCase ):
+    "Test CmdTracer"
+
+    def testRing( self ):
+        "Only the most recent commands should be kept"
+        t = CmdTracer( size=3 )
+        t.enable()
+        for i in range( 5 ):
+            t.add( 'cmd', 'h1', 'sleep %d' % i, t.start + i, t.start + 2 * i )
+        self.assertEqual( [ span[ 2 ] for span in t.spans ],
+                          [ 'sleep 2', 'sleep 3', 'sleep 4' ] )
+        self.assertEqual( t.slowest( 1 )[ 0 ][ 2 ], 'sleep 4' )
+
+    def testChrome( self ):
+        "Commands should be exported as complete events, one track per node"
+        t = CmdTracer()
+        t.enable()
+        t.add( 'cmd', 'h1', 'ping -c1 10.0.0.2', t.start + 1, t.start + 1.5,
+               size=100, status=0 )
+        t.add( 'cmd', 'h2', 'ifconfig', t.start + 1, t.start + 1.25 )
+        t.add( 'errRun', None, [ 'ip', 'link' ], t.start, t.start + .5 )
+        events = t.toChrome()[ 'traceEvents' ]
+        spans = [ e for e in events if e[ 'ph' ] == 'X' ]
+        names = dict( ( e[ 'tid' ], e[ 'args' ][ 'name' ] ) for e in events
+                      if e[ 'name' ] == 'thread_name' )
+        self.assertEqual( sorted( names.values() ), [ 'h1', 'h2', 'root' ] )
+        self.assertEqual( spans[ 0 ][ 'name' ], 'ping' )
+        self.assertEqual( spans[ 0 ][ 'ts' ], 1e6 )
+        self.assertEqual( spans[ 0 ][ 'dur' ], 5e5 )
+        self.assertEqual( spans[ 0 ][ 'args' ][ 'bytes' ], 100 )
+        self.assertEqual( names[ spans[ 2 ][ 'tid' ] ], 'root' )
+        self.assertEqual( spans[ 2 ][ 'args' ][ 'cmd' ], 'ip link' )
+
+    def testErrRun( self ):
+        "errRun() should be traced when tracing is enabled"
+        errRun( 'true' )
+        tracer.enable()
+        try:
+            errRun( 'sh -c exit\\ 3', shell=True )
+        finally:
+            tracer.enable( False )
+        self.assertEqual( len( tracer.spans ), 1 )
+        kind, node, _cmd, _start, _end, _size, status = tracer.spans[ 0 ]
+        self.assertEqual( ( kind, node, status ), ( 'errRun', None, 3 ) )
+
+    def testPexec( self ):
+        "pexec() should be traced once, with its exit status"
+        h1 = LightweightHost( 'h1' )
+        tracer.enable()
+        try:
+            h1.pexec( 'sh', '-c', 'exit 3' )
+            h1.popen( 'true' ).wait()
+        finally:
+            tracer.enable( False )
+            h1.terminate()
+        spans = [ ( span[ 0 ], span[ 6 ] ) for span in tracer.spans ]
+        self.assertEqual( spans, [ ( 'pexec', 3 ), ( 'popen', None ) ] )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
@@ -9,8 +9,33 @@
 
 A Topo object can be a topology database for NOX, can represent a physical
 setup for testing, and can even be emulated with the Mininet package.
+
+Topologies can be saved to and loaded from files, so that expensive
+topologies need only be generated once:
+
+    topo.makePlan()
+    topo.save( 'big.mnt' )
+    ...
+    topo = Topo.load( 'big.mnt' )
+
+Files ending in .json are saved as (human-readable) JSON; anything
+else is saved in a compact binary format (compressed marshal data).
+marshal data is specific to the Python version, so binary files start
+with a header recording the format, Python and marshal versions, and
+load() rejects files written by anything else; use JSON to share
+topologies between Python versions.
+A saved topology includes its build plan (if any), which contains the
+IP and MAC addresses, DPIDs and interface names that Mininet would
+otherwise compute for each node and link while building the network.
 """
 
+from importlib import import_module
+import json
+import marshal
+import sys
+import zlib
+
+from mininet.addressing import AddressPlanner
 from mininet.util import irange, natural, naturalSeq
 
 class MultiGraph( object ):
@@ -112,6 +137,8 @@ def __init__( self, *args, **params ):
         self.lopts = params.pop( 'lopts', {} )
         # ports[src][dst][sport] is port on dst that connects to src
         self.ports = {}
+        # Precomputed addresses and names (see makePlan())
+        self.buildPlan = None
         self.build( *args, **params )
 
     def build( self, *args, **params ):
@@ -124,6 +151,7 @@ def addNode( self, name, **opts ):
            opts: node options
            returns: node name"""
         self.g.add_node( name, **opts )
+        self.buildPlan = None
         return name
 
     def addHost( self, name, **opts ):
@@ -157,6 +185,7 @@ def addLink( self, node1, node2, port1=None, port2=None,
         opts = dict( opts )
         opts.update( node1=node1, node2=node2, port1=port1, port2=port2 )
         self.g.add_edge(node1, node2, key, opts )
+        self.buildPlan = None
         return key
 
     def nodes( self, sort=True ):
@@ -266,6 +295,7 @@ def setlinkInfo( self, src, dst, info, key=None ):
         "Set link metadata dict"
         entry, key = self._linkEntry( src, dst, key )
         entry[ key ] = info
+        self.buildPlan = None
 
     def nodeInfo( self, name ):
         "Return metadata (dict) for node"
@@ -274,6 +304,7 @@ def nodeInfo( self, name ):
     def setNodeInfo( self, name, info ):
         "Set metadata (dict) for node"
         self.g.node[ name ] = info
+        self.buildPlan = None
 
     def convertTo( self, cls, data=True, keys=True ):
         """Convert to a new object of networkx.MultiGraph-like class cls
@@ -281,11 +312,222 @@ def convertTo( self, cls, data=True, keys=True ):
            keys: include edge keys as well as edge data (default True)"""
         return self.g.convertTo( cls, data=data, keys=keys )
 
+    # Topology comparison
+
+    @staticmethod
+    def linkId( info ):
+        "Return key identifying a link by its endpoints and ports"
+        return tuple( sorted( [ ( info[ 'node1' ], info[ 'port1' ] ),
+                                ( info[ 'node2' ], info[ 'port2' ] ) ] ) )
+
+    @staticmethod
+    def linkOpts( info ):
+        "Return link options, without endpoints and ports"
+        return { k: v for k, v in info.iteritems()
+                 if k not in ( 'node1', 'node2', 'port1', 'port2' ) }
+
+    def diff( self, new ):
+        """Compare this topology with a new one
+           new: new Topo
+           returns: dict of changes:
+             delNodes: nodes to remove (removed or changed)
+             addNodes: nodes to add (added or changed)
+             delLinks: ( node1, node2, key ) for links to remove
+             addLinks: ( node1, node2, key ) in new for links to add
+             changedLinks: ( old link, new link ) for links whose
+               options (but not endpoints or ports) changed
+           Links of changed nodes are removed and added again."""
+        oldNodes, newNodes = self.g.node, new.g.node
+        changed = set( name for name, info in oldNodes.iteritems()
+                       if name in newNodes and newNodes[ name ] != info )
+        delNodes = [ name for name in self.nodes()
+                     if name not in newNodes or name in changed ]
+        addNodes = [ name for name in new.nodes()
+                     if name not in oldNodes or name in changed ]
+        oldLinks = self.links( sort=True, withKeys=True, withInfo=True )
+        newLinks = new.links( sort=True, withKeys=True, withInfo=True )
+        newById = { self.linkId( info ): ( n1, n2, key, info )
+                    for n1, n2, key, info in newLinks }
+        oldIds = set()
+        delLinks, changedLinks = [], []
+        for n1, n2, key, info in oldLinks:
+            lid = self.linkId( info )
+            oldIds.add( lid )
+            newLink = newById.get( lid )
+            if not newLink or n1 in changed or n2 in changed:
+                delLinks.append( ( n1, n2, key ) )
+            elif self.linkOpts( newLink[ 3 ] ) != self.linkOpts( info ):
+                changedLinks.append( ( ( n1, n2, key ), newLink[ :3 ] ) )
+        addLinks = [ ( n1, n2, key ) for n1, n2, key, info in newLinks
+                     if self.linkId( info ) not in oldIds or
+                     n1 in changed or n2 in changed ]
+        return { 'delNodes': delNodes, 'addNodes': addNodes,
+                 'delLinks': delLinks, 'addLinks': addLinks,
+                 'changedLinks': changedLinks }
+
     @staticmethod
     def sorted( items ):
         "Items sorted in natural (i.e. alphabetical) order"
         return sorted( items, key=natural )
 
+    # Build plans
+
+    def makePlan( self, ipBase='10.0.0.0/8', autoSetMacs=False,
+                  subnetLen=None ):
+        """Precompute the addresses and names that Mininet.buildFromTopo()
+           would assign, so that they can be saved with the topology
+           ipBase: base IP address for hosts
+           autoSetMacs: set host MACs from their IP addresses
+           subnetLen: give each switch's hosts a block of this size
+           returns: build plan: { ipBase, autoSetMacs, subnetLen,
+             subnets: { switch: block }, nodes: { name: params },
+             links: [ ( node1, node2, key, params ) ] in build order }"""
+        planner = AddressPlanner( ipBase=ipBase, subnetLen=subnetLen )
+        self.buildPlan = planner.plan( self, autoSetMacs=autoSetMacs )
+        return self.buildPlan
+
+    def getPlan( self, ipBase='10.0.0.0/8', autoSetMacs=False ):
+        """Return build plan for the given parameters, or None if we
+           haven't been planned; a plan made with different parameters,
+           or for different nodes or links (e.g. if the graph was
+           changed directly), is recomputed
+           ipBase: base IP address for hosts
+           autoSetMacs: set host MACs from their IP addresses"""
+        plan = self.buildPlan
+        if not plan:
+            return None
+        if ( ( plan[ 'ipBase' ], plan[ 'autoSetMacs' ] ) !=
+             ( ipBase, autoSetMacs ) or not self.planFits( plan ) ):
+            plan = self.makePlan( ipBase=ipBase, autoSetMacs=autoSetMacs,
+                                  subnetLen=plan.get( 'subnetLen' ) )
+        return plan
+
+    def planFits( self, plan ):
+        "Does plan have the same nodes and links as our graph?"
+        return ( set( plan[ 'nodes' ] ) == set( self.nodes( sort=False ) )
+                 and set( ( n1, n2, key ) for n1, n2, key, _params
+                          in plan[ 'links' ] ) ==
+                 set( self.links( withKeys=True ) ) )
+
+    # Serialization
+
+    @staticmethod
+    def encodeValue( value ):
+        "Encode a node or link option; classes are stored by name"
+        if isinstance( value, type ):
+            # Classes from scripts or mn --custom files (__main__ or
+            # __builtin__) can't be imported when we load the topology
+            module, name = value.__module__, value.__name__
+            try:
+                importable = getattr( import_module( module ), name,
+                                      None ) is value
+            except ImportError:
+                importable = False
+            if not importable or module in ( '__main__', '__builtin__' ):
+                raise Exception( 'Topo: cannot save class %s from %s, '
+                                 'since it could not be imported when '
+                                 'loading; move it into a module on '
+                                 'PYTHONPATH' % ( name, module ) )
+            return { '__class__': '%s.%s' % ( module, name ) }
+        if isinstance( value, dict ):
+            return { k: Topo.encodeValue( v ) for k, v in value.iteritems() }
+        if isinstance( value, ( list, tuple ) ):
+            return [ Topo.encodeValue( v ) for v in value ]
+        if value is None or isinstance( value, ( basestring, int, long,
+                                                 float, bool ) ):
+            return value
+        raise Exception( 'Topo: cannot serialize option value %r' % value )
+
+    @staticmethod
+    def decodeValue( value ):
+        "Decode a node or link option encoded by encodeValue()"
+        if isinstance( value, dict ):
+            if len( value ) == 1 and '__class__' in value:
+                module, _, name = value[ '__class__' ].rpartition( '.' )
+                return getattr( import_module( module ), name )
+            return { str( k ): Topo.decodeValue( v )
+                     for k, v in value.iteritems() }
+        if isinstance( value, list ):
+            return [ Topo.decodeValue( v ) for v in value ]
+        if isinstance( value, unicode ):
+            return str( value )
+        return value
+
+    def toDict( self ):
+        "Return topology (and build plan, if any) as a serializable dict"
+        return {
+            'version': 1,
+            'nodes': [ ( name, self.encodeValue( self.nodeInfo( name ) ) )
+                       for name in self.nodes() ],
+            'links': [ ( key, self.encodeValue( info ) )
+                       for _n1, _n2, key, info in self.links(
+                           sort=True, withKeys=True, withInfo=True ) ],
+            'plan': self.encodeValue( self.buildPlan ) }
+
+    @classmethod
+    def fromDict( cls, data ):
+        """Create topology from a dict returned by toDict()
+           returns: Topo (build() is not called)"""
+        if data.get( 'version' ) != 1:
+            raise Exception( 'Topo: unknown topology format version %s' %
+                             data.get( 'version' ) )
+        topo = Topo()
+        for name, info in data[ 'nodes' ]:
+            topo.g.add_node( str( name ), cls.decodeValue( info ) )
+        for key, info in data[ 'links' ]:
+            info = cls.decodeValue( info )
+            node1, node2 = info[ 'node1' ], info[ 'node2' ]
+            topo.addPort( node1, node2, info[ 'port1' ], info[ 'port2' ] )
+            topo.g.add_edge( node1, node2, key, info )
+        if data.get( 'plan' ):
+            plan = cls.decodeValue( data[ 'plan' ] )
+            plan[ 'links' ] = [ tuple( link ) for link in plan[ 'links' ] ]
+            topo.buildPlan = plan
+        return topo
+
+    # Binary files start with a header line: magic, format version,
+    # Python version and marshal version
+    magic = 'MNTOPO'
+    formatVersion = 2
+
+    @classmethod
+    def header( cls ):
+        "Return the header line for binary files that we write"
+        return '%s %d %d.%d %d\n' % ( cls.magic, cls.formatVersion,
+                                      sys.version_info[ 0 ],
+                                      sys.version_info[ 1 ],
+                                      marshal.version )
+
+    def save( self, filename ):
+        """Save topology (and build plan) to a file
+           filename: .json for JSON, anything else for binary"""
+        data = self.toDict()
+        with open( filename, 'wb' ) as f:
+            if filename.endswith( '.json' ):
+                json.dump( data, f, indent=1 )
+            else:
+                f.write( self.header() )
+                f.write( zlib.compress( marshal.dumps( data ) ) )
+
+    @classmethod
+    def load( cls, filename ):
+        """Load topology saved by save()
+           filename: file name
+           returns: Topo"""
+        with open( filename, 'rb' ) as f:
+            contents = f.read()
+        if contents.startswith( cls.magic ):
+            header, _, body = contents.partition( '\n' )
+            if header + '\n' != cls.header():
+                raise Exception(
+                    '%s: saved as %r, but we can only read %r '
+                    '(use .json files to share topologies)' %
+                    ( filename, header, cls.header().strip() ) )
+            data = marshal.loads( zlib.decompress( body ) )
+        else:
+            data = json.loads( contents )
+        return cls.fromDict( data )
+
 
 # Our idiom defines additional parameters in build(param...)
 # pylint: disable=arguments-differ
@@ -2,19 +2,131 @@
 
 
 from mininet.log import output, info, error, warn, debug
+from mininet.perf import tracer
 
-from time import sleep
+from time import sleep, time
 from resource import getrlimit, setrlimit, RLIMIT_NPROC, RLIMIT_NOFILE
-from select import poll, POLLIN, POLLHUP
+from select import poll, POLLIN, POLLHUP, POLLOUT, POLLERR
 from subprocess import call, check_call, Popen, PIPE, STDOUT
 import re
 from fcntl import fcntl, F_GETFL, F_SETFL
 from os import O_NONBLOCK
 import os
 from functools import partial
+from threading import Thread, local
+import errno
+import socket
 
 # Command execution support
 
+class SpawnPopen( Popen ):
+    """Popen that starts processes using posix_spawn(), which glibc
+       implements with vfork semantics, rather than fork(), which has
+       to copy the page tables of our (possibly very large) process.
+       Popen options that posix_spawn() can't handle (preexec_fn other
+       than os.setpgrp, cwd, or pipes on fds 0-2) use Popen's fork()
+       instead, as does everything if posix_spawn() isn't available."""
+
+    libc = None  # loaded on first use; False if unavailable
+    SETPGROUP = 0x02  # POSIX_SPAWN_SETPGROUP
+    # Enough space for glibc's posix_spawn_file_actions_t (80 bytes)
+    # and posix_spawnattr_t (336 bytes) on 64-bit systems
+    opaqueSize = 1024
+
+    @classmethod
+    def loadLibc( cls ):
+        "Return libc via ctypes, or False if posix_spawn is unavailable"
+        if cls.libc is None:
+            # Import here, since we may never need it
+            import ctypes
+            cls.ctypes = ctypes
+            try:
+                libc = ctypes.CDLL( None, use_errno=True )
+                libc.posix_spawnp.argtypes = [
+                    ctypes.POINTER( ctypes.c_int ), ctypes.c_char_p,
+                    ctypes.c_void_p, ctypes.c_void_p,
+                    ctypes.POINTER( ctypes.c_char_p ),
+                    ctypes.POINTER( ctypes.c_char_p ) ]
+                cls.libc = libc
+            except ( OSError, AttributeError ):
+                cls.libc = False
+        return cls.libc
+
+    # pylint: disable=arguments-differ,too-many-arguments,too-many-locals
+    def _execute_child( self, args, executable, preexec_fn, close_fds,
+                        cwd, env, universal_newlines,
+                        startupinfo, creationflags, shell, to_close,
+                        p2cread, p2cwrite, c2pread, c2pwrite,
+                        errread, errwrite ):
+        "Start child using posix_spawn() if we can"
+        childFds = [ fd for fd in ( p2cread, c2pwrite, errwrite )
+                     if fd is not None ]
+        if ( preexec_fn not in ( None, os.setpgrp ) or cwd is not None or
+             any( fd <= 2 for fd in childFds ) or not self.loadLibc() ):
+            return Popen._execute_child(
+                self, args, executable, preexec_fn, close_fds, cwd, env,
+                universal_newlines, startupinfo, creationflags, shell,
+                to_close, p2cread, p2cwrite, c2pread, c2pwrite,
+                errread, errwrite )
+        if isinstance( args, basestring ):
+            args = [ args ]
+        else:
+            args = list( args )
+        if shell:
+            args = [ '/bin/sh', '-c' ] + args
+            if executable:
+                args[ 0 ] = executable
+        if executable is None:
+            executable = args[ 0 ]
+        if env is None:
+            env = os.environ
+        ctypes, libc = self.ctypes, self.libc
+        actions = ctypes.create_string_buffer( self.opaqueSize )
+        attr = ctypes.create_string_buffer( self.opaqueSize )
+        libc.posix_spawn_file_actions_init( actions )
+        libc.posix_spawnattr_init( attr )
+        try:
+            # As in Popen: close parent's ends of pipes, set up stdin,
+            # stdout and stderr, and close the originals
+            for fd in p2cwrite, c2pread, errread:
+                if fd is not None:
+                    libc.posix_spawn_file_actions_addclose( actions, fd )
+            for fd, target in ( p2cread, 0 ), ( c2pwrite, 1 ), ( errwrite, 2 ):
+                if fd is not None:
+                    libc.posix_spawn_file_actions_adddup2( actions, fd,
+                                                           target )
+            closeFds = set( childFds )
+            if close_fds:
+                # Close everything we have open (closing fds that are
+                # no longer open is harmless)
+                closeFds.update( int( fd ) for fd in
+                                 os.listdir( '/proc/self/fd' ) )
+            for fd in closeFds:
+                if fd > 2:
+                    libc.posix_spawn_file_actions_addclose( actions, fd )
+            if preexec_fn is os.setpgrp:
+                libc.posix_spawnattr_setflags( attr, self.SETPGROUP )
+                libc.posix_spawnattr_setpgroup( attr, 0 )
+            argv = ( ctypes.c_char_p * ( len( args ) + 1 ) )(
+                *( [ str( arg ) for arg in args ] + [ None ] ) )
+            envp = ( ctypes.c_char_p * ( len( env ) + 1 ) )(
+                *( [ '%s=%s' % kv for kv in env.iteritems() ] + [ None ] ) )
+            pid = ctypes.c_int()
+            result = libc.posix_spawnp( ctypes.byref( pid ), str( executable ),
+                                        actions, attr, argv, envp )
+        finally:
+            libc.posix_spawn_file_actions_destroy( actions )
+            libc.posix_spawnattr_destroy( attr )
+            for fd in set( childFds ):
+                if fd in to_close:
+                    os.close( fd )
+                    to_close.remove( fd )
+        if result != 0:
+            raise OSError( result, os.strerror( result ) )
+        self.pid = pid.value
+        self._child_created = True
+    # pylint: enable=arguments-differ,too-many-arguments,too-many-locals
+
 def run( cmd ):
     """Simple interface to subprocess.call()
        cmd: list of command params"""
@@ -57,7 +169,6 @@ def oldQuietRun( *cmd ):
 # This is a bit complicated, but it enables us to
 # monitor command output as it is happening
 
-# pylint: disable=too-many-branches
 def errRun( *cmd, **kwargs ):
     """Run a command and return stdout, stderr and return code
        cmd: string or list of command and args
@@ -80,45 +191,45 @@ def errRun( *cmd, **kwargs ):
     elif isinstance( cmd, list ) and shell:
         cmd = " ".join( arg for arg in cmd )
     debug( '*** errRun:', cmd, '\n' )
-    popen = Popen( cmd, stdout=PIPE, stderr=stderr, shell=shell )
+    start = time()
+    popen = SpawnPopen( cmd, stdout=PIPE, stderr=stderr, shell=shell )
     # We use poll() because select() doesn't work with large fd numbers,
-    # and thus communicate() doesn't work either
-    out, err = '', ''
-    poller = poll()
-    poller.register( popen.stdout, POLLIN )
-    fdtofile = { popen.stdout.fileno(): popen.stdout }
-    outDone, errDone = False, True
+    # and thus communicate() doesn't work either. Each thread reuses
+    # its own poller.
+    poller = getattr( errRun.local, 'poller', None )
+    if poller is None:
+        poller = errRun.local.poller = poll()
+    out, err = [], []
+    pending = { popen.stdout.fileno(): out }  # fd -> output chunks
     if popen.stderr:
-        fdtofile[ popen.stderr.fileno() ] = popen.stderr
-        poller.register( popen.stderr, POLLIN )
-        errDone = False
-    while not outDone or not errDone:
-        readable = poller.poll()
-        for fd, event in readable:
-            f = fdtofile[ fd ]
-            if event & POLLIN:
-                data = f.read( 1024 )
-                if echo:
-                    output( data )
-                if f == popen.stdout:
-                    out += data
-                    if data == '':
-                        outDone = True
-                elif f == popen.stderr:
-                    err += data
-                    if data == '':
-                        errDone = True
-            else:  # POLLHUP or something unexpected
-                if f == popen.stdout:
-                    outDone = True
-                elif f == popen.stderr:
-                    errDone = True
-                poller.unregister( fd )
-
+        pending[ popen.stderr.fileno() ] = err
+    for fd in pending:
+        poller.register( fd, POLLIN )
+    try:
+        while pending:
+            for fd, event in poller.poll():
+                # Read until EOF (or POLLHUP with nothing left to read)
+                data = os.read( fd, errRun.readSize ) if event & POLLIN else ''
+                if data:
+                    if echo:
+                        output( data )
+                    pending[ fd ].append( data )
+                else:
+                    poller.unregister( fd )
+                    del pending[ fd ]
+    finally:
+        for fd in pending:
+            poller.unregister( fd )
+    out, err = ''.join( out ), ''.join( err )
     returncode = popen.wait()
     debug( out, err, returncode )
+    if tracer.enabled:
+        tracer.add( 'errRun', None, cmd, start, size=len( out ) + len( err ),
+                    status=returncode )
     return out, err, returncode
-# pylint: enable=too-many-branches
+
+errRun.local = local()  # per-thread poller
+errRun.readSize = 65536
 
 def errFail( *cmd, **kwargs ):
     "Run a command using errRun and raise exception on nonzero exit"
@@ -145,6 +256,92 @@ def isShellBuiltin( cmd ):
 
 isShellBuiltin.builtIns = None
 
+def which( cmd ):
+    """Return the full path of executable cmd in $PATH, or '' if not found.
+       Unlike quietRun( 'which ...' ) this doesn't fork, and results are
+       cached so that probing for optional programs is cheap.
+       cmd: program name"""
+    path = os.environ.get( 'PATH', os.defpath )
+    key = cmd, path
+    if key not in which.cache:
+        found = ''
+        # Like which(1), don't search $PATH for commands with a '/'
+        dirs = [ '' ] if os.sep in cmd else path.split( os.pathsep )
+        for directory in dirs:
+            fullpath = os.path.join( directory, cmd )
+            if ( os.path.isfile( fullpath ) and
+                 os.access( fullpath, os.X_OK ) ):
+                found = fullpath
+                break
+        which.cache[ key ] = found
+    return which.cache[ key ]
+
+which.cache = {}
+
+# Namespace types for setns()
+CLONE_NEWNS = 0x00020000
+CLONE_NEWNET = 0x40000000
+
+def setns( fd, nstype=0 ):
+    """Move the calling thread into a namespace, like mnexec -a but
+       without forking (note: joining a mount namespace requires a
+       single-threaded process)
+       fd: file descriptor of /proc/<pid>/ns/<type>
+       nstype: CLONE_NEWNET, CLONE_NEWNS, or 0 for any"""
+    if setns.libc is None:
+        # Import here, since few callers need this
+        import ctypes
+        setns.libc = ctypes.CDLL( None, use_errno=True )
+        setns.errno = ctypes.get_errno
+    if setns.libc.setns( fd, nstype ) != 0:
+        errno = setns.errno()
+        raise OSError( errno, 'setns: %s' % os.strerror( errno ) )
+
+setns.libc = None
+
+def namespace( pid ):
+    "Return an identifier for the network namespace of pid"
+    try:
+        return os.readlink( '/proc/%s/ns/net' % pid )
+    except OSError:
+        return pid
+
+def netnsSockets( pid, count=1, family=socket.AF_INET,
+                  stype=socket.SOCK_STREAM ):
+    """Create sockets in the network namespace of a process
+       (a socket stays in the namespace it was created in, so we
+       create sockets in a short-lived thread that joins the namespace)
+       pid: process id, or None for our own namespace
+       count: number of sockets to create
+       returns: list of sockets"""
+    if pid is None:
+        return [ socket.socket( family, stype ) for _ in range( count ) ]
+    result = []
+
+    def create():
+        "Join pid's network namespace and create sockets"
+        try:
+            fd = os.open( '/proc/%d/ns/net' % pid, os.O_RDONLY )
+            try:
+                setns( fd, CLONE_NEWNET )
+            finally:
+                os.close( fd )
+            result.extend( socket.socket( family, stype )
+                           for _ in range( count ) )
+        # pylint: disable=broad-except
+        except Exception as e:
+            result.append( e )
+        # pylint: enable=broad-except
+
+    thread = Thread( target=create )
+    thread.start()
+    thread.join()
+    if result and isinstance( result[ -1 ], Exception ):
+        for sock in result[ :-1 ]:
+            sock.close()
+        raise result[ -1 ]
+    return result
+
 # Interface management
 #
 # Interfaces are managed as strings which are simply the
@@ -592,9 +789,117 @@ def ensureRoot():
         exit( 1 )
     return
 
+# Errors that mean a server is unreachable, rather than not listening yet
+UNREACHABLE = ( errno.ENETUNREACH, errno.EHOSTUNREACH )
+
+def probeListening( targets, timeout=None, retry=True, delay=.001,
+                    maxDelay=.1 ):
+    """Wait until servers are listening, using non-blocking connects
+       from inside each client's network namespace
+       targets: list of ( client node or None, server node or IP, port )
+       timeout: seconds to wait, or None to wait indefinitely
+       retry: retry refused connections (with exponential backoff)
+       delay: initial delay between retries
+       maxDelay: maximum delay between retries
+       returns: set of indices of targets which are listening"""
+    start = time()
+    deadline = None if timeout is None else start + timeout
+    listening = set()
+    due = { i: start for i in range( len( targets ) ) }  # next probe
+    delays = dict.fromkeys( due, delay )
+    pending = {}  # fd -> ( target index, socket )
+    poller = poll()
+
+    def failed( i, err ):
+        "Handle a failed connection attempt for target i"
+        if err in UNREACHABLE:
+            _client, server, port = targets[ i ]
+            error( 'no route to %s:%s: %s\n' % ( server, port,
+                                                 os.strerror( err ) ) )
+        elif retry:
+            due[ i ] = time() + delays[ i ]
+            delays[ i ] = min( delays[ i ] * 2, maxDelay )
+
+    while due or pending:
+        now = time()
+        if deadline is not None and now >= deadline:
+            break
+        # Start connections for targets that are due, creating each
+        # client's sockets in one go
+        ready = [ i for i, t in due.iteritems() if t <= now ]
+        byPid = {}
+        for i in ready:
+            del due[ i ]
+            client = targets[ i ][ 0 ]
+            byPid.setdefault( client.pid if client else None, [] ).append( i )
+        for pid, indices in byPid.iteritems():
+            for i, sock in zip( indices, netnsSockets( pid, len( indices ) ) ):
+                _client, server, port = targets[ i ]
+                # pylint: disable=maybe-no-member
+                ip = server if isinstance( server, basestring ) else (
+                    server.IP() )
+                # pylint: enable=maybe-no-member
+                sock.setblocking( False )
+                err = sock.connect_ex( ( ip, port ) )
+                if err == errno.EINPROGRESS:
+                    pending[ sock.fileno() ] = ( i, sock )
+                    poller.register( sock, POLLOUT | POLLERR | POLLHUP )
+                    continue
+                sock.close()
+                if err == 0:
+                    listening.add( i )
+                else:
+                    failed( i, err )
+        # Wait for connections to complete or the next probe
+        if not due and not pending:
+            break
+        wait = min( due.values() ) - time() if due else None
+        if deadline is not None:
+            wait = min( deadline - time(), wait ) if wait is not None else (
+                deadline - time() )
+        wait = None if wait is None else max( wait, 0 )
+        for fd, _event in poller.poll( None if wait is None
+                                       else int( wait * 1000 ) + 1 ):
+            i, sock = pending.pop( fd )
+            poller.unregister( fd )
+            err = sock.getsockopt( socket.SOL_SOCKET, socket.SO_ERROR )
+            sock.close()
+            if err == 0:
+                listening.add( i )
+            else:
+                failed( i, err )
+    for _i, sock in pending.itervalues():
+        sock.close()
+    return listening
+
+def isListening( client, server, port, timeout=2 ):
+    """Check (once) whether server is listening on port
+       client: node to connect from, or None for the root namespace
+       server: server node or IP address
+       port: TCP port
+       timeout: seconds to wait for the connection
+       returns: True if server is listening"""
+    return bool( probeListening( [ ( client, server, port ) ],
+                                 timeout=timeout, retry=False ) )
+
 def waitListening( client=None, server='127.0.0.1', port=80, timeout=None ):
     """Wait until server is listening on port.
        returns True if server is listening"""
+    # We can only join the namespaces of local nodes
+    if getattr( client, 'isRemote', False ):
+        return waitListeningCmd( client, server, port, timeout )
+    debug( 'waiting for', server, 'to listen on port', port, '\n' )
+    # As before, a timeout of 0 means wait indefinitely
+    if probeListening( [ ( client, server, port ) ],
+                       timeout=timeout or None ):
+        return True
+    error( 'could not connect to %s on port %d\n' % ( server, port ) )
+    return False
+
+def waitListeningCmd( client=None, server='127.0.0.1', port=80,
+                      timeout=None ):
+    """Wait until server is listening on port, using telnet in client
+       returns True if server is listening"""
     runCmd = ( client.cmd if client else
                partial( quietRun, shell=True ) )
     if not runCmd( 'which telnet' ):
@@ -602,19 +907,19 @@ def waitListening( client=None, server='127.0.0.1', port=80, timeout=None ):
     # pylint: disable=maybe-no-member
     serverIP = server if isinstance( server, basestring ) else server.IP()
     cmd = ( 'echo A | telnet -e A %s %s' % ( serverIP, port ) )
-    time = 0
+    elapsed = 0
     result = runCmd( cmd )
     while 'Connected' not in result:
         if 'No route' in result:
             rtable = runCmd( 'route' )
             error( 'no route to %s:\n%s' % ( server, rtable ) )
             return False
-        if timeout and time >= timeout:
+        if timeout and elapsed >= timeout:
             error( 'could not connect to %s on port %d\n' % ( server, port ) )
             return False
         debug( 'waiting for', server, 'to listen on port', port, '\n' )
         info( '.' )
         sleep( .5 )
-        time += .5
+        elapsed += .5
         result = runCmd( cmd )
     return True